@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Mock LLM Server
+Local stand-in for the OpenAI chat-completions and Anthropic messages APIs
+
+Answers every request with generated text after a configurable delay and at a
+configurable token rate, with or without streaming, and can rate-limit each
+API key with 429 responses like the real APIs do. GET /stats returns the
+number of requests served so far. Point providers at it
+with base_url (http://HOST:PORT/v1 for OpenAI-style providers, http://HOST:PORT
+for Claude). Uses only the standard library.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+         "tempor incididunt ut labore et dolore magna aliqua").split()
+
+
+class MockLLMServer:
+    """Minimal HTTP/1.1 server speaking the OpenAI and Anthropic wire formats"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 tokens_per_second: float = 0.0, response_tokens: int = 64, key_rps: float = 0.0):
+        self.host = host
+        self.port = port
+        # Seconds before the first token, and generation rate (0 = instant)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        # Requests per second allowed for each API key (0 = unlimited)
+        self.key_rps = key_rps
+        self._key_windows: Dict[str, List[float]] = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """Start listening and return the bound port"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        """Stop the server"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one keep-alive connection"""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if path != "/stats":
+                    self.requests += 1
+                retry_after = self._check_key_limit(headers)
+                if retry_after is not None:
+                    self.rate_limited += 1
+                    await self._send_json(writer, 429, {"error": {"message": "rate limit exceeded",
+                                                                  "type": "rate_limit_error"}},
+                                          {"retry-after-ms": str(int(retry_after * 1000))})
+                    continue
+                await self._dispatch(writer, method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Read one request; None when the client closed the connection"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        method, path, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return method, path, headers, body
+
+    def _check_key_limit(self, headers: Dict[str, str]) -> Optional[float]:
+        """Count a request against its API key's one-second window; returns the wait if over the limit"""
+        if not self.key_rps:
+            return None
+        key = headers.get("x-api-key") or headers.get("authorization", "")
+        now = time.monotonic()
+        window = self._key_windows.setdefault(key, [now, 0])
+        if now - window[0] >= 1.0:
+            window[0], window[1] = now, 0
+        window[1] += 1
+        if window[1] <= self.key_rps:
+            return None
+        return window[0] + 1.0 - now
+
+    async def _dispatch(self, writer: asyncio.StreamWriter, method: str, path: str, body: bytes):
+        """Route a request to the matching API format"""
+        path = path.split("?", 1)[0]
+        if method == "GET" and path == "/stats":
+            await self._send_json(writer, 200, {"requests": self.requests, "rate_limited": self.rate_limited})
+            return
+        if method == "POST" and path.endswith("/chat/completions"):
+            api = "openai"
+        elif method == "POST" and path.endswith("/messages"):
+            api = "anthropic"
+        else:
+            await self._send_json(writer, 404, {"error": {"message": f"no route for {method} {path}"}})
+            return
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            await self._send_json(writer, 400, {"error": {"message": "invalid JSON"}})
+            return
+
+        prompt_tokens = sum(len(json.dumps(m.get("content", ""))) // 4 + 4 for m in payload.get("messages", []))
+        model = payload.get("model", "mock")
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(self.response_tokens)]
+
+        if payload.get("stream"):
+            await self._stream(writer, api, model, prompt_tokens, tokens,
+                               include_usage=bool(payload.get("stream_options", {}).get("include_usage")))
+            return
+
+        async def discard(batch):
+            pass
+        await self._generate(tokens, discard)
+        text = "".join(tokens)
+        if api == "openai":
+            response = {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                          "total_tokens": prompt_tokens + len(tokens)}
+            }
+        else:
+            response = {
+                "id": "msg_mock", "type": "message", "role": "assistant", "model": model,
+                "content": [{"type": "text", "text": text}], "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": len(tokens)}
+            }
+        await self._send_json(writer, 200, response)
+
+    async def _generate(self, tokens: List[str], emit):
+        """Wait for the first-token latency, then emit tokens at the configured rate"""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if not self.tokens_per_second:
+            await emit(tokens)
+            return
+
+        # Emit whatever is due every few milliseconds rather than sleeping
+        # once per token, which would be limited by timer resolution
+        start = time.perf_counter()
+        sent = 0
+        while sent < len(tokens):
+            due = min(len(tokens), int((time.perf_counter() - start) * self.tokens_per_second) + 1)
+            if due > sent:
+                batch = tokens[sent:due]
+                sent = due
+                await emit(batch)
+            if sent < len(tokens):
+                await asyncio.sleep(max(0.001, (sent + 1) / self.tokens_per_second - (time.perf_counter() - start)))
+
+    async def _stream(self, writer: asyncio.StreamWriter, api: str, model: str, prompt_tokens: int,
+                      tokens: List[str], include_usage: bool):
+        """Send a streamed response as server-sent events"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nTransfer-Encoding: chunked\r\n\r\n")
+
+        async def send(event: Optional[str], data: Any):
+            text = f"event: {event}\n" if event else ""
+            text += "data: " + (data if isinstance(data, str) else json.dumps(data)) + "\n\n"
+            payload = text.encode()
+            writer.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            await writer.drain()
+
+        created = int(time.time())
+        if api == "openai":
+            async def emit(batch):
+                for token in batch:
+                    await send(None, {
+                        "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+                    })
+            await self._generate(tokens, emit)
+            await send(None, {
+                "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            })
+            if include_usage:
+                await send(None, {
+                    "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                    "model": model, "choices": [],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                              "total_tokens": prompt_tokens + len(tokens)}
+                })
+            await send(None, "[DONE]")
+        else:
+            await send("message_start", {"type": "message_start", "message": {
+                "id": "msg_mock", "type": "message", "role": "assistant", "model": model, "content": [],
+                "stop_reason": None, "stop_sequence": None,
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": 1}
+            }})
+            await send("content_block_start", {"type": "content_block_start", "index": 0,
+                                               "content_block": {"type": "text", "text": ""}})
+
+            async def emit(batch):
+                for token in batch:
+                    await send("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                       "delta": {"type": "text_delta", "text": token}})
+            await self._generate(tokens, emit)
+            await send("content_block_stop", {"type": "content_block_stop", "index": 0})
+            await send("message_delta", {"type": "message_delta",
+                                         "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                         "usage": {"output_tokens": len(tokens)}})
+            await send("message_stop", {"type": "message_stop"})
+
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                         headers: Optional[Dict[str, str]] = None):
+        """Send a JSON response"""
+        body = json.dumps(payload).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests"}.get(status, "Error")
+        extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n{extra}"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+
+async def serve(args: argparse.Namespace):
+    """Run the server until interrupted"""
+    server = MockLLMServer(args.host, args.port, args.latency, args.tokens_per_second, args.response_tokens,
+                           args.key_rps)
+    port = await server.start()
+    # The benchmark runner reads the port from this line
+    print(f"listening on {args.host}:{port}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Mock OpenAI/Anthropic server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=0, help="Port to bind (default: any free port)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Generation rate; 0 sends all tokens at once")
+    parser.add_argument("--response-tokens", type=int, default=64, help="Tokens per response")
+    parser.add_argument("--key-rps", type=float, default=0.0,
+                        help="Requests per second per API key before answering 429 (default: unlimited)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
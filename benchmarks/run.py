@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Benchmark Runner
+Measures chatcli's own overhead against the local mock server, without API quota
+
+Scenarios:
+  startup     wall time of short CLI invocations in a fresh interpreter
+  turns       per-turn latency against a zero-latency server as history grows
+  streaming   cost of receiving and rendering a long streamed reply
+  batch       `chatcli batch` throughput at several concurrency levels
+  similarity  near-duplicate cache lookups as the number of entries grows
+  keys        batch throughput against per-key rate limits as API keys are added
+  coalesce    upstream calls and throughput of a batch full of repeated prompts
+
+Usage:
+  python benchmarks/run.py
+  python benchmarks/run.py --scenarios turns,batch --providers openai
+  python benchmarks/run.py --compare benchmarks/results/OLD.json
+
+Results are written as JSON (by default to benchmarks/results/<commit>.json)
+so that runs from different commits can be compared with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+SRC_DIR = REPO_DIR / "src"
+
+SCENARIOS = ["startup", "turns", "streaming", "batch", "similarity", "keys", "coalesce"]
+
+
+class MockServer:
+    """Runs mock_server.py in a subprocess for the duration of a with block"""
+
+    def __init__(self, latency: float = 0.0, tokens_per_second: float = 0.0, response_tokens: int = 16,
+                 key_rps: float = 0.0):
+        self.args = [
+            "--latency", str(latency),
+            "--tokens-per-second", str(tokens_per_second),
+            "--response-tokens", str(response_tokens),
+            "--key-rps", str(key_rps)
+        ]
+        self.process = None
+        self.port = None
+
+    def __enter__(self) -> "MockServer":
+        self.process = subprocess.Popen(
+            [sys.executable, str(BENCH_DIR / "mock_server.py")] + self.args,
+            stdout=subprocess.PIPE, text=True
+        )
+        line = self.process.stdout.readline()
+        if not line.startswith("listening on "):
+            self.process.kill()
+            raise RuntimeError("mock server failed to start")
+        self.port = int(line.rsplit(":", 1)[1])
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+
+    def base_url(self, provider: str) -> str:
+        """Return the base_url that points a provider at this server"""
+        # OpenAI-style SDKs expect the /v1 prefix in base_url; Anthropic's adds it
+        suffix = "" if provider == "claude" else "/v1"
+        return f"http://127.0.0.1:{self.port}{suffix}"
+
+    def served(self) -> int:
+        """Return the number of requests the server has answered"""
+        import urllib.request
+        with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/stats") as response:
+            return json.load(response)["requests"]
+
+    def use_for(self, provider: str):
+        """Point chats created from now on at this server"""
+        os.environ[f"CHATCLI_{provider.upper()}_BASE_URL"] = self.base_url(provider)
+
+
+def make_home(directory: Path, providers: List[str]) -> Path:
+    """Create a HOME whose chatcli config targets the mock server"""
+    config_dir = directory / ".chatcli"
+    config_dir.mkdir(parents=True)
+    config = {
+        "default_provider": providers[0],
+        "providers": {name: {"api_key": "mock-key"} for name in providers},
+        "settings": {
+            # Send the whole history every turn so its growth is measured
+            "conversation_history_limit": None,
+            "context_token_budget": None,
+            "response_cache": False,
+            "auto_save_conversations": False,
+            "record_metrics": False,
+            "max_retries": 0
+        }
+    }
+    (config_dir / "config.json").write_text(json.dumps(config, indent=2))
+    return directory
+
+
+def summarize_ms(samples: List[float]) -> Dict[str, float]:
+    """Return median/min/max of second samples in milliseconds"""
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3)
+    }
+
+
+def bench_startup(runs: int, provider: str) -> Dict[str, Any]:
+    """Time short CLI invocations, each in a fresh interpreter"""
+    chatcli = [sys.executable, str(REPO_DIR / "bin" / "chatcli")]
+    commands = {
+        "python": [sys.executable, "-c", "pass"],
+        "help": chatcli + ["--help"],
+        "list_providers": chatcli + ["--list-providers"],
+        "import_openai_provider": [
+            sys.executable, "-c",
+            f"import sys; sys.path.insert(0, {str(SRC_DIR)!r}); "
+            "from chat.factory import LLMProviderFactory; LLMProviderFactory.get_provider_class('openai')"
+        ],
+        # Full one-shot answer without the daemon, stdin closed
+        "one_shot": chatcli + ["--provider", provider, "-p", "hello"]
+    }
+    results = {}
+    with MockServer() as server:
+        server.use_for(provider)
+        for name, command in commands.items():
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, check=True)
+                samples.append(time.perf_counter() - start)
+            results[name] = summarize_ms(samples)
+    return results
+
+
+def synthetic_history(messages: int) -> List[Dict[str, str]]:
+    """Return an alternating user/assistant history of about 200 characters per message"""
+    text = "The quick brown fox jumps over the lazy dog. " * 4
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}: {text}"}
+        for i in range(messages)
+    ]
+
+
+def bench_turns(app, providers: List[str], history_sizes: List[int], turns: int) -> Dict[str, Any]:
+    """Per-turn latency against a zero-latency server at several history sizes"""
+    results = {}
+    with MockServer(response_tokens=16) as server:
+        for provider in providers:
+            server.use_for(provider)
+            results[provider] = {}
+            for size in history_sizes:
+                chat = app._create_chat(provider)
+                history = synthetic_history(size)
+                samples = []
+                # The first turns warm up imports and the pooled connection
+                for i in range(turns + 3):
+                    chat.load_history(history)
+                    start = time.perf_counter()
+                    response = chat.get_response("Next question, please.")
+                    elapsed = time.perf_counter() - start
+                    if response.startswith("Error:"):
+                        raise RuntimeError(f"{provider}: {response}")
+                    if i >= 3:
+                        samples.append(elapsed)
+                results[provider][str(size)] = summarize_ms(samples)
+    return results
+
+
+def bench_streaming(app, providers: List[str], response_tokens: int, runs: int) -> Dict[str, Any]:
+    """Cost of consuming a long stream, with and without rendering it like the chat loop"""
+    results = {}
+    with MockServer(response_tokens=response_tokens) as server, open(os.devnull, "w") as sink:
+        for provider in providers:
+            server.use_for(provider)
+            chat = app._create_chat(provider)
+            results[provider] = {}
+            for mode in ("consume", "render"):
+                samples = []
+                chunks = 0
+                for i in range(runs + 1):
+                    chat.clear_history()
+                    start = time.perf_counter()
+                    chunks = 0
+                    for chunk in chat.stream_response("Tell me a long story."):
+                        chunks += 1
+                        if mode == "render":
+                            print(chunk, end="", flush=True, file=sink)
+                    if i > 0:
+                        samples.append(time.perf_counter() - start)
+                median = statistics.median(samples)
+                results[provider][mode] = {
+                    "chunks": chunks,
+                    "median_ms": round(median * 1000, 3),
+                    "us_per_chunk": round(median / max(chunks, 1) * 1e6, 2)
+                }
+    return results
+
+
+def bench_batch(app, providers: List[str], concurrency_levels: List[int], records: int,
+                latency: float, workdir: Path) -> Dict[str, Any]:
+    """Batch throughput in records per second at several concurrency levels"""
+    import io
+    from chat.batch import BatchRunner
+    from chat.runtime import run_sync
+
+    input_path = workdir / "batch-input.jsonl"
+    with open(input_path, "w") as f:
+        for i in range(records):
+            f.write(json.dumps({"id": f"r{i}", "prompt": f"Question {i}"}) + "\n")
+
+    results = {}
+    with MockServer(latency=latency, response_tokens=32) as server:
+        for provider in providers:
+            server.use_for(provider)
+            results[provider] = {}
+            for concurrency in concurrency_levels:
+                output_path = workdir / f"batch-{provider}-{concurrency}.jsonl"
+                runner = BatchRunner(
+                    chat_factory=app._create_chat,
+                    provider=provider,
+                    concurrency=concurrency,
+                    progress=io.StringIO()
+                )
+                stats = run_sync(runner.run(str(input_path), str(output_path)))
+                results[provider][str(concurrency)] = {
+                    "records_per_second": round(stats["completed"] / stats["elapsed"], 2),
+                    # Throughput if chatcli itself cost nothing
+                    "ideal_records_per_second": round(concurrency / latency, 2),
+                    "failed": stats["failed"]
+                }
+    return results
+
+
+def bench_keys(app, provider: str, key_counts: List[int], records: int, key_rps: float,
+               workdir: Path) -> Dict[str, Any]:
+    """Batch throughput when each API key may send only key_rps requests per second"""
+    import io
+    from chat.batch import BatchRunner
+    from chat.resilience import configure_circuit_breakers
+    from chat.runtime import run_sync
+
+    input_path = workdir / "keys-input.jsonl"
+    with open(input_path, "w") as f:
+        for i in range(records):
+            f.write(json.dumps({"id": f"r{i}", "prompt": f"Question {i}"}) + "\n")
+
+    config = app.config_manager.config
+    settings = dict(config["settings"])
+    # 429s are part of the workload here, so they have to be retried
+    config["settings"]["max_retries"] = 20
+    config["settings"]["key_cooldown"] = 1
+    configure_circuit_breakers(failure_threshold=1000000)
+    results = {}
+    try:
+        with MockServer(latency=0.02, response_tokens=16, key_rps=key_rps) as server:
+            server.use_for(provider)
+            for count in key_counts:
+                config["providers"][provider]["api_keys"] = [f"mock-key-{i}" for i in range(count)]
+                output_path = workdir / f"keys-{count}.jsonl"
+                runner = BatchRunner(
+                    chat_factory=app._create_chat,
+                    provider=provider,
+                    concurrency=32,
+                    progress=io.StringIO()
+                )
+                stats = run_sync(runner.run(str(input_path), str(output_path)))
+                results[str(count)] = {
+                    "records_per_second": round(stats["completed"] / stats["elapsed"], 2),
+                    "limit_records_per_second": count * key_rps,
+                    "failed": stats["failed"]
+                }
+    finally:
+        config["settings"] = settings
+        config["providers"][provider].pop("api_keys", None)
+        configure_circuit_breakers(failure_threshold=app.config_manager.get_setting("circuit_breaker_threshold"))
+    return results
+
+
+def bench_coalesce(app, provider: str, records: int, distinct: int, workdir: Path) -> Dict[str, Any]:
+    """Batch throughput and upstream calls when records repeat distinct prompts, with and without coalescing"""
+    import io
+    from chat.batch import BatchRunner
+    from chat.runtime import run_sync
+
+    input_path = workdir / "coalesce-input.jsonl"
+    with open(input_path, "w") as f:
+        for i in range(records):
+            f.write(json.dumps({"id": f"r{i}", "prompt": f"Question {i % distinct}"}) + "\n")
+
+    settings = app.config_manager.config["settings"]
+    results = {}
+    try:
+        with MockServer(latency=0.2, response_tokens=32) as server:
+            server.use_for(provider)
+            for coalesce in (False, True):
+                settings["coalesce_requests"] = coalesce
+                output_path = workdir / f"coalesce-{coalesce}.jsonl"
+                before = server.served()
+                runner = BatchRunner(
+                    chat_factory=app._create_chat,
+                    provider=provider,
+                    concurrency=32,
+                    progress=io.StringIO()
+                )
+                stats = run_sync(runner.run(str(input_path), str(output_path)))
+                results["on" if coalesce else "off"] = {
+                    "records_per_second": round(stats["completed"] / stats["elapsed"], 2),
+                    "upstream_calls": server.served() - before,
+                    "failed": stats["failed"]
+                }
+    finally:
+        settings.pop("coalesce_requests", None)
+    return results
+
+
+def synthetic_prompt(rng, words: List[str], number: int) -> str:
+    """Return a generated-looking prompt of about 40 words with an id and a timestamp"""
+    body = " ".join(rng.choice(words) for _ in range(40))
+    return f"Request {number:08d} at 2025-01-01T00:00:{number % 60:02d}Z: {body}"
+
+
+def bench_similarity(entries: int, runs: int, workdir: Path) -> Dict[str, Any]:
+    """Time SimilarityCache lookups that hit and that miss, with entries cached"""
+    import random
+    from chat.similarity import SimilarityCache
+
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(5000)]
+    cache = SimilarityCache(workdir / "similarity.db", max_entries=entries)
+    prompts = []
+    start = time.perf_counter()
+    for number in range(entries):
+        prompt = synthetic_prompt(rng, words, number)
+        if number % max(1, entries // runs) == 0:
+            prompts.append(prompt)
+        fingerprint = cache.fingerprint("openai", "gpt-4o-mini", [{"role": "user", "content": prompt}])
+        cache.set(fingerprint, "response")
+    fill = time.perf_counter() - start
+
+    results: Dict[str, Any] = {"entries": entries, "fill_per_entry_ms": round(fill / entries * 1000, 3)}
+    for name in ("hit", "miss"):
+        lookup, fingerprinting = [], []
+        for number, prompt in enumerate(prompts[:runs]):
+            if name == "hit":
+                # Same prompt with a new id, timestamp and spacing
+                prompt = prompt.replace("Request ", "Request  ").replace("00:00:", "12:34:", 1)
+            else:
+                prompt = synthetic_prompt(rng, words, entries + number)
+            messages = [{"role": "user", "content": prompt}]
+            start = time.perf_counter()
+            fingerprint = cache.fingerprint("openai", "gpt-4o-mini", messages)
+            middle = time.perf_counter()
+            match = cache.get(fingerprint)
+            fingerprinting.append(middle - start)
+            lookup.append(time.perf_counter() - middle)
+            if (match is not None) != (name == "hit"):
+                raise RuntimeError(f"expected a {name} for {prompt!r}")
+        results[name] = {"fingerprint": summarize_ms(fingerprinting), "lookup": summarize_ms(lookup)}
+    return results
+
+
+def git_revision() -> Dict[str, Any]:
+    """Return the current commit and whether the tree has local changes"""
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown",
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Flatten nested results into {"a.b.c": number}"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare_reports(old: Dict[str, Any], new: Dict[str, Any]):
+    """Print every metric of two reports side by side"""
+    old_flat = flatten(old["results"])
+    new_flat = flatten(new["results"])
+    print(f"{'metric':<60} {old['meta']['commit']:>12} {new['meta']['commit']:>12} {'change':>8}")
+    for name in sorted(set(old_flat) | set(new_flat)):
+        before, after = old_flat.get(name), new_flat.get(name)
+        change = ""
+        if before and after is not None:
+            change = f"{(after - before) / before * 100:+.1f}%"
+        print(f"{name:<60} {before if before is not None else '-':>12} "
+              f"{after if after is not None else '-':>12} {change:>8}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Offline chatcli benchmarks against a mock LLM server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument("--providers", default="openai,claude",
+                        help="Providers to benchmark; each must be openai- or claude-compatible (default: openai,claude)")
+    parser.add_argument("--runs", type=int, default=10, help="Repetitions per measurement (default: 10)")
+    parser.add_argument("--history-sizes", default="0,10,100,1000",
+                        help="History lengths for the turns scenario (default: 0,10,100,1000)")
+    parser.add_argument("--stream-tokens", type=int, default=2000,
+                        help="Reply length for the streaming scenario (default: 2000)")
+    parser.add_argument("--concurrency", default="1,8,32,128",
+                        help="Concurrency levels for the batch scenario (default: 1,8,32,128)")
+    parser.add_argument("--batch-records", type=int, default=500, help="Records per batch run (default: 500)")
+    parser.add_argument("--batch-latency", type=float, default=0.05,
+                        help="Mock server latency for the batch scenario in seconds (default: 0.05)")
+    parser.add_argument("--similarity-entries", type=int, default=100000,
+                        help="Cached prompts for the similarity scenario (default: 100000)")
+    parser.add_argument("--key-counts", default="1,2,4,8",
+                        help="API key counts for the keys scenario (default: 1,2,4,8)")
+    parser.add_argument("--key-rps", type=float, default=20,
+                        help="Requests per second the mock server allows each key (default: 20)")
+    parser.add_argument("--distinct-prompts", type=int, default=10,
+                        help="Different prompts among the coalesce scenario's records (default: 10)")
+    parser.add_argument("--output", type=str, help="Report path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=str, metavar="REPORT",
+                        help="Compare the new report with an earlier one")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    providers = [name.strip() for name in args.providers.split(",") if name.strip()]
+
+    with tempfile.TemporaryDirectory(prefix="chatcli-bench-") as tmp:
+        workdir = Path(tmp)
+        # Point ConfigManager at a throwaway config before chatcli is imported
+        os.environ["HOME"] = str(make_home(workdir / "home", providers))
+        sys.path.insert(0, str(SRC_DIR))
+        from chatcli import ChatCLI
+        app = ChatCLI()
+
+        results: Dict[str, Any] = {}
+        for name in scenarios:
+            print(f"Running {name}...", file=sys.stderr)
+            if name == "startup":
+                results[name] = bench_startup(args.runs, providers[0])
+            elif name == "turns":
+                sizes = [int(size) for size in args.history_sizes.split(",")]
+                results[name] = bench_turns(app, providers, sizes, args.runs)
+            elif name == "streaming":
+                results[name] = bench_streaming(app, providers, args.stream_tokens, args.runs)
+            elif name == "batch":
+                levels = [int(level) for level in args.concurrency.split(",")]
+                results[name] = bench_batch(app, providers, levels, args.batch_records,
+                                            args.batch_latency, workdir)
+            elif name == "similarity":
+                results[name] = bench_similarity(args.similarity_entries, args.runs, workdir)
+            elif name == "keys":
+                counts = [int(count) for count in args.key_counts.split(",")]
+                results[name] = bench_keys(app, providers[0], counts, args.batch_records,
+                                           args.key_rps, workdir)
+            elif name == "coalesce":
+                results[name] = bench_coalesce(app, providers[0], args.batch_records,
+                                               args.distinct_prompts, workdir)
+
+    report = {
+        "meta": dict(git_revision(), timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                     python=platform.python_version(), platform=platform.platform()),
+        "results": results
+    }
+
+    output = Path(args.output) if args.output else BENCH_DIR / "results" / f"{report['meta']['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(json.dumps(results, indent=2))
+    print(f"Report written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+File Attachments
+Bounded excerpts of local files, attached to messages by reference
+"""
+
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from .context import CHARS_PER_TOKEN, estimate_tokens
+
+
+# Excerpt size when no other limit is given
+DEFAULT_MAX_TOKENS = 20000
+
+# Bytes copied out of the mapping at a time when counting lines
+SCAN_CHUNK_SIZE = 1 << 20
+
+# Rendered excerpts kept in memory, so that a chat does not reread its files
+# on every turn
+CACHE_SIZE = 16
+_excerpts: "OrderedDict[tuple, str]" = OrderedDict()
+_excerpts_lock = threading.Lock()
+
+
+def _line_start(mm: mmap.mmap, pos: int, lines_before: int = 0) -> int:
+    """Return the start of the line containing pos, moved back lines_before lines"""
+    start = mm.rfind(b"\n", 0, pos) + 1
+    for _ in range(lines_before):
+        if start == 0:
+            break
+        start = mm.rfind(b"\n", 0, start - 1) + 1
+    return start
+
+
+def _line_end(mm: mmap.mmap, pos: int, lines_after: int = 0) -> int:
+    """Return the end (past the newline) of the line containing pos, moved on lines_after lines"""
+    end = pos
+    for _ in range(lines_after + 1):
+        newline = mm.find(b"\n", end)
+        if newline == -1:
+            return len(mm)
+        end = newline + 1
+    return end
+
+
+def _count_lines(mm: mmap.mmap, start: int, end: int) -> int:
+    """Count newlines in mm[start:end] without copying it all at once"""
+    count = 0
+    while start < end:
+        stop = min(end, start + SCAN_CHUNK_SIZE)
+        count += mm[start:stop].count(b"\n")
+        start = stop
+    return count
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def _head(mm: mmap.mmap, lines: Optional[int], max_bytes: int) -> Tuple[str, bool]:
+    """Return the first lines of the file within max_bytes, and whether max_bytes cut them short"""
+    if lines is None:
+        end = len(mm)
+    else:
+        end = _line_end(mm, 0, lines - 1) if lines > 0 else 0
+    if end > max_bytes:
+        # Cut at the last whole line that fits, unless no line fits at all
+        end = mm.rfind(b"\n", 0, max_bytes) + 1 or max_bytes
+        return _decode(mm[:end]), True
+    return _decode(mm[:end]), False
+
+
+def _tail(mm: mmap.mmap, lines: Optional[int], max_bytes: int) -> Tuple[str, bool]:
+    """Return the last lines of the file within max_bytes, and whether max_bytes cut them short"""
+    size = len(mm)
+    if lines is None or lines <= 0:
+        start = size if lines is not None else 0
+    else:
+        # Skip a trailing newline so it does not count as an empty last line
+        last = size - 1 if mm[size - 1:size] == b"\n" else size
+        start = _line_start(mm, last, lines - 1)
+    if size - start > max_bytes:
+        start = mm.find(b"\n", size - max_bytes) + 1 or size - max_bytes
+        return _decode(mm[start:]), True
+    return _decode(mm[start:]), False
+
+
+def _grep(mm: mmap.mmap, pattern: str, context: int, max_bytes: int) -> str:
+    """Return the lines matching pattern, with context lines around them, within max_bytes"""
+    try:
+        regex = re.compile(pattern.encode("utf-8"), re.MULTILINE)
+    except re.error as e:
+        raise ValueError(f"invalid pattern {pattern!r}: {e}")
+    if regex.search(b""):
+        raise ValueError(f"pattern {pattern!r} matches empty text")
+
+    regions: List[List[int]] = []
+    used = 0
+    truncated = False
+    for match in regex.finditer(mm):
+        if regions and match.start() < regions[-1][1]:
+            # Another match inside a region already taken
+            continue
+        start = _line_start(mm, match.start(), context)
+        end = _line_end(mm, max(match.start(), match.end() - 1), context)
+        if regions and start <= regions[-1][1]:
+            start = regions[-1][1]
+        if used + end - start > max_bytes:
+            truncated = True
+            if not regions:
+                # A single match bigger than the budget is cut rather than lost
+                regions.append([start, start + max_bytes])
+            break
+        used += end - start
+        if regions and start == regions[-1][1]:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    if not regions:
+        return f"[no lines match {pattern!r}]"
+
+    parts = []
+    line = 1
+    counted = 0
+    for start, end in regions:
+        line += _count_lines(mm, counted, start)
+        text = _decode(mm[start:end])
+        complete = text.endswith("\n")
+        last = line + text.count("\n") - (1 if complete else 0)
+        text = text.rstrip("\n")
+        parts.append(f"[lines {line}-{last}]\n{text}")
+        line = last + (1 if complete else 0)
+        counted = end
+    if truncated:
+        parts.append("[more matches omitted]")
+    return "\n".join(parts)
+
+
+def _read_excerpt(reference: Dict[str, Any]) -> str:
+    """Read the part of a file that a reference selects, through mmap"""
+    path = reference["path"]
+    max_bytes = reference["max_tokens"] * CHARS_PER_TOKEN
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if b"\0" in mm[:8192]:
+                raise ValueError(f"{path} looks like a binary file")
+            if reference.get("grep"):
+                return _grep(mm, reference["grep"], reference.get("context") or 0, max_bytes)
+            if reference.get("head") is not None:
+                text, cut = _head(mm, reference["head"], max_bytes)
+            elif reference.get("tail") is not None:
+                text, cut = _tail(mm, reference["tail"], max_bytes)
+            elif len(mm) <= max_bytes:
+                return _decode(mm[:])
+            else:
+                # Too big to send whole: keep both ends, where logs and
+                # sources usually say the most
+                head, _ = _head(mm, None, max_bytes // 2)
+                tail, _ = _tail(mm, None, max_bytes // 2)
+                omitted = len(mm) - len(head.encode("utf-8")) - len(tail.encode("utf-8"))
+                head = head.rstrip("\n")
+                return f"{head}\n[... {max(omitted, 0)} bytes omitted ...]\n{tail}"
+    if cut:
+        text += f"\n[cut to {reference['max_tokens']} tokens]"
+    return text
+
+
+def _cache_key(reference: Dict[str, Any], stat: os.stat_result) -> tuple:
+    return (reference["path"], stat.st_size, stat.st_mtime, reference.get("grep"), reference.get("context"),
+            reference.get("head"), reference.get("tail"), reference["max_tokens"])
+
+
+def _cached_excerpt(reference: Dict[str, Any], stat: os.stat_result) -> str:
+    """Return the excerpt for a reference, reading the file only on a cache miss"""
+    key = _cache_key(reference, stat)
+    with _excerpts_lock:
+        text = _excerpts.get(key)
+        if text is not None:
+            _excerpts.move_to_end(key)
+            return text
+    # Requests render in worker threads; reading happens outside the lock
+    text = _read_excerpt(reference)
+    with _excerpts_lock:
+        _excerpts[key] = text
+        while len(_excerpts) > CACHE_SIZE:
+            _excerpts.popitem(last=False)
+    return text
+
+
+def attach_file(path: str, max_tokens: int = None, grep: str = None, context: int = 0,
+                head: int = None, tail: int = None) -> Dict[str, Any]:
+    """Return a reference to a file excerpt for a message's "attachments"
+
+    Only the reference is kept in the conversation; the excerpt is read when
+    a request is sent. Raises ValueError if the file cannot be attached.
+    """
+    resolved = Path(path).expanduser().resolve()
+    if not resolved.is_file():
+        raise ValueError(f"not a file: {path}")
+    if sum(option is not None for option in (grep, head, tail)) > 1:
+        raise ValueError("use only one of grep, head and tail")
+    stat = resolved.stat()
+    reference = {
+        "path": str(resolved),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "max_tokens": max_tokens or DEFAULT_MAX_TOKENS,
+        "grep": grep,
+        "context": context,
+        "head": head,
+        "tail": tail
+    }
+    try:
+        text = _cached_excerpt(reference, stat)
+    except OSError as e:
+        raise ValueError(f"cannot read {path}: {e}")
+    reference["tokens"] = estimate_tokens(text)
+    return reference
+
+
+def describe_attachment(reference: Dict[str, Any]) -> str:
+    """Return a one-line description of an attachment"""
+    if reference.get("grep"):
+        selection = f"lines matching {reference['grep']!r}"
+        if reference.get("context"):
+            selection += f" ±{reference['context']}"
+    elif reference.get("head") is not None:
+        selection = f"first {reference['head']} lines"
+    elif reference.get("tail") is not None:
+        selection = f"last {reference['tail']} lines"
+    elif reference["size"] > reference["max_tokens"] * CHARS_PER_TOKEN:
+        selection = "start and end"
+    else:
+        selection = "whole file"
+    return (f"{reference['path']} ({reference['size']:,} bytes, {selection}, "
+            f"~{reference['tokens']} tokens)")
+
+
+def render_attachment(reference: Dict[str, Any]) -> str:
+    """Return an attachment as text for a request, reading the file if needed"""
+    header = describe_attachment(reference)
+    try:
+        stat = os.stat(reference["path"])
+        text = _cached_excerpt(reference, stat)
+    except (OSError, ValueError) as e:
+        return f"<file {header}>\n[file no longer available: {e}]\n</file>"
+    if stat.st_size != reference["size"] or stat.st_mtime != reference["mtime"]:
+        header += ", changed since it was attached"
+    text = text.rstrip("\n")
+    return f"<file {header}>\n{text}\n</file>"
+
+
+def render_message(message: Dict[str, Any]) -> Dict[str, str]:
+    """Return a message with its attachments expanded into its content"""
+    attachments = message.get("attachments")
+    if not attachments:
+        return message
+    parts = [render_attachment(reference) for reference in attachments]
+    if message.get("content"):
+        parts.append(message["content"])
+    return {"role": message["role"], "content": "\n\n".join(parts)}
+
+
+def has_attachments(messages: List[Dict[str, Any]]) -> bool:
+    """Return True if any message refers to attached files"""
+    return any(message.get("attachments") for message in messages)
+
+
+def render_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Return messages with all attachments expanded"""
+    return [render_message(message) for message in messages]
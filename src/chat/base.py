@@ -1,61 +1,296 @@
 #!/usr/bin/env python3
 """
 Base LLM Chat Provider
-Abstract base class for all LLM providers
+Abstract base classes for conversations and for all LLM providers
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple
+from .attachments import has_attachments, render_messages
+from .coalesce import Flight, as_stream, flight_key, join_flight
+from .compaction import SUMMARY_HEADER
+from .context import ContextWindow, estimate_message_tokens
+from .metrics import begin_timer, end_timer, get_current_timer
+from .keys import KeyLease, get_current_key, key_id
+from .pool import ClientLease, get_client_pool, get_leased_client
+from .ratelimit import model_limits
+from .registry import PROVIDER_SPECS
+from .resilience import RetryPolicy, get_circuit_breaker, is_retryable
+from .runtime import run_sync, iter_sync
+from .usage import new_usage, begin_usage, end_usage, add_usage, get_current_usage
 
+class ConversationChat(ABC):
+    """A conversation with an LLM: history, sessions, compaction and usage
 
-class BaseLLMChat(ABC):
-    """Abstract base class for LLM chat providers"""
-    
-    def __init__(self, api_key: str = None, model: str = None):
-        self.api_key = api_key
+    Subclasses answer requests through _arequest and _astream_request.
+    BaseLLMChat does so by calling a provider with an SDK client of its own;
+    chats that answer through other chats, such as HedgedChat and
+    RoutedChat, subclass this class directly and so own no client at all.
+    """
+
+    # Tokens left free in the context window for the model's reply
+    RESPONSE_TOKEN_RESERVE = 4096
+
+    def __init__(self, model: str = None):
         self.model = model
         self.conversation_history: List[Dict[str, str]] = []
         self.provider_name = self.__class__.__name__.replace('Chat', '').lower()
-        
+        # Limits on the history sent with each request; None means the
+        # model's context window and no message cap respectively
+        self.max_context_tokens: Optional[int] = None
+        self.max_history_messages: Optional[int] = None
+        self._context = ContextWindow()
+        # Token usage of the last request and totals for this instance
+        self.last_usage: Optional[Dict[str, int]] = None
+        self.usage_totals: Dict[str, int] = new_usage()
+        # Timings of the last request, and an optional MetricsLog to append
+        # every request's timings to
+        self.last_metrics: Optional[Dict[str, Any]] = None
+        self.metrics_log = None
+        # Optional Session that completed turns are appended to
+        self.session = None
+        self._saved_upto = 0
+        # Optional Compactor that folds old turns into a running summary
+        # between turns; summary stands in for compacted_messages messages
+        # that are no longer in the history
+        self.compactor = None
+        self.summary: Optional[str] = None
+        self.compacted_messages = 0
+        self._compaction: Optional[Tuple[asyncio.Task, int]] = None
+
     @abstractmethod
     def _get_default_model(self) -> str:
         """Return the default model for this provider"""
         pass
-        
+
     @abstractmethod
     def _get_available_models(self) -> List[str]:
         """Return list of available models for this provider"""
         pass
-        
-    @abstractmethod
-    def _make_api_request(self, messages: List[Dict[str, str]]) -> str:
-        """Make API request to the provider and return response"""
-        pass
-        
+
     @abstractmethod
     def _get_api_key_env_var(self) -> str:
         """Return the environment variable name for the API key"""
         pass
-        
-    def add_message(self, role: str, content: str):
+
+    @abstractmethod
+    async def _arequest(self, messages: List[Dict[str, str]]) -> str:
+        """Answer a request for a message list"""
+        pass
+
+    @abstractmethod
+    async def _astream_request(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Answer a request for a message list, yielding text chunks"""
+        pass
+
+    def _record_usage(self, usage: Dict[str, int]):
+        """Keep the token usage reported for a completed request"""
+        self.last_usage = usage
+        add_usage(self.usage_totals, usage)
+
+    def _record_metrics(self, record: Dict[str, Any]):
+        """Keep the timings of a finished request and log them"""
+        self.last_metrics = record
+        if self.metrics_log is not None:
+            try:
+                self.metrics_log.record(record)
+            except OSError:
+                # Metrics are best-effort, like session persistence
+                pass
+
+    def add_message(self, role: str, content: str, attachments: List[Dict[str, Any]] = None):
         """Add a message to conversation history"""
-        self.conversation_history.append({"role": role, "content": content})
-        
+        message = {"role": role, "content": content}
+        if attachments:
+            # References only; the files are read when a request is sent
+            message["attachments"] = list(attachments)
+        self.conversation_history.append(message)
+        self._context.append(message)
+
     def clear_history(self):
         """Clear conversation history"""
         self.conversation_history = []
-        
-    def get_response(self, user_input: str) -> str:
-        """Get response from LLM provider"""
-        self.add_message("user", user_input)
-        
+        self._context.reset()
+        self._saved_upto = 0
+        self._reset_summary()
+        if self.session is not None:
+            self.session.mark_cleared()
+
+    def load_history(self, messages: List[Dict[str, str]], summary: Optional[str] = None):
+        """Replace conversation history, e.g. with a resumed session"""
+        self.conversation_history = list(messages)
+        self._context.rebuild(self.conversation_history)
+        # Loaded messages are already stored
+        self._saved_upto = len(self.conversation_history)
+        self._reset_summary(summary)
+
+    def _reset_summary(self, summary: Optional[str] = None):
+        """Replace the running summary and forget any compaction in progress"""
+        self.summary = summary
+        self.compacted_messages = 0
+        # A summary still being written describes the old history; it is
+        # left to finish on its own and never applied
+        self._compaction = None
+
+    def _start_compaction(self):
+        """Start summarizing old turns in the background once the history is long enough"""
+        if self.compactor is None or self._compaction is not None:
+            return
+        split = self.compactor.find_split(self.conversation_history, self._context.token_counts)
+        if split is None:
+            return
+        task = asyncio.ensure_future(
+            self.compactor.asummarize(self.summary, self.conversation_history[:split])
+        )
+        # Failures only mean compaction is retried after the next turn
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._compaction = (task, split)
+
+    def _apply_compaction(self):
+        """Replace the summarized turns with the summary if it is ready; never waits"""
+        if self._compaction is None or not self._compaction[0].done():
+            return
+        task, split = self._compaction
+        self._compaction = None
+        if task.cancelled() or task.exception() is not None or not task.result():
+            return
+
+        history = self.conversation_history
+        pinned = [message for message in history[:split] if message["role"] == "system"]
+        removed = split - len(pinned)
+        if self.session is not None:
+            # Resuming starts from this record: the summary plus the turns it
+            # does not cover that were already saved
+            kept = [message for message in history[split:self._saved_upto] if message["role"] != "system"]
+            try:
+                self.session.compact(task.result(), kept)
+            except OSError:
+                pass
+        self.conversation_history = pinned + history[split:]
+        self._context.rebuild(self.conversation_history)
+        self._saved_upto = max(len(pinned), self._saved_upto - removed)
+        self.summary = task.result()
+        self.compacted_messages += removed
+
+    def _rollback(self, length: int):
+        """Drop messages added after the history had the given length"""
+        if len(self.conversation_history) > length:
+            del self.conversation_history[length:]
+            self._context.truncate(length)
+            self._saved_upto = min(self._saved_upto, length)
+
+    def _session_source(self) -> Tuple[str, str]:
+        """Return the provider and model that saved turns are attributed to"""
+        return self.provider_name, self.model
+
+    def _save_turn(self):
+        """Append messages added since the last save to the session"""
+        new_messages = self.conversation_history[self._saved_upto:]
+        if self.session is not None and new_messages:
+            try:
+                provider, model = self._session_source()
+                self.session.append(new_messages, provider, model)
+            except OSError:
+                # Persistence is best-effort; a full disk must not break the
+                # live conversation
+                return
+        self._saved_upto = len(self.conversation_history)
+
+    def get_context_budget(self) -> int:
+        """Return the token budget for the history sent with each request"""
+        entry = PROVIDER_SPECS.get(self.provider_name)
+        window = entry.get_context_window(self.model) if entry else 8192
+        budget = window - self.RESPONSE_TOKEN_RESERVE
+        if self.max_context_tokens is not None:
+            budget = min(budget, self.max_context_tokens)
+        return budget
+
+    def _request_messages(self) -> List[Dict[str, str]]:
+        """Return the part of the history that fits the context budget"""
+        budget = self.get_context_budget()
+        if self.summary is None:
+            return self._context.select(self.conversation_history, budget, self.max_history_messages)
+
+        summary = {"role": "system", "content": SUMMARY_HEADER + self.summary}
+        messages = self._context.select(
+            self.conversation_history,
+            budget - estimate_message_tokens(summary),
+            self.max_history_messages
+        )
+        # After the leading system messages, in place of the compacted turns
+        split = next((i for i, message in enumerate(messages) if message["role"] != "system"), len(messages))
+        return messages[:split] + [summary] + messages[split:]
+
+    async def aget_response(self, user_input: str, attachments: List[Dict[str, Any]] = None) -> str:
+        """Get response from LLM provider asynchronously"""
+        self._apply_compaction()
+        length = len(self.conversation_history)
+        self.add_message("user", user_input, attachments)
+
         try:
-            response = self._make_api_request(self.conversation_history)
-            self.add_message("assistant", response)
-            return response
-        except Exception as e:
+            response = await self._arequest(self._request_messages())
+        except BaseException as e:
+            # A failed turn leaves no trace, so the next request does not
+            # carry an unanswered user message
+            self._rollback(length)
+            if not isinstance(e, Exception):
+                raise
             return f"Error: {str(e)}"
-            
+
+        self.add_message("assistant", response)
+        self._save_turn()
+        self._start_compaction()
+        return response
+
+    async def astream_response(self, user_input: str,
+                               attachments: List[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Stream response from LLM provider asynchronously as it is generated"""
+        self._apply_compaction()
+        length = len(self.conversation_history)
+        self.add_message("user", user_input, attachments)
+
+        chunks = []
+        completed = False
+        try:
+            async for chunk in self._astream_request(self._request_messages()):
+                if chunk:
+                    chunks.append(chunk)
+                    yield chunk
+            completed = True
+        except Exception as e:
+            # Discard the turn, including any partial reply, before reporting
+            self._rollback(length)
+            yield f"Error: {str(e)}"
+            return
+        finally:
+            # Also covers cancellation and the caller abandoning the stream
+            if not completed:
+                self._rollback(length)
+
+        # Record the assembled response once the stream has finished
+        self.add_message("assistant", "".join(chunks))
+        self._save_turn()
+        self._start_compaction()
+
+    async def acomplete(self, messages: List[Dict[str, str]]) -> str:
+        """Get a response for a standalone message list without touching history"""
+        return await self._arequest(messages)
+
+    async def astream_complete(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream a response for a standalone message list without touching history"""
+        async for chunk in self._astream_request(messages):
+            if chunk:
+                yield chunk
+
+    def get_response(self, user_input: str, attachments: List[Dict[str, Any]] = None) -> str:
+        """Get response from LLM provider"""
+        return run_sync(self.aget_response(user_input, attachments))
+
+    def stream_response(self, user_input: str, attachments: List[Dict[str, Any]] = None) -> Iterator[str]:
+        """Stream response from LLM provider as it is generated"""
+        return iter_sync(self.astream_response(user_input, attachments))
+
     def get_provider_info(self) -> Dict[str, Any]:
         """Get provider information"""
         return {
@@ -64,11 +299,390 @@ class BaseLLMChat(ABC):
             "available_models": self._get_available_models(),
             "default_model": self._get_default_model()
         }
-        
+
     def set_model(self, model: str):
         """Set the model to use"""
         available_models = self._get_available_models()
         if model in available_models:
             self.model = model
         else:
-            raise ValueError(f"Model {model} not available. Available models: {available_models}")
\ No newline at end of file
+            raise ValueError(f"Model {model} not available. Available models: {available_models}")
+
+
+class BaseLLMChat(ConversationChat):
+    """Abstract base class for LLM chat providers
+
+    Requests go through the shared pipeline: attachments, response caches,
+    request coalescing, rate limits, key pools, retries and a pooled SDK
+    client from _create_client.
+    """
+
+    # API endpoint; None means the SDK's default
+    BASE_URL = None
+
+    # Whether requests can use a different API key each (see key_pool)
+    SUPPORTS_KEY_POOL = True
+
+    def __init__(self, api_key: str = None, model: str = None):
+        super().__init__(model)
+        self.api_key = api_key
+        # Optional KeyPool that each request attempt leases its key from
+        self.key_pool = None
+        self.base_url = self.BASE_URL
+        # Optional ResponseCache shared with other instances, and an optional
+        # SimilarityCache consulted when it misses
+        self.cache = None
+        self.similarity_cache = None
+        # Share one provider call between identical requests in flight at
+        # the same time
+        self.coalesce_requests = True
+        # Use provider-side prompt caching where the API needs explicit opt-in
+        self.prompt_caching = True
+        # Backoff for transient failures (rate limits, 5xx, network errors)
+        self.retry_policy = RetryPolicy()
+        # Optional RateLimiter shared across processes, and the provider's
+        # rate_limits config it enforces for each model
+        self.rate_limiter = None
+        self.rate_limits: Optional[Dict[str, Any]] = None
+
+    @abstractmethod
+    def _create_client(self) -> Any:
+        """Create the provider's async SDK client"""
+        pass
+
+    @abstractmethod
+    async def _amake_api_request(self, messages: List[Dict[str, str]]) -> str:
+        """Make async API request to the provider and return response"""
+        pass
+
+    async def _astream_api_request(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Make async streaming API request to the provider, yielding text chunks"""
+        # Providers without native streaming fall back to a single chunk
+        yield await self._amake_api_request(messages)
+
+    @property
+    def request_api_key(self) -> Optional[str]:
+        """API key for the request running now: the one leased from key_pool, else api_key"""
+        return get_current_key(self.key_pool) or self.api_key
+
+    def _client_key(self) -> tuple:
+        """Return the key under which this instance's client is pooled"""
+        return (self.provider_name, self.base_url, self.request_api_key)
+
+    def _create_http_client(self) -> Any:
+        """Create an HTTP client with the pool's connection limits"""
+        return get_client_pool().create_http_client()
+
+    def _lease_client(self) -> ClientLease:
+        """Lease the pooled client for the running loop and key, held until the attempt ends"""
+        return get_client_pool().get(self._client_key(), self._create_client).__enter__()
+
+    @property
+    def client(self) -> Any:
+        """Pooled async SDK client for the running event loop
+
+        Inside a request attempt this is the client the attempt leased, so
+        the pool cannot close it while the request or its stream runs.
+        """
+        key = self._client_key()
+        client = get_leased_client(key)
+        if client is not None:
+            return client
+        # Outside the request pipeline, e.g. the sync helpers: hold it only
+        # as long as it takes to look it up
+        with get_client_pool().get(key, self._create_client) as lease:
+            return lease.client
+
+    def _make_api_request(self, messages: List[Dict[str, str]]) -> str:
+        """Make API request to the provider and return response"""
+        return run_sync(self._amake_api_request(messages))
+
+    def _stream_api_request(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Make streaming API request to the provider, yielding text chunks"""
+        return iter_sync(self._astream_api_request(messages))
+
+    async def _arender(self, messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Expand attachment references into text, reading files off the event loop"""
+        if not has_attachments(messages):
+            return messages
+        return await asyncio.get_running_loop().run_in_executor(None, render_messages, messages)
+
+    async def _arequest(self, messages: List[Dict[str, str]]) -> str:
+        """Run a request through the shared request pipeline"""
+        messages = await self._arender(messages)
+        timer, token = begin_timer(self.provider_name, self.model, stream=False)
+        try:
+            response = await self._acached_request(messages)
+        except Exception as e:
+            self._record_metrics(timer.finish(error=e))
+            raise
+        finally:
+            end_timer(token)
+        self._record_metrics(timer.finish(self.last_usage))
+        return response
+
+    def _lookup_cached(self, messages: List[Dict[str, str]]) -> Tuple[Optional[str], Any, Any]:
+        """Return a cached response, if any, and the keys to store a new response under"""
+        key = fingerprint = None
+        if self.cache is not None:
+            key = self.cache.make_key(self.provider_name, self.model, messages)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached, None, None
+        if self.similarity_cache is not None:
+            fingerprint = self.similarity_cache.fingerprint(self.provider_name, self.model, messages)
+            match = self.similarity_cache.get(fingerprint) if fingerprint is not None else None
+            if match is not None:
+                return match[0], None, None
+        return None, key, fingerprint
+
+    def _store_cached(self, key: Any, fingerprint: Any, response: str):
+        """Store a provider response in the caches it was looked up in"""
+        if key is not None:
+            self.cache.set(key, response)
+        if fingerprint is not None:
+            self.similarity_cache.set(fingerprint, response)
+
+    async def _acached_request(self, messages: List[Dict[str, str]]) -> str:
+        """Serve a request from the response caches, or call the provider"""
+        cached, key, fingerprint = self._lookup_cached(messages)
+        if cached is not None:
+            self.last_usage = None
+            get_current_timer().cache_hit = True
+            return cached
+
+        if not self.coalesce_requests:
+            return await self._aprovider_request(messages, key, fingerprint)
+        flight, joined = self._join_flight(
+            messages, lambda flight: as_stream(lambda: self._aprovider_request(messages, key, fingerprint, flight))
+        )
+        response = "".join([chunk async for chunk in flight.follow()])
+        # Set after the last await, so that no other request on this chat
+        # replaces it before the request's metrics are taken
+        self.last_usage = None if joined else flight.usage
+        return response
+
+    async def _aprovider_request(self, messages: List[Dict[str, str]], key: Any, fingerprint: Any,
+                                 flight: Optional[Flight] = None) -> str:
+        """Call the provider, keeping the usage and caching the response"""
+        usage, token = begin_usage()
+        try:
+            response = await self._acall_with_retries(messages)
+        finally:
+            end_usage(token)
+        self._record_usage(usage)
+        if flight is not None:
+            flight.usage = usage
+
+        self._store_cached(key, fingerprint, response)
+        return response
+
+    def _join_flight(self, messages: List[Dict[str, str]], start) -> Tuple[Flight, bool]:
+        """Join an identical request already in flight, or start one with start(flight)
+
+        Returns the flight and whether it was joined. Only the request that
+        started it reports the call's usage.
+        """
+        flight, joined = join_flight(flight_key(self.provider_name, self.base_url, self.model, messages), start)
+        if joined:
+            get_current_timer().coalesced = True
+        return flight, joined
+
+    def _rate_limit_name(self) -> str:
+        """Return the rate limiter bucket for this model and, with a key pool, the leased key"""
+        key = get_current_key(self.key_pool)
+        name = f"{self.provider_name}:{self.model}"
+        return f"{name}:{key_id(key)}" if key else name
+
+    async def _apace(self, messages: List[Dict[str, str]]) -> Optional[Tuple[str, Dict[str, float], int]]:
+        """Wait until the rate limits allow another request; returns the reservation, if any"""
+        limits = model_limits(self.rate_limits, self.model) if self.rate_limiter is not None else None
+        if limits is None:
+            return None
+        name = self._rate_limit_name()
+        tokens = sum(estimate_message_tokens(message) for message in messages)
+        waited = await self.rate_limiter.acquire(name, limits, tokens)
+        timer = get_current_timer()
+        if waited and timer is not None:
+            timer.queued += waited
+        return name, limits, tokens
+
+    def _settle_rate_limit(self, reservation: Optional[Tuple[str, Dict[str, float], int]], served: bool):
+        """Settle an attempt's reservation once it is over
+
+        A served request is charged the tokens it used instead of the
+        estimate. A failed attempt gives back its request and tokens, so
+        retries do not drain a bucket that other processes share.
+        """
+        if reservation is None:
+            return
+        name, limits, estimate = reservation
+        if not served:
+            self.rate_limiter.submit(self.rate_limiter.release, name, limits, estimate)
+            return
+        usage = get_current_usage()
+        used = usage["input_tokens"] + usage["output_tokens"] if usage else 0
+        if used:
+            self.rate_limiter.submit(self.rate_limiter.adjust, name, limits, used - estimate)
+
+    async def _acall_with_retries(self, messages: List[Dict[str, str]]) -> str:
+        """Call the provider, retrying transient failures with backoff"""
+        breaker = get_circuit_breaker(self.provider_name, self.model)
+        attempt = 0
+        while True:
+            lease = KeyLease(self.key_pool)
+            # The attempt's client, held until the call returns so the pool
+            # cannot close it while in use
+            client_lease = None
+            reservation = None
+            served = False
+            try:
+                if lease.wait > 0:
+                    # Every key is cooling down after a 429
+                    await asyncio.sleep(lease.wait)
+                reservation = await self._apace(messages)
+                client_lease = self._lease_client()
+                breaker.before_call()
+                try:
+                    response = await self._amake_api_request(messages)
+                except Exception as e:
+                    lease.fail(e)
+                    if not is_retryable(e):
+                        breaker.release()
+                        raise
+                    if await self._abefore_retry(breaker, lease, attempt, e):
+                        attempt += 1
+                    continue
+                except BaseException:
+                    breaker.release()
+                    raise
+                served = True
+                breaker.record_success()
+                return response
+            finally:
+                self._settle_rate_limit(reservation, served)
+                if client_lease is not None:
+                    client_lease.release()
+                lease.release()
+
+    async def _abefore_retry(self, breaker, lease: KeyLease, attempt: int, exc: Exception) -> bool:
+        """Get ready to retry a failed attempt; returns True if it counts against max_retries
+
+        A rate-limited key is retried at once with another key from the pool,
+        which is no sign that the endpoint is failing. Otherwise the failure is
+        counted, and the retry waits out the backoff or exc is raised again if
+        no retries are left.
+        """
+        if lease.rotated:
+            breaker.release()
+            return False
+        breaker.record_failure()
+        if attempt >= self.retry_policy.max_retries:
+            raise exc
+        await asyncio.sleep(self.retry_policy.get_delay(attempt, exc))
+        return True
+
+    async def _astream_with_retries(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream from the provider, retrying transient failures before the first chunk"""
+        breaker = get_circuit_breaker(self.provider_name, self.model)
+        attempt = 0
+        while True:
+            lease = KeyLease(self.key_pool)
+            # Held until the last chunk, so the pool cannot close it mid-stream
+            client_lease = None
+            reservation = None
+            served = False
+            try:
+                if lease.wait > 0:
+                    # Every key is cooling down after a 429
+                    await asyncio.sleep(lease.wait)
+                reservation = await self._apace(messages)
+                client_lease = self._lease_client()
+                breaker.before_call()
+                started = False
+                try:
+                    async for chunk in self._astream_api_request(messages):
+                        if not started:
+                            # Text already shown cannot be taken back, so from
+                            # here on failures are no longer retried
+                            started = served = True
+                            breaker.record_success()
+                        yield chunk
+                except Exception as e:
+                    if started:
+                        raise
+                    lease.fail(e)
+                    if not is_retryable(e):
+                        breaker.release()
+                        raise
+                    if await self._abefore_retry(breaker, lease, attempt, e):
+                        attempt += 1
+                    continue
+                except BaseException:
+                    if not started:
+                        breaker.release()
+                    raise
+                if not started:
+                    served = True
+                    breaker.record_success()
+                return
+            finally:
+                self._settle_rate_limit(reservation, served)
+                if client_lease is not None:
+                    client_lease.release()
+                lease.release()
+
+    async def _astream_request(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Run a streaming request through the shared request pipeline"""
+        messages = await self._arender(messages)
+        timer, token = begin_timer(self.provider_name, self.model, stream=True)
+        try:
+            async for chunk in self._acached_stream(messages):
+                if chunk:
+                    timer.mark_first_token()
+                yield chunk
+        except Exception as e:
+            self._record_metrics(timer.finish(error=e))
+            raise
+        finally:
+            end_timer(token)
+        self._record_metrics(timer.finish(self.last_usage))
+
+    async def _acached_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Serve a stream from the response caches, or stream from the provider"""
+        cached, key, fingerprint = self._lookup_cached(messages)
+        if cached is not None:
+            self.last_usage = None
+            get_current_timer().cache_hit = True
+            yield cached
+            return
+
+        if not self.coalesce_requests:
+            async for chunk in self._aprovider_stream(messages, key, fingerprint):
+                yield chunk
+            return
+        flight, joined = self._join_flight(
+            messages, lambda flight: self._aprovider_stream(messages, key, fingerprint, flight)
+        )
+        async for chunk in flight.follow():
+            yield chunk
+        # As in _acached_request, with no await before the metrics are taken
+        self.last_usage = None if joined else flight.usage
+
+    async def _aprovider_stream(self, messages: List[Dict[str, str]], key: Any, fingerprint: Any,
+                                flight: Optional[Flight] = None) -> AsyncIterator[str]:
+        """Stream from the provider, keeping the usage and caching the response"""
+        chunks = []
+        usage, token = begin_usage()
+        try:
+            async for chunk in self._astream_with_retries(messages):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            end_usage(token)
+        self._record_usage(usage)
+        if flight is not None:
+            flight.usage = usage
+
+        # Only a stream that ran to completion is worth caching
+        self._store_cached(key, fingerprint, "".join(chunks))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Batch Runner
+Process JSONL prompt files through a bounded pool of async workers
+"""
+
+import asyncio
+import heapq
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, TextIO, Tuple
+from .base import ConversationChat
+
+
+class BatchRunner:
+    """Run JSONL prompts concurrently and append results as JSONL
+
+    Each input line is an object with a "prompt" (or a full "messages" list)
+    and optional "id", "system", "provider" and "model" keys. The output file
+    doubles as the checkpoint: on restart, ids that already have a successful
+    result are skipped, so an interrupted run can simply be started again.
+    """
+
+    def __init__(self, chat_factory: Callable[[str, Optional[str]], ConversationChat],
+                 provider: str, model: str = None, concurrency: int = 8,
+                 ordered: bool = False, progress: TextIO = sys.stderr,
+                 progress_interval: float = 5.0):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.chat_factory = chat_factory
+        self.provider = provider
+        self.model = model
+        self.concurrency = concurrency
+        self.ordered = ordered
+        self.progress = progress
+        self.progress_interval = progress_interval
+        # One chat per (provider, model) shared by all workers, so they share
+        # a client and its connection pool
+        self._chats: Dict[Tuple[str, Optional[str]], ConversationChat] = {}
+        self.stats = {"completed": 0, "failed": 0, "skipped": 0}
+
+    def _get_chat(self, provider: str, model: Optional[str]) -> ConversationChat:
+        """Return the shared chat instance for a provider and model"""
+        key = (provider, model)
+        if key not in self._chats:
+            self._chats[key] = self.chat_factory(provider, model)
+        return self._chats[key]
+
+    @staticmethod
+    def _build_messages(item: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build the message list for one input record"""
+        if "messages" in item:
+            return item["messages"]
+        if "prompt" not in item:
+            raise ValueError("record needs a 'prompt' or 'messages' field")
+        messages = []
+        if item.get("system"):
+            messages.append({"role": "system", "content": item["system"]})
+        messages.append({"role": "user", "content": item["prompt"]})
+        return messages
+
+    @staticmethod
+    def load_checkpoint(output_path: str) -> Set[str]:
+        """Return ids already completed successfully in an existing output file"""
+        done = set()
+        if not os.path.exists(output_path):
+            return done
+
+        with open(output_path, "rb+") as f:
+            data = f.read()
+            # A crash mid-write can leave a partial last line; drop it
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+                data = data[:data.rfind(b"\n") + 1]
+
+        for line in data.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("error") is None:
+                done.add(str(record.get("id")))
+        return done
+
+    async def _process(self, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a single record and build its result"""
+        provider = item.get("provider", self.provider)
+        model = item.get("model", self.model)
+        result = {"id": item.get("id", index), "provider": provider, "model": model}
+        start = time.perf_counter()
+        try:
+            chat = self._get_chat(provider, model)
+            result["model"] = chat.model
+            result["response"] = await chat.acomplete(self._build_messages(item))
+            result["error"] = None
+        except Exception as e:
+            result["response"] = None
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["latency"] = round(time.perf_counter() - start, 4)
+        return result
+
+    def _report(self, start: float, final: bool = False):
+        """Write a progress or summary line with current throughput"""
+        elapsed = time.perf_counter() - start
+        finished = self.stats["completed"] + self.stats["failed"]
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        label = "Done" if final else "Progress"
+        print(f"{label}: {self.stats['completed']} ok, {self.stats['failed']} failed, "
+              f"{self.stats['skipped']} skipped in {elapsed:.1f}s ({rate:.2f} req/s)",
+              file=self.progress, flush=True)
+
+    async def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """Process every pending record in input_path, appending to output_path"""
+        done = self.load_checkpoint(output_path)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results: asyncio.Queue = asyncio.Queue()
+        start = time.perf_counter()
+
+        async def reader():
+            # seq numbers only the records actually queued, so ordered
+            # output has no gaps for records skipped by the checkpoint
+            seq = 0
+            with open(input_path, "r") as f:
+                index = 0
+                for lineno, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        item = json.loads(line)
+                    except ValueError as e:
+                        raise ValueError(f"{input_path}:{lineno}: invalid JSON: {e}")
+                    if not isinstance(item, dict):
+                        raise ValueError(f"{input_path}:{lineno}: record must be a JSON object")
+                    if str(item.get("id", index)) in done:
+                        self.stats["skipped"] += 1
+                    else:
+                        await queue.put((seq, index, item))
+                        seq += 1
+                    index += 1
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def worker():
+            while True:
+                job = await queue.get()
+                if job is None:
+                    break
+                seq, index, item = job
+                await results.put((seq, await self._process(index, item)))
+            await results.put(None)
+
+        async def writer(out):
+            # In ordered mode, results wait in a heap until every earlier
+            # record has been written
+            pending = []
+            next_seq = 0
+            workers_left = self.concurrency
+            last_report = time.perf_counter()
+            while workers_left:
+                entry = await results.get()
+                if entry is None:
+                    workers_left -= 1
+                    continue
+                seq, result = entry
+                self.stats["failed" if result["error"] else "completed"] += 1
+                if self.ordered:
+                    heapq.heappush(pending, (seq, result))
+                    while pending and pending[0][0] == next_seq:
+                        out.write(json.dumps(heapq.heappop(pending)[1]) + "\n")
+                        next_seq += 1
+                else:
+                    out.write(json.dumps(result) + "\n")
+                # Flushing per record keeps the checkpoint current if we crash
+                out.flush()
+                if time.perf_counter() - last_report >= self.progress_interval:
+                    self._report(start)
+                    last_report = time.perf_counter()
+
+        with open(output_path, "a") as out:
+            tasks = [asyncio.ensure_future(reader()), asyncio.ensure_future(writer(out))]
+            tasks += [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        self._report(start, final=True)
+        elapsed = time.perf_counter() - start
+        return dict(self.stats, elapsed=elapsed)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Request Coalescing
+Identical requests in flight at the same time share one provider call
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+def flight_key(provider: str, base_url: Optional[str], model: str,
+               messages: List[Dict[str, Any]]) -> str:
+    """Return a stable hash of a request and the endpoint it goes to"""
+    payload = json.dumps([provider, base_url, model, messages], sort_keys=True,
+                         separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _fresh_error(error: BaseException) -> BaseException:
+    """Return a copy of error for one caller to raise
+
+    Raising the same instance from several tasks would pile every caller's
+    frames onto its one traceback. The copy keeps the type, arguments and
+    attributes (e.g. status_code) that callers inspect, without running the
+    class's __init__ again.
+    """
+    fresh = type(error).__new__(type(error), *error.args)
+    fresh.__dict__.update(getattr(error, "__dict__", {}))
+    return fresh
+
+
+async def as_stream(call: Callable[[], Awaitable[str]]) -> AsyncIterator[str]:
+    """Yield the response of a non-streamed call as a single chunk"""
+    yield await call()
+
+
+class Flight:
+    """One provider call, streamed to every caller that asked for it
+
+    The call runs in a task of its own, so it goes on when the caller that
+    started it stops listening, as long as another caller still listens.
+    Chunks are kept until the call ends, so a caller that joins late gets
+    the whole response. A failure is raised to every caller, each getting
+    its own copy of the error.
+    """
+
+    def __init__(self, key: Tuple, start: Callable[["Flight"], AsyncIterator[str]]):
+        self.key = key
+        self.chunks: List[str] = []
+        # Token usage of the call, set by the source once it is known
+        self.usage: Optional[Dict[str, int]] = None
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.listeners = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(start(self)))
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _pump(self, source: AsyncIterator[str]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        except BaseException as e:
+            # Cancelled after every caller left
+            self.error = e
+            raise
+        finally:
+            self.done = True
+            _forget(self)
+            self._notify()
+
+    async def follow(self) -> AsyncIterator[str]:
+        """Yield the response from its first chunk on, as it arrives"""
+        self.listeners += 1
+        index = 0
+        try:
+            while True:
+                if index < len(self.chunks):
+                    index += 1
+                    yield self.chunks[index - 1]
+                elif self.done:
+                    if self.error is not None:
+                        # The call's own error, and its traceback, is the cause
+                        raise _fresh_error(self.error) from self.error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self.listeners -= 1
+            if not self.listeners and not self.done:
+                # Nobody is left to use the response
+                _forget(self)
+                self.task.cancel()
+
+
+_flights: Dict[Tuple, Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def _forget(flight: Flight):
+    """Stop new callers from joining a flight"""
+    with _flights_lock:
+        if _flights.get(flight.key) is flight:
+            del _flights[flight.key]
+
+
+def join_flight(key: str, start: Callable[[Flight], AsyncIterator[str]]) -> Tuple[Flight, bool]:
+    """Return the flight in progress for key, or a new one whose call is start(flight)
+
+    The second value is True if the call was already in flight. Flights are
+    shared within an event loop only, since their tasks belong to one.
+    """
+    loop_key = (asyncio.get_running_loop(), key)
+    with _flights_lock:
+        flight = _flights.get(loop_key)
+        if flight is not None:
+            return flight, True
+        flight = Flight(loop_key, start)
+        _flights[loop_key] = flight
+        return flight, False
+
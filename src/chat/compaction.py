@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Conversation Compaction
+Summarizes the oldest turns of a long conversation with a cheap model
+"""
+
+from typing import Dict, List, Optional
+
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an AI "
+    "assistant. Merge the previous summary (if any) with the new messages into one "
+    "concise summary. Keep facts, decisions, names, numbers, code identifiers, open "
+    "questions and the user's stated preferences; drop pleasantries and repetition. "
+    "Reply with the summary only."
+)
+
+# Introduces the summary where it stands in for the compacted turns
+SUMMARY_HEADER = "Summary of the earlier part of this conversation:\n"
+
+
+class Compactor:
+    """Decides when a history is due for compaction and produces the summary
+
+    Once the estimated tokens of the non-system messages pass threshold, every
+    message except the newest keep_messages (moved forward to start on a user
+    turn) is folded into the running summary. System messages are never
+    summarized away.
+    """
+
+    def __init__(self, summarizer, threshold: int, keep_messages: int = 6):
+        # BaseLLMChat for the cheap model that writes the summaries
+        self.summarizer = summarizer
+        self.threshold = threshold
+        self.keep_messages = keep_messages
+
+    def find_split(self, history: List[Dict[str, str]], token_counts: List[int]) -> Optional[int]:
+        """Return where the verbatim tail starts, or None if compaction is not due"""
+        tokens = sum(count for message, count in zip(history, token_counts) if message["role"] != "system")
+        if tokens <= self.threshold:
+            return None
+        split = max(0, len(history) - self.keep_messages)
+        while split < len(history) and history[split]["role"] != "user":
+            split += 1
+        if not any(message["role"] != "system" for message in history[:split]):
+            return None
+        return split
+
+    @staticmethod
+    def build_prompt(summary: Optional[str], messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Return the summarization request for a previous summary plus new messages"""
+        parts = []
+        if summary:
+            parts.append(f"Previous summary:\n{summary}")
+        lines = []
+        for message in messages:
+            if message["role"] == "system":
+                continue
+            text = f"{message['role'].upper()}: {message['content']}"
+            # File contents are not resent just to be summarized
+            names = [attachment["path"] for attachment in message.get("attachments") or ()]
+            if names:
+                text += f"\n[attached: {', '.join(names)}]"
+            lines.append(text)
+        transcript = "\n\n".join(lines)
+        parts.append(f"New messages:\n{transcript}")
+        return [
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": "\n\n".join(parts)}
+        ]
+
+    async def asummarize(self, summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """Fold messages into the running summary"""
+        text = await self.summarizer.acomplete(self.build_prompt(summary, messages))
+        return text.strip()
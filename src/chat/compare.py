@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Provider Comparison
+Fan a single prompt out to several providers concurrently
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Any
+from .base import ConversationChat
+
+
+def parse_provider_list(spec: str) -> List[Tuple[str, Optional[str]]]:
+    """Parse "claude,openai:gpt-4o" into (provider, model) pairs"""
+    targets = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        provider, _, model = item.partition(":")
+        targets.append((provider.strip(), model.strip() or None))
+    return targets
+
+
+async def _timed_response(label: str, chat: ConversationChat, prompt: str) -> Dict[str, Any]:
+    """Get a single provider's response along with its latency"""
+    start = time.perf_counter()
+    response = await chat.aget_response(prompt)
+    return {
+        "provider": label,
+        "model": chat.model,
+        "response": response,
+        "latency": time.perf_counter() - start
+    }
+
+
+async def compare_providers(chats: Dict[str, ConversationChat], prompt: str) -> AsyncIterator[Dict[str, Any]]:
+    """Send prompt to all chats at once, yielding each result as it completes"""
+    tasks = [
+        asyncio.ensure_future(_timed_response(label, chat, prompt))
+        for label, chat in chats.items()
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Abandoning the comparison early must not leave requests running
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Context Window
+Per-message token estimates and budget-based trimming of conversation history
+"""
+
+from typing import Any, Dict, List, Optional
+
+
+# Rough characters-per-token ratio shared by the supported tokenizers; exact
+# counts would need each provider's tokenizer and a network round trip
+CHARS_PER_TOKEN = 4
+
+# Per-message overhead for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_message_tokens(message: Dict[str, Any]) -> int:
+    """Estimate the tokens a message contributes to a request"""
+    tokens = estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+    # Attached files are stored by reference, with their excerpt's estimate
+    for attachment in message.get("attachments") or ():
+        tokens += attachment.get("tokens", 0)
+    return tokens
+
+
+class ContextWindow:
+    """Tracks which part of a conversation fits in the model's context
+
+    Token estimates are computed once per message as it is appended. System
+    messages are always kept; other messages are dropped oldest-first until
+    the rest fits the budget. The window start only moves forward while the
+    budget is unchanged, so selecting the window costs amortized O(1) work on
+    top of copying the messages that are sent.
+
+    Once the limits are exceeded, the window is trimmed down to LOW_WATER of
+    them rather than just under them. The start of the prompt then stays
+    byte-identical for several turns, which is what provider-side prefix
+    caching needs to hit.
+    """
+
+    LOW_WATER = 0.75
+
+    def __init__(self):
+        self.token_counts: List[int] = []
+        self.pinned: List[int] = []
+        self.pinned_tokens = 0
+        self.start = 0
+        self.window_tokens = 0
+        self._limits = None
+
+    def reset(self):
+        """Forget all messages"""
+        self.__init__()
+
+    def append(self, message: Dict[str, str]):
+        """Record a message that was appended to the history"""
+        tokens = estimate_message_tokens(message)
+        self.token_counts.append(tokens)
+        if message["role"] == "system":
+            self.pinned.append(len(self.token_counts) - 1)
+            self.pinned_tokens += tokens
+        else:
+            self.window_tokens += tokens
+
+    def truncate(self, length: int):
+        """Forget the messages after the first length, e.g. a failed turn"""
+        while len(self.token_counts) > length:
+            index = len(self.token_counts) - 1
+            tokens = self.token_counts.pop()
+            if self.pinned and self.pinned[-1] == index:
+                self.pinned.pop()
+                self.pinned_tokens -= tokens
+            elif index >= self.start:
+                self.window_tokens -= tokens
+        self.start = min(self.start, len(self.token_counts))
+
+    def rebuild(self, history: List[Dict[str, str]]):
+        """Recompute estimates after the history was replaced wholesale"""
+        self.reset()
+        for message in history:
+            self.append(message)
+
+    @property
+    def total_tokens(self) -> int:
+        """Estimated tokens of the messages currently in the window"""
+        return self.pinned_tokens + self.window_tokens
+
+    def _restart(self):
+        """Reopen the window to the full history after the limits changed"""
+        self.start = 0
+        self.window_tokens = sum(
+            tokens for i, tokens in enumerate(self.token_counts) if i not in self.pinned
+        )
+
+    def select(self, history: List[Dict[str, str]], max_tokens: Optional[int],
+               max_messages: Optional[int] = None) -> List[Dict[str, str]]:
+        """Return the messages to send: pinned system messages plus the newest turns that fit"""
+        if self._limits != (max_tokens, max_messages):
+            self._limits = (max_tokens, max_messages)
+            self._restart()
+
+        pinned = set(self.pinned)
+        budget = None if max_tokens is None else max_tokens - self.pinned_tokens
+        last = len(history) - 1
+
+        def over_limits(ratio: float) -> bool:
+            if budget is not None and self.window_tokens > budget * ratio:
+                return True
+            if max_messages is not None:
+                count = last - self.start + 1 - sum(1 for i in pinned if i >= self.start)
+                return count > max_messages * ratio
+            return False
+
+        if over_limits(1.0):
+            # Always keep at least the newest message, even if it alone is too big
+            while self.start < last and over_limits(self.LOW_WATER):
+                if self.start not in pinned:
+                    self.window_tokens -= self.token_counts[self.start]
+                self.start += 1
+
+        # Providers expect the conversation to resume on a user turn
+        while self.start < last and (self.start in pinned or history[self.start]["role"] != "user"):
+            if self.start not in pinned:
+                self.window_tokens -= self.token_counts[self.start]
+            self.start += 1
+
+        head = [history[i] for i in self.pinned if i < self.start]
+        return head + history[self.start:]
@@ -7,24 +7,17 @@ Factory class for creating LLM provider instances
 import os
 from typing import Dict, Type, Optional, List
 from .base import BaseLLMChat
-from .providers.deepseek import DeepSeekChat
-from .providers.openai import OpenAIChat
-from .providers.claude import ClaudeChat
-from .providers.gemini import GeminiChat
-from .providers.grok import GrokChat
+from .keys import get_key_pool
+from .pool import get_client_pool
+from .registry import PROVIDER_SPECS, ProviderEntry
 
 
 class LLMProviderFactory:
     """Factory for creating LLM provider instances"""
     
-    # Registry of available providers
-    PROVIDERS: Dict[str, Type[BaseLLMChat]] = {
-        "deepseek": DeepSeekChat,
-        "openai": OpenAIChat,
-        "claude": ClaudeChat,
-        "gemini": GeminiChat,
-        "grok": GrokChat
-    }
+    # Registry of available providers; classes (and their SDKs) are
+    # imported only when a provider is actually created
+    PROVIDERS: Dict[str, ProviderEntry] = PROVIDER_SPECS
     
     # Provider aliases for convenience
     ALIASES = {
@@ -52,26 +45,54 @@ class LLMProviderFactory:
         return cls.ALIASES.get(name, name)
     
     @classmethod
-    def create_provider(cls, provider_name: str, api_key: str = None, model: str = None) -> BaseLLMChat:
-        """Create a provider instance"""
+    def get_provider_class(cls, provider_name: str) -> Type[BaseLLMChat]:
+        """Import and return the class for a provider"""
         provider_name = cls.resolve_provider_name(provider_name)
         
         if provider_name not in cls.PROVIDERS:
             available = ", ".join(cls.PROVIDERS.keys())
             raise ValueError(f"Unknown provider: {provider_name}. Available: {available}")
         
-        provider_class = cls.PROVIDERS[provider_name]
+        return cls.PROVIDERS[provider_name].load()
+    
+    @classmethod
+    def create_provider(cls, provider_name: str, api_key: str = None, model: str = None,
+                        base_url: str = None, api_keys: List[str] = None,
+                        key_strategy: str = "least_loaded", key_cooldown: float = 30.0) -> BaseLLMChat:
+        """Create a provider instance, optionally pointed at a different API endpoint
+        
+        With several api_keys, requests are spread over them by key_strategy
+        ("least_loaded" or "round_robin"), and a key that gets a 429 is rested
+        for key_cooldown seconds unless the server says otherwise.
+        """
+        provider_name = cls.resolve_provider_name(provider_name)
+        
+        if provider_name not in cls.PROVIDERS:
+            available = ", ".join(cls.PROVIDERS.keys())
+            raise ValueError(f"Unknown provider: {provider_name}. Available: {available}")
+        
+        entry = cls.PROVIDERS[provider_name]
+        
+        if api_key is None and api_keys:
+            api_key = api_keys[0]
         
         # Try to get API key from environment if not provided
         if api_key is None:
-            instance = provider_class.__new__(provider_class)
-            env_var = instance._get_api_key_env_var()
-            api_key = os.getenv(env_var)
+            api_key = os.getenv(entry.api_key_env)
         
         if api_key is None:
-            raise ValueError(f"API key required for {provider_name}. Set {instance._get_api_key_env_var()} environment variable or provide api_key parameter.")
+            raise ValueError(f"API key required for {provider_name}. Set {entry.api_key_env} environment variable or provide api_key parameter.")
         
-        return provider_class(api_key=api_key, model=model)
+        provider_class = entry.load()
+        chat = provider_class(api_key=api_key, model=model)
+        if base_url:
+            chat.base_url = base_url
+        if api_keys and len(api_keys) > 1 and chat.SUPPORTS_KEY_POOL:
+            chat.key_pool = get_key_pool(provider_name, api_keys, key_strategy, key_cooldown)
+            # Each key has a client of its own; keep them all pooled rather
+            # than closing and reopening connections as the keys take turns
+            get_client_pool().reserve(("keys", provider_name, base_url), len(api_keys))
+        return chat
     
     @classmethod
     def auto_detect_provider(cls, model: str = None) -> str:
@@ -103,15 +124,14 @@ class LLMProviderFactory:
             if provider_name not in cls.PROVIDERS:
                 raise ValueError(f"Unknown provider: {provider_name}")
             
-            # Create a temporary instance to get info
-            provider_class = cls.PROVIDERS[provider_name]
-            temp_instance = provider_class.__new__(provider_class)
+            # Served from the static registry so no SDK gets imported
+            entry = cls.PROVIDERS[provider_name]
             return {
                 "name": provider_name,
-                "class": provider_class.__name__,
-                "default_model": temp_instance._get_default_model(),
-                "available_models": temp_instance._get_available_models(),
-                "api_key_env": temp_instance._get_api_key_env_var()
+                "class": entry.class_name,
+                "default_model": entry.default_model,
+                "available_models": list(entry.available_models),
+                "api_key_env": entry.api_key_env
             }
         else:
             # Return info for all providers
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Hedged Requests
+Race a secondary provider against a slow primary and keep the first answer
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from .base import ConversationChat
+
+
+class _Contender:
+    """One provider's stream, pumped into a queue by its own task"""
+
+    def __init__(self, chat: ConversationChat, messages: List[Dict[str, str]]):
+        self.chat = chat
+        self.label = f"{chat.provider_name}:{chat.model}"
+        self.queue: "asyncio.Queue" = asyncio.Queue()
+        # The whole stream runs in one task so the provider's usage
+        # reporting sees the same context for every chunk
+        self.task = asyncio.ensure_future(self._pump(messages))
+
+    async def _pump(self, messages: List[Dict[str, str]]):
+        try:
+            async for chunk in self.chat._astream_request(messages):
+                self.queue.put_nowait((False, chunk))
+        except Exception as e:
+            self.queue.put_nowait((True, e))
+        else:
+            self.queue.put_nowait((True, None))
+
+    def cancel(self):
+        """Stop the stream, closing its connection"""
+        self.task.cancel()
+
+
+class HedgedChat(ConversationChat):
+    """Sends each turn to a primary provider and, if it is slow, to a secondary too
+
+    The secondary is started when the primary has produced no text after
+    delay seconds, or at once if the primary fails before answering. The
+    first stream to produce text wins and the other is cancelled. Both
+    providers see the same conversation, which is kept here. Requests run
+    through the providers' own pipelines and clients; a hedged chat has
+    neither.
+    """
+
+    def __init__(self, primary: ConversationChat, secondary: ConversationChat, delay: float = 1.0):
+        super().__init__(primary.model)
+        self.primary = primary
+        self.secondary = secondary
+        self.delay = delay
+        self.provider_name = "hedge"
+        # Label ("provider:model") of the provider that answered each turn
+        self.last_winner: Optional[str] = None
+        self.wins: Dict[str, int] = {}
+
+    def _get_default_model(self) -> str:
+        """Return the primary provider's default model"""
+        return self.primary._get_default_model()
+
+    def _get_available_models(self) -> List[str]:
+        """Return the primary provider's models"""
+        return self.primary._get_available_models()
+
+    def _get_api_key_env_var(self) -> str:
+        """Return the primary provider's API key variable"""
+        return self.primary._get_api_key_env_var()
+
+    async def _arequest(self, messages: List[Dict[str, str]]) -> str:
+        """Race the providers and return the winning response"""
+        return "".join([chunk async for chunk in self._astream_request(messages)])
+
+    async def _astream_request(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Race the providers, streaming the first one to produce text"""
+        # Each provider runs its own pipeline (cache, retries, usage)
+        contenders = [_Contender(self.primary, messages)]
+        winner, first = None, None
+        try:
+            winner, first = await self._race(contenders, messages)
+            for other in contenders:
+                if other is not winner:
+                    other.cancel()
+
+            done, value = first
+            while not done:
+                if value:
+                    yield value
+                done, value = await winner.queue.get()
+            if value is not None:
+                raise value
+        finally:
+            # Also stops everything if the caller abandons the stream
+            for contender in contenders:
+                contender.cancel()
+
+        self.last_winner = winner.label
+        self.wins[winner.label] = self.wins.get(winner.label, 0) + 1
+        self.last_metrics = winner.chat.last_metrics
+        self.last_usage = None
+        if winner.chat.last_usage is not None:
+            self._record_usage(winner.chat.last_usage)
+
+    async def _race(self, contenders: List[_Contender],
+                    messages: List[Dict[str, str]]) -> Tuple[_Contender, Tuple[bool, Any]]:
+        """Wait for the first contender to produce text, hedging when the primary is slow"""
+        waiting = {asyncio.ensure_future(contenders[0].queue.get()): contenders[0]}
+        errors = []
+        try:
+            while True:
+                hedged = len(contenders) > 1
+                done, _ = await asyncio.wait(
+                    waiting,
+                    timeout=None if hedged else self.delay,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    contender = waiting.pop(future)
+                    item = future.result()
+                    if item[0] and item[1] is not None:
+                        # Failed before producing any text
+                        errors.append(item[1])
+                    else:
+                        return contender, item
+
+                if not hedged:
+                    # The primary is slow or failed: bring in the secondary
+                    secondary = _Contender(self.secondary, messages)
+                    contenders.append(secondary)
+                    waiting[asyncio.ensure_future(secondary.queue.get())] = secondary
+                elif not waiting:
+                    raise errors[0]
+        finally:
+            for future in waiting:
+                future.cancel()
+
+    def _session_source(self) -> Tuple[str, str]:
+        """Attribute saved turns to the provider that answered them"""
+        if self.last_winner is None:
+            return self.primary.provider_name, self.primary.model
+        provider, _, model = self.last_winner.partition(":")
+        return provider, model
+
+    def get_context_budget(self) -> int:
+        """Return a history budget that fits both providers"""
+        budget = min(self.primary.get_context_budget(), self.secondary.get_context_budget())
+        if self.max_context_tokens is not None:
+            budget = min(budget, self.max_context_tokens)
+        return budget
+
+    def get_provider_info(self) -> Dict[str, Any]:
+        """Get provider information, including hedging statistics"""
+        info = self.primary.get_provider_info()
+        info["name"] = f"{self.primary.provider_name} (hedged with {self.secondary.provider_name}:{self.secondary.model})"
+        info["wins"] = dict(self.wins)
+        return info
+
+    def set_model(self, model: str):
+        """Set the primary provider's model"""
+        self.primary.set_model(model)
+        self.model = self.primary.model
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+API Key Pools
+Spreads requests over several API keys of one provider
+"""
+
+import contextvars
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from .resilience import get_retry_after, get_status_code
+
+
+# (pool, key) leased by the request attempt running in this task, set by the
+# request pipeline in BaseLLMChat and read when the SDK client is chosen
+_current_key: contextvars.ContextVar = contextvars.ContextVar("chatcli_api_key", default=None)
+
+STRATEGIES = ("least_loaded", "round_robin")
+
+
+def get_current_key(pool: Optional["KeyPool"]) -> Optional[str]:
+    """Return the key leased from pool for the request running in this context, if any"""
+    lease = _current_key.get()
+    if lease is None or pool is None or lease[0] is not pool:
+        return None
+    return lease[1]
+
+
+def key_id(key: str) -> str:
+    """Return a short name for a key that is safe to write to logs and files"""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:8]
+
+
+class KeyPool:
+    """Hands out API keys per request attempt
+
+    least_loaded picks the key with the fewest requests in flight;
+    round_robin takes keys in turn. Either way, ties go to the key after the
+    last one handed out, and a key that just got a 429 is skipped until its
+    cool-down (the server's Retry-After, or cooldown seconds) is over.
+    """
+
+    def __init__(self, keys: List[str], strategy: str = "least_loaded", cooldown: float = 30.0):
+        if not keys:
+            raise ValueError("a key pool needs at least one key")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown key strategy: {strategy}. Available: {', '.join(STRATEGIES)}")
+        self.keys = list(keys)
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self._in_flight = [0] * len(self.keys)
+        self._cooling_until = [0.0] * len(self.keys)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Tuple[str, float]:
+        """Lease a key; returns it and how long to wait if every key is cooling down"""
+        count = len(self.keys)
+        with self._lock:
+            now = time.monotonic()
+            ready = [i for i in range(count) if self._cooling_until[i] <= now]
+            wait = 0.0
+            if not ready:
+                index = min(range(count), key=lambda i: self._cooling_until[i])
+                wait = self._cooling_until[index] - now
+            elif self.strategy == "round_robin":
+                index = min(ready, key=lambda i: (i - self._next) % count)
+            else:
+                index = min(ready, key=lambda i: (self._in_flight[i], (i - self._next) % count))
+            self._next = (index + 1) % count
+            self._in_flight[index] += 1
+            return self.keys[index], wait
+
+    def release(self, key: str):
+        """Return a leased key"""
+        with self._lock:
+            self._in_flight[self.keys.index(key)] -= 1
+
+    def report_failure(self, key: str, exc: Exception) -> bool:
+        """Cool a key down if exc is a rate limit; returns True if it was"""
+        if get_status_code(exc) != 429:
+            return False
+        retry_after = get_retry_after(exc)
+        with self._lock:
+            index = self.keys.index(key)
+            until = time.monotonic() + (retry_after if retry_after is not None else self.cooldown)
+            self._cooling_until[index] = max(self._cooling_until[index], until)
+        return True
+
+    def has_ready_key(self) -> bool:
+        """Return True if some key is not cooling down"""
+        now = time.monotonic()
+        with self._lock:
+            return any(until <= now for until in self._cooling_until)
+
+
+class KeyLease:
+    """One request attempt's hold on a key from a pool (or on no pool at all)"""
+
+    def __init__(self, pool: Optional[KeyPool]):
+        self.pool = pool
+        self.key = None
+        self.wait = 0.0
+        self.rotated = False
+        self._token = None
+        if pool is not None:
+            self.key, self.wait = pool.acquire()
+            self._token = _current_key.set((pool, self.key))
+
+    def fail(self, exc: Exception):
+        """Report the attempt's failure; a rate-limited key is cooled down"""
+        if self.pool is not None and self.pool.report_failure(self.key, exc):
+            # Worth retrying at once if another key can take the retry
+            self.rotated = self.pool.has_ready_key()
+
+    def release(self):
+        """End the lease"""
+        if self.pool is None:
+            return
+        self.pool.release(self.key)
+        try:
+            _current_key.reset(self._token)
+        except ValueError:
+            # Generator closed from another context; nothing left to reset
+            pass
+        self.pool = None
+
+
+_pools: Dict[Tuple, KeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_key_pool(provider: str, keys: List[str], strategy: str = "least_loaded",
+                 cooldown: float = 30.0) -> KeyPool:
+    """Return the process-wide pool for a provider's keys, so all chats share its load counts"""
+    pool_key = (provider, tuple(keys))
+    with _pools_lock:
+        pool = _pools.get(pool_key)
+        if pool is None:
+            pool = KeyPool(keys, strategy, cooldown)
+            _pools[pool_key] = pool
+        else:
+            pool.strategy = strategy
+            pool.cooldown = cooldown
+        return pool
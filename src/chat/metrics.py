@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Request Metrics
+Latency and throughput of provider requests, logged as JSONL and Prometheus text
+"""
+
+import atexit
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Timer of the request currently running in this task, set by the request
+# pipeline in BaseLLMChat and read by the HTTP trace hook
+_current_timer: contextvars.ContextVar = contextvars.ContextVar("chatcli_request_timer", default=None)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RequestTimer:
+    """Collects the timings of one request"""
+
+    def __init__(self, provider: str, model: str, stream: bool):
+        self.provider = provider
+        self.model = model
+        self.stream = stream
+        self.start = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.connect: Optional[float] = None
+        self.cache_hit = False
+        # Answered by an identical request that was already in flight
+        self.coalesced = False
+        # Seconds spent waiting for the client-side rate limiter
+        self.queued = 0.0
+        self._connect_started: Optional[float] = None
+
+    def mark_first_token(self):
+        """Note the arrival of the first text chunk"""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self, usage: Optional[Dict[str, int]] = None,
+               error: Optional[BaseException] = None) -> Dict[str, Any]:
+        """Return the metrics record for the finished request"""
+        latency = time.perf_counter() - self.start
+        ttft = None if self.first_token_at is None else self.first_token_at - self.start
+        if self.cache_hit or self.coalesced:
+            # No call of its own, so no tokens; usage may be another
+            # request's, left on a chat that both share
+            usage = None
+        usage = usage or {}
+        output_tokens = usage.get("output_tokens", 0)
+
+        # For streams the rate covers generation only, not the wait for the
+        # first token
+        generation_time = latency - ttft if ttft is not None else latency
+        tokens_per_second = None
+        if output_tokens and generation_time > 0:
+            tokens_per_second = round(output_tokens / generation_time, 1)
+
+        return {
+            "ts": round(time.time(), 3),
+            "provider": self.provider,
+            "model": self.model,
+            "stream": self.stream,
+            "ok": error is None,
+            "error": type(error).__name__ if error is not None else None,
+            "cache_hit": self.cache_hit,
+            "coalesced": self.coalesced,
+            "queued": round(self.queued, 4),
+            "connect": None if self.connect is None else round(self.connect, 4),
+            "ttft": None if ttft is None else round(ttft, 4),
+            "latency": round(latency, 4),
+            "input_tokens": usage.get("input_tokens", 0),
+            "cached_input_tokens": usage.get("cached_input_tokens", 0),
+            "output_tokens": output_tokens,
+            "tokens_per_second": tokens_per_second
+        }
+
+
+def begin_timer(provider: str, model: str, stream: bool) -> Tuple[RequestTimer, contextvars.Token]:
+    """Start timing a request in the current context"""
+    timer = RequestTimer(provider, model, stream)
+    return timer, _current_timer.set(timer)
+
+
+def end_timer(token: contextvars.Token):
+    """Stop associating the current context with the timer started with token"""
+    try:
+        _current_timer.reset(token)
+    except ValueError:
+        # Generator closed from another context; nothing left to reset
+        pass
+
+
+def get_current_timer() -> Optional[RequestTimer]:
+    """Return the timer of the request running in this context, if any"""
+    return _current_timer.get()
+
+
+async def _trace(event_name: str, info: Dict[str, Any]):
+    """httpcore trace callback measuring TCP and TLS connection setup"""
+    timer = _current_timer.get()
+    if timer is None:
+        return
+    if event_name == "connection.connect_tcp.started":
+        timer._connect_started = time.perf_counter()
+    elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+        if timer._connect_started is not None:
+            # Retries may connect more than once; keep the total
+            elapsed = time.perf_counter() - timer._connect_started
+            timer._connect_started = time.perf_counter()
+            timer.connect = (timer.connect or 0.0) + elapsed
+    elif event_name.startswith("http11.send_request_headers") or event_name.startswith("http2.send_request_headers"):
+        timer._connect_started = None
+        if timer.connect is None:
+            # Sent on a reused keep-alive connection
+            timer.connect = 0.0
+
+
+async def on_http_request(request: Any):
+    """httpx request hook that enables connection tracing for timed requests"""
+    if _current_timer.get() is not None:
+        request.extensions["trace"] = _trace
+
+
+def format_metrics(record: Dict[str, Any]) -> str:
+    """Format a metrics record as e.g. "2.31s total, first token 0.42s, 85.3 tok/s\""""
+    parts = [f"{record['latency']:.2f}s total"]
+    if record["ttft"] is not None:
+        parts.append(f"first token {record['ttft']:.2f}s")
+    if record["connect"]:
+        parts.append(f"connect {record['connect']:.2f}s")
+    if record.get("queued"):
+        parts.append(f"rate-limited {record['queued']:.2f}s")
+    if record["tokens_per_second"] is not None:
+        parts.append(f"{record['tokens_per_second']:.1f} tok/s")
+    if record["cache_hit"]:
+        parts.append("cached")
+    if record.get("coalesced"):
+        parts.append("shared with an identical request")
+    return ", ".join(parts)
+
+
+class MetricsLog:
+    """Appends request metrics to a JSONL file
+
+    Once the file passes max_bytes it is renamed to a single older
+    generation (metrics.jsonl.1, replacing the previous one), so the log
+    never takes more than about twice max_bytes. A Prometheus text-format
+    snapshot of the most recent records is written next to it when the
+    process exits, or on demand with write_snapshot().
+    """
+
+    def __init__(self, path: Path, snapshot_path: Optional[Path] = None, snapshot_records: int = 10000,
+                 max_bytes: int = 10000000):
+        self.path = Path(path)
+        self.rotated_path = self.path.with_name(self.path.name + ".1")
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else self.path.with_suffix(".prom")
+        self.snapshot_records = snapshot_records
+        self.max_bytes = max_bytes
+        self._file = None
+        self._lock = threading.Lock()
+
+    def record(self, record: Dict[str, Any]):
+        """Append one request's metrics"""
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+                atexit.register(self.close)
+            self._file.write(line)
+            self._file.flush()
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        """Move the full log aside and start a new one"""
+        try:
+            # Another process may have rotated it already; its new file is
+            # not ours to move
+            if os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino:
+                os.replace(self.path, self.rotated_path)
+        except FileNotFoundError:
+            pass
+        self._file.close()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def load(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the most recent records, oldest first"""
+        records: deque = deque(maxlen=limit or self.snapshot_records)
+        for path in (self.rotated_path, self.path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            # A torn line from a crashed writer
+                            continue
+            except FileNotFoundError:
+                pass
+        return list(records)
+
+    def write_snapshot(self, records: Optional[List[Dict[str, Any]]] = None):
+        """Write the Prometheus text-format snapshot atomically"""
+        if records is None:
+            records = self.load()
+        tmp_path = self.snapshot_path.with_suffix(".prom.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(format_prometheus(records))
+        os.replace(tmp_path, self.snapshot_path)
+
+    def close(self):
+        """Close the log and refresh the snapshot"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+        try:
+            self.write_snapshot()
+        except OSError:
+            pass
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-quantile of sorted values (nearest rank)"""
+    index = min(len(values), max(1, math.ceil(q * len(values)))) - 1
+    return values[index]
+
+
+def summarize(records: Iterable[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Aggregate records per (provider, model)"""
+    groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for record in records:
+        group = groups.setdefault((record["provider"], record["model"]), {
+            "count": 0, "errors": 0, "cache_hits": 0, "coalesced": 0, "input_tokens": 0, "output_tokens": 0,
+            "latency": [], "ttft": [], "connect": [], "tokens_per_second": []
+        })
+        group["count"] += 1
+        if not record["ok"]:
+            group["errors"] += 1
+            continue
+        if record.get("cache_hit"):
+            # Cache hits would drag the latency percentiles towards zero
+            group["cache_hits"] += 1
+            continue
+        if record.get("coalesced"):
+            # So would requests that waited on another one's call
+            group["coalesced"] += 1
+            continue
+        group["input_tokens"] += record.get("input_tokens", 0)
+        group["output_tokens"] += record.get("output_tokens", 0)
+        for field in ("latency", "ttft", "connect", "tokens_per_second"):
+            if record.get(field) is not None:
+                group[field].append(record[field])
+
+    for group in groups.values():
+        for field in ("latency", "ttft", "connect", "tokens_per_second"):
+            group[field].sort()
+    return groups
+
+
+_PROMETHEUS_SUMMARIES = [
+    ("latency", "chatcli_request_latency_seconds", "End-to-end request latency"),
+    ("ttft", "chatcli_time_to_first_token_seconds", "Time until the first streamed token"),
+    ("connect", "chatcli_connect_seconds", "TCP and TLS connection setup time (0 on reused connections)"),
+    ("tokens_per_second", "chatcli_output_tokens_per_second", "Output generation rate")
+]
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_prometheus(records: Iterable[Dict[str, Any]]) -> str:
+    """Render records as Prometheus text exposition format"""
+    groups = summarize(records)
+    lines = []
+
+    for field, name, help_text in _PROMETHEUS_SUMMARIES:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} summary")
+        for (provider, model), group in sorted(groups.items()):
+            values = group[field]
+            if not values:
+                continue
+            labels = f'provider="{_escape_label(provider)}",model="{_escape_label(model)}"'
+            for q in QUANTILES:
+                lines.append(f'{name}{{{labels},quantile="{q}"}} {percentile(values, q)}')
+            lines.append(f"{name}_sum{{{labels}}} {round(sum(values), 4)}")
+            lines.append(f"{name}_count{{{labels}}} {len(values)}")
+
+    counters = [
+        ("chatcli_requests_total", "Requests by outcome", None),
+        ("chatcli_input_tokens_total", "Prompt tokens sent", "input_tokens"),
+        ("chatcli_output_tokens_total", "Tokens generated", "output_tokens")
+    ]
+    for name, help_text, field in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (provider, model), group in sorted(groups.items()):
+            labels = f'provider="{_escape_label(provider)}",model="{_escape_label(model)}"'
+            if field is None:
+                ok = group["count"] - group["errors"] - group["cache_hits"] - group["coalesced"]
+                lines.append(f'{name}{{{labels},outcome="ok"}} {ok}')
+                lines.append(f'{name}{{{labels},outcome="cache_hit"}} {group["cache_hits"]}')
+                lines.append(f'{name}{{{labels},outcome="coalesced"}} {group["coalesced"]}')
+                lines.append(f'{name}{{{labels},outcome="error"}} {group["errors"]}')
+            else:
+                lines.append(f"{name}{{{labels}}} {group[field]}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Client Pool
+Process-wide pool of SDK clients shared by all provider instances
+"""
+
+import asyncio
+import contextvars
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from .metrics import on_http_request
+
+
+# Lease held by the request attempt running in this task, set by the request
+# pipeline in BaseLLMChat and read when a provider asks for its client
+_current_lease: contextvars.ContextVar = contextvars.ContextVar("chatcli_client_lease", default=None)
+
+
+class _Entry:
+    """A pooled client and its bookkeeping"""
+
+    __slots__ = ("client", "loop", "last_used", "leases", "retired")
+
+    def __init__(self, client: Any, loop: asyncio.AbstractEventLoop, now: float):
+        self.client = client
+        self.loop = loop
+        self.last_used = now
+        self.leases = 0
+        # Dropped from the pool; closed when the last lease is released
+        self.retired = False
+
+
+class ClientLease:
+    """A hold on a pooled client; a client is never closed while leased
+
+    Use it as a context manager, or call release() when done. While it is
+    held as a context manager, get_leased_client() returns the client in
+    this task.
+    """
+
+    def __init__(self, pool: "ClientPool", key: Hashable, entry: _Entry):
+        self.pool = pool
+        self.key = key
+        self._entry = entry
+        self._token = None
+        self.released = False
+
+    @property
+    def client(self) -> Any:
+        """Return the leased client"""
+        return self._entry.client
+
+    def release(self):
+        """Give the client back to the pool"""
+        if self._token is not None:
+            try:
+                _current_lease.reset(self._token)
+            except ValueError:
+                # Generator closed from another context; nothing left to reset
+                pass
+            self._token = None
+        if not self.released:
+            self.released = True
+            self.pool._release(self._entry)
+
+    def __enter__(self) -> "ClientLease":
+        self._token = _current_lease.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def get_leased_client(key: Hashable) -> Optional[Any]:
+    """Return the client leased for key by the request running in this context, if any"""
+    lease = _current_lease.get()
+    if lease is None or lease.released or lease.key != key:
+        return None
+    return lease.client
+
+
+class ClientPool:
+    """Shares SDK clients, and their keep-alive connections, between chats
+
+    Clients are keyed on (provider, base_url, api_key) plus the event loop
+    they were created on, since async HTTP connections cannot move between
+    loops. Requests lease a client for as long as they use it. Beyond
+    max_clients the least recently used client that is not leased is
+    closed, and idle clients unused for longer than idle_timeout are closed
+    on the next lookup. A leased client is never closed; the pool grows past
+    its limit instead, and shrinks back as leases end.
+    """
+
+    def __init__(self, max_clients: int = 16, idle_timeout: float = 300.0,
+                 max_connections: int = 100, max_keepalive_connections: int = 20):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self._clients: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._reserved: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_clients: int = None, idle_timeout: float = None,
+                  max_connections: int = None, max_keepalive_connections: int = None):
+        """Update pool limits; connection limits apply to clients created afterwards"""
+        if max_clients is not None:
+            self.max_clients = max_clients
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+        if max_connections is not None:
+            self.max_connections = max_connections
+        if max_keepalive_connections is not None:
+            self.max_keepalive_connections = max_keepalive_connections
+
+    def reserve(self, name: Hashable, clients: int):
+        """Make room for a number of clients under name, e.g. one per key of a key pool"""
+        with self._lock:
+            self._reserved[name] = clients
+
+    @property
+    def capacity(self) -> int:
+        """Return how many clients the pool keeps before closing idle ones"""
+        return max(self.max_clients, sum(self._reserved.values()))
+
+    def create_http_client(self) -> Any:
+        """Create an httpx client with the pool's connection limits"""
+        import httpx
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.idle_timeout
+            ),
+            # Lets request metrics see connection setup time
+            event_hooks={"request": [on_http_request]}
+        )
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> ClientLease:
+        """Lease the pooled client for key on the running loop, creating it if needed"""
+        loop = asyncio.get_running_loop()
+        pool_key = (key, loop)
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            entry = self._clients.get(pool_key)
+            if entry is not None:
+                self._clients.move_to_end(pool_key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                entry = _Entry(factory(), loop, now)
+                self._clients[pool_key] = entry
+            entry.last_used = now
+            entry.leases += 1
+
+            for other_key, other in list(self._clients.items()):
+                if other.leases:
+                    continue
+                if other.loop.is_closed() or now - other.last_used > self.idle_timeout:
+                    evicted.append(other)
+                    del self._clients[other_key]
+            excess = len(self._clients) - self.capacity
+            for other_key, other in list(self._clients.items()):
+                if excess <= 0:
+                    break
+                # Oldest first; clients in use stay however full the pool is
+                if not other.leases:
+                    evicted.append(other)
+                    del self._clients[other_key]
+                    excess -= 1
+
+        for other in evicted:
+            self._close(other.loop, other.client)
+        return ClientLease(self, key, entry)
+
+    def _release(self, entry: _Entry):
+        """End one lease, closing the client if it was retired meanwhile"""
+        with self._lock:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+            close = entry.retired and not entry.leases
+        if close:
+            self._close(entry.loop, entry.client)
+
+    @staticmethod
+    def _close(loop: asyncio.AbstractEventLoop, client: Any):
+        """Close a client on the loop that owns its connections"""
+        close = getattr(client, "close", None)
+        if close is None or loop.is_closed() or not inspect.iscoroutinefunction(close):
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(close())
+        elif loop.is_running():
+            asyncio.run_coroutine_threadsafe(close(), loop)
+
+    def clear(self):
+        """Drop every pooled client, closing each once it is no longer leased"""
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+            idle = []
+            for entry in entries:
+                entry.retired = True
+                if not entry.leases:
+                    idle.append(entry)
+        for entry in idle:
+            self._close(entry.loop, entry.client)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+_pool: Optional[ClientPool] = None
+
+
+def get_client_pool() -> ClientPool:
+    """Return the process-wide client pool"""
+    global _pool
+    if _pool is None:
+        _pool = ClientPool()
+    return _pool
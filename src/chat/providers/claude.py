@@ -4,41 +4,48 @@ Claude Chat Provider (Anthropic)
 """
 
 import os
-from typing import List, Dict
-from anthropic import Anthropic
+from typing import List, Dict, Any, AsyncIterator
+from anthropic import AsyncAnthropic
 from ..base import BaseLLMChat
+from ..registry import PROVIDER_SPECS
+from ..usage import report_usage
 
 
 class ClaudeChat(BaseLLMChat):
     """Anthropic Claude chat provider"""
     
+    CACHE_CONTROL = {"type": "ephemeral"}
+    
     def __init__(self, api_key: str = None, model: str = None):
         super().__init__(api_key, model or self._get_default_model())
-        self.client = Anthropic(api_key=self.api_key)
+        
+    def _create_client(self) -> AsyncAnthropic:
+        """Create the async Anthropic client"""
+        return AsyncAnthropic(
+            api_key=self.request_api_key,
+            base_url=self.base_url,
+            http_client=self._create_http_client(),
+            # Retries are handled by the request pipeline
+            max_retries=0
+        )
         
     def _get_default_model(self) -> str:
         """Return the default model for Claude"""
-        return "claude-3-5-sonnet-20241022"
+        return PROVIDER_SPECS["claude"].default_model
         
     def _get_available_models(self) -> List[str]:
         """Return list of available Claude models"""
-        return [
-            "claude-3-5-sonnet-20241022",
-            "claude-3-5-haiku-20241022",
-            "claude-3-opus-20240229",
-            "claude-3-sonnet-20240229",
-            "claude-3-haiku-20240307"
-        ]
-        
-    def _make_api_request(self, messages: List[Dict[str, str]]) -> str:
-        """Make API request to Claude"""
+        return list(PROVIDER_SPECS["claude"].available_models)
+        
+    def _build_request_kwargs(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Build Messages API arguments from conversation history"""
         # Claude expects system messages to be separate
-        system_message = None
+        system_parts = []
         chat_messages = []
         
         for msg in messages:
             if msg["role"] == "system":
-                system_message = msg["content"]
+                system_parts.append(msg["content"])
             else:
                 chat_messages.append(msg)
         
@@ -48,12 +55,68 @@ class ClaudeChat(BaseLLMChat):
             "messages": chat_messages
         }
         
-        if system_message:
-            kwargs["system"] = system_message
-            
-        response = self.client.messages.create(**kwargs)
+        if system_parts:
+            # e.g. the user's system prompt followed by a conversation summary
+            kwargs["system"] = "\n\n".join(system_parts)
+        
+        if self.prompt_caching:
+            self._add_cache_breakpoints(kwargs)
+        
+        return kwargs
+        
+    def _add_cache_breakpoints(self, kwargs: Dict[str, Any]):
+        """Mark the stable prompt prefix for Anthropic prompt caching"""
+        if "system" in kwargs:
+            kwargs["system"] = [
+                {"type": "text", "text": kwargs["system"], "cache_control": self.CACHE_CONTROL}
+            ]
+        
+        # The breakpoint on the newest message writes the whole prompt to the
+        # cache; the one on the previous request's newest message reads what
+        # that request wrote. With the system prompt that is 3 of the 4
+        # breakpoints the API allows.
+        messages = list(kwargs["messages"])
+        for index in (len(messages) - 1, len(messages) - 3):
+            if index >= 0:
+                messages[index] = self._with_cache_control(messages[index])
+        kwargs["messages"] = messages
+        
+    def _with_cache_control(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of message with a cache breakpoint on its last block"""
+        content = message["content"]
+        if isinstance(content, str):
+            blocks = [{"type": "text", "text": content}]
+        else:
+            blocks = [dict(block) for block in content]
+        blocks[-1]["cache_control"] = self.CACHE_CONTROL
+        return {"role": message["role"], "content": blocks}
+        
+    async def _amake_api_request(self, messages: List[Dict[str, str]]) -> str:
+        """Make async API request to Claude"""
+        response = await self.client.messages.create(**self._build_request_kwargs(messages))
+        self._report_usage(response.usage)
         return response.content[0].text
         
+    async def _astream_api_request(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Make async streaming API request to Claude"""
+        async with self.client.messages.stream(**self._build_request_kwargs(messages)) as stream:
+            async for text in stream.text_stream:
+                yield text
+            message = await stream.get_final_message()
+            self._report_usage(message.usage)
+        
+    def _report_usage(self, usage):
+        """Report token usage, including prompt cache reads and writes"""
+        # Anthropic's input_tokens excludes the cached and cache-written parts
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        report_usage(
+            input_tokens=usage.input_tokens + cache_read + cache_write,
+            output_tokens=usage.output_tokens,
+            cached_input_tokens=cache_read,
+            cache_write_tokens=cache_write
+        )
+        
     def _get_api_key_env_var(self) -> str:
         """Return the environment variable name for Claude API key"""
-        return "ANTHROPIC_API_KEY"
\ No newline at end of file
+        return PROVIDER_SPECS["claude"].api_key_env
\ No newline at end of file
@@ -4,50 +4,87 @@ Gemini Chat Provider (Google)
 """
 
 import os
-from typing import List, Dict
+from typing import List, Dict, Any, AsyncIterator, Tuple
 import google.generativeai as genai
 from ..base import BaseLLMChat
+from ..registry import PROVIDER_SPECS
+from ..usage import report_usage
 
 
 class GeminiChat(BaseLLMChat):
     """Google Gemini chat provider"""
     
+    # genai.configure sets one key for the whole process
+    SUPPORTS_KEY_POOL = False
+    
     def __init__(self, api_key: str = None, model: str = None):
         super().__init__(api_key, model or self._get_default_model())
         genai.configure(api_key=self.api_key)
-        self.client = genai.GenerativeModel(self.model)
-        self.chat_session = None
+        
+    def _create_client(self) -> genai.GenerativeModel:
+        """Create the Gemini model handle (the SDK shares one async client)"""
+        return genai.GenerativeModel(self.model)
+        
+    def _client_key(self) -> tuple:
+        """Model handles are bound to a model, so pool them per model"""
+        return super()._client_key() + (self.model,)
         
     def _get_default_model(self) -> str:
         """Return the default model for Gemini"""
-        return "gemini-2.0-flash"
+        return PROVIDER_SPECS["gemini"].default_model
         
     def _get_available_models(self) -> List[str]:
         """Return list of available Gemini models"""
-        return [
-            "gemini-2.0-flash",
-            "gemini-2.0-flash-lite",
-            "gemini-1.5-pro",
-            "gemini-1.5-flash"
-        ]
-        
-    def _make_api_request(self, messages: List[Dict[str, str]]) -> str:
-        """Make API request to Gemini"""
-        # If this is the first message or we need to reset the chat
-        if self.chat_session is None or len(messages) == 1:
-            self.chat_session = self.client.start_chat(history=[])
-        
-        # Get the last user message
-        user_message = messages[-1]["content"]
-        
-        response = self.chat_session.send_message(user_message)
+        return list(PROVIDER_SPECS["gemini"].available_models)
+        
+    def _build_request(self, messages: List[Dict[str, str]]) -> Tuple[Any, List[Dict[str, Any]]]:
+        """Build the model handle and contents from conversation history"""
+        # Gemini takes the system prompt as model configuration and calls
+        # the assistant role "model"
+        system_parts = []
+        contents = []
+        
+        for msg in messages:
+            if msg["role"] == "system":
+                system_parts.append(msg["content"])
+            else:
+                role = "model" if msg["role"] == "assistant" else "user"
+                contents.append({"role": role, "parts": [msg["content"]]})
+        
+        if system_parts:
+            model = genai.GenerativeModel(self.model, system_instruction="\n\n".join(system_parts))
+        else:
+            model = self.client
+        return model, contents
+        
+    async def _amake_api_request(self, messages: List[Dict[str, str]]) -> str:
+        """Make async API request to Gemini"""
+        model, contents = self._build_request(messages)
+        response = await model.generate_content_async(contents)
+        self._report_usage(response)
         return response.text
         
+    async def _astream_api_request(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Make async streaming API request to Gemini"""
+        model, contents = self._build_request(messages)
+        response = await model.generate_content_async(contents, stream=True)
+        async for chunk in response:
+            # Chunks without parts (e.g. the final safety/finish chunk) carry no text
+            if chunk.parts:
+                yield chunk.text
+        self._report_usage(response)
+        
+    def _report_usage(self, response):
+        """Report token usage, including implicit context-cache hits"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        report_usage(
+            input_tokens=usage.prompt_token_count,
+            output_tokens=usage.candidates_token_count,
+            cached_input_tokens=getattr(usage, "cached_content_token_count", None)
+        )
+        
     def _get_api_key_env_var(self) -> str:
         """Return the environment variable name for Gemini API key"""
-        return "GOOGLE_API_KEY"
-        
-    def clear_history(self):
-        """Clear conversation history and reset chat session"""
-        super().clear_history()
-        self.chat_session = None
\ No newline at end of file
+        return PROVIDER_SPECS["gemini"].api_key_env
\ No newline at end of file
@@ -4,9 +4,11 @@ OpenAI Chat Provider (ChatGPT)
 """
 
 import os
-from typing import List, Dict
-from openai import OpenAI
+from typing import List, Dict, AsyncIterator
+from openai import AsyncOpenAI
 from ..base import BaseLLMChat
+from ..registry import PROVIDER_SPECS
+from ..usage import report_usage
 
 
 class OpenAIChat(BaseLLMChat):
@@ -14,27 +16,63 @@ class OpenAIChat(BaseLLMChat):
     
     def __init__(self, api_key: str = None, model: str = None):
         super().__init__(api_key, model or self._get_default_model())
-        self.client = OpenAI(api_key=self.api_key)
+        
+    def _create_client(self) -> AsyncOpenAI:
+        """Create the async OpenAI client"""
+        return AsyncOpenAI(
+            api_key=self.request_api_key,
+            base_url=self.base_url,
+            http_client=self._create_http_client(),
+            # Retries are handled by the request pipeline
+            max_retries=0
+        )
         
     def _get_default_model(self) -> str:
         """Return the default model for OpenAI"""
-        return "gpt-4o-mini"
+        return PROVIDER_SPECS["openai"].default_model
         
     def _get_available_models(self) -> List[str]:
         """Return list of available OpenAI models"""
-        return [
-            "gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "gpt-4",
-            "gpt-3.5-turbo", "o1-preview", "o1-mini"
-        ]
+        return list(PROVIDER_SPECS["openai"].available_models)
         
-    def _make_api_request(self, messages: List[Dict[str, str]]) -> str:
-        """Make API request to OpenAI"""
-        response = self.client.chat.completions.create(
+    async def _amake_api_request(self, messages: List[Dict[str, str]]) -> str:
+        """Make async API request to OpenAI"""
+        response = await self.client.chat.completions.create(
             model=self.model,
             messages=messages
         )
+        self._report_usage(response.usage)
         return response.choices[0].message.content
         
+    async def _astream_api_request(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Make async streaming API request to OpenAI"""
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            # Usage arrives on a final chunk with no choices
+            if getattr(chunk, "usage", None):
+                self._report_usage(chunk.usage)
+        
+    def _report_usage(self, usage):
+        """Report token usage, including prefix-cache hits"""
+        if usage is None:
+            return
+        # OpenAI and xAI report cache hits in prompt_tokens_details; DeepSeek
+        # uses its own prompt_cache_hit_tokens field
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or getattr(usage, "prompt_cache_hit_tokens", None)
+        report_usage(
+            input_tokens=usage.prompt_tokens,
+            output_tokens=usage.completion_tokens,
+            cached_input_tokens=cached
+        )
+        
     def _get_api_key_env_var(self) -> str:
         """Return the environment variable name for OpenAI API key"""
-        return "OPENAI_API_KEY"
\ No newline at end of file
+        return PROVIDER_SPECS["openai"].api_key_env
\ No newline at end of file
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Rate Limiting
+Request and token buckets for provider limits, shared by all chatcli processes
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): buckets are shared between threads only
+    fcntl = None
+
+
+# Most a bucket holds, in seconds of its rate: after a quiet spell this much
+# traffic goes through at once before pacing starts
+BURST_SECONDS = 10
+
+# Buckets idle this long are full again and are dropped from the state file
+IDLE_SECONDS = 3600
+
+LIMIT_KEYS = ("requests_per_minute", "tokens_per_minute")
+
+
+def model_limits(config: Optional[Dict[str, Any]], model: str) -> Optional[Dict[str, float]]:
+    """Return the limits for a model from a provider's rate_limits config, or None
+
+    The provider-wide limits apply to each model separately, as providers
+    enforce them, and config["models"][model] overrides them per model.
+    """
+    if not config:
+        return None
+    limits = {key: config[key] for key in LIMIT_KEYS if config.get(key)}
+    limits.update((config.get("models") or {}).get(model) or {})
+    limits = {key: value for key, value in limits.items() if key in LIMIT_KEYS and value}
+    return limits or None
+
+
+class RateLimiter:
+    """Token buckets kept in a small file that every process locks while updating
+
+    A reservation is always granted at once and may drive a bucket below zero;
+    the caller then waits until the debt has been refilled. Callers that come
+    later see the debt and wait behind it, so concurrent processes and threads
+    are paced in arrival order instead of failing or retrying. The file is
+    read and written in a worker thread when used from an event loop.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._file = os.fdopen(fd, "r+b")
+        return self._file
+
+    def _update(self, name: str, limits: Dict[str, float], requests: float, tokens: float) -> float:
+        """Take from a bucket pair and return how long the caller has to wait"""
+        with self._lock:
+            f = self._open()
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                data = f.read()
+                try:
+                    state = json.loads(data) if data else {}
+                except ValueError:
+                    # Torn by a crash mid-write; start from full buckets
+                    state = {}
+
+                now = time.time()
+                bucket = state.get(name, {})
+                elapsed = max(0.0, now - bucket.get("updated", now))
+                wait = 0.0
+                for kind, amount in (("requests", requests), ("tokens", tokens)):
+                    rate = limits.get(f"{kind}_per_minute")
+                    if not rate:
+                        continue
+                    per_second = rate / 60
+                    capacity = per_second * BURST_SECONDS
+                    level = min(capacity, bucket.get(kind, capacity) + elapsed * per_second) - amount
+                    bucket[kind] = min(capacity, level)
+                    if level < 0:
+                        wait = max(wait, -level / per_second)
+                bucket["updated"] = now
+                state[name] = bucket
+                for other in [key for key, value in state.items() if now - value.get("updated", 0) > IDLE_SECONDS]:
+                    del state[other]
+
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return wait
+
+    def reserve(self, name: str, limits: Dict[str, float], tokens: float = 0) -> float:
+        """Reserve one request and tokens; returns the seconds to wait before sending it"""
+        return self._update(name, limits, 1, tokens)
+
+    def adjust(self, name: str, limits: Dict[str, float], tokens: float):
+        """Charge (or refund, if negative) tokens once a request's real usage is known"""
+        if tokens and limits.get("tokens_per_minute"):
+            self._update(name, limits, 0, tokens)
+
+    def release(self, name: str, limits: Dict[str, float], tokens: float = 0):
+        """Give back a reservation whose request was not served"""
+        self._update(name, limits, -1, -tokens)
+
+    def submit(self, update: Callable[..., Any], *args):
+        """Run adjust() or release() off the event loop, if called on one, without waiting for it"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            update(*args)
+            return
+        future = loop.run_in_executor(None, update, *args)
+        # Best-effort, like reservations failing to persist
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    async def acquire(self, name: str, limits: Dict[str, float], tokens: float = 0) -> float:
+        """Wait until a request may be sent; returns the seconds waited"""
+        wait = await asyncio.get_running_loop().run_in_executor(None, self.reserve, name, limits, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def close(self):
+        """Close the state file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Provider Registry
+Static provider metadata and lazily imported provider classes
+"""
+
+import importlib
+from typing import Dict, List, Type
+
+
+class ProviderEntry:
+    """Registry entry that imports its provider module on first use"""
+
+    def __init__(self, name: str, module: str, class_name: str, default_model: str,
+                 available_models: List[str], api_key_env: str, context_window: int,
+                 model_context_windows: Dict[str, int] = None, summary_model: str = None):
+        self.name = name
+        self.module = module
+        self.class_name = class_name
+        self.default_model = default_model
+        self.available_models = available_models
+        self.api_key_env = api_key_env
+        self.context_window = context_window
+        self.model_context_windows = model_context_windows or {}
+        # Cheap model used for background work such as conversation summaries
+        self.summary_model = summary_model or default_model
+        self._provider_class = None
+
+    def get_context_window(self, model: str) -> int:
+        """Return the context window in tokens for a model of this provider"""
+        return self.model_context_windows.get(model, self.context_window)
+
+    def load(self) -> Type:
+        """Import the provider module and return the provider class"""
+        if self._provider_class is None:
+            module = importlib.import_module(self.module, package=__package__)
+            self._provider_class = getattr(module, self.class_name)
+        return self._provider_class
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._provider_class is not None else "lazy"
+        return f"<ProviderEntry {self.name} -> {self.module}.{self.class_name} ({state})>"
+
+
+# Metadata lives here rather than on the provider classes so that listing
+# providers or models never has to import the provider SDKs
+PROVIDER_SPECS: Dict[str, ProviderEntry] = {
+    "deepseek": ProviderEntry(
+        name="deepseek",
+        module=".providers.deepseek",
+        class_name="DeepSeekChat",
+        default_model="deepseek-chat",
+        available_models=["deepseek-chat", "deepseek-reasoner"],
+        api_key_env="DEEPSEEK_API_KEY",
+        context_window=64000,
+        summary_model="deepseek-chat"
+    ),
+    "openai": ProviderEntry(
+        name="openai",
+        module=".providers.openai",
+        class_name="OpenAIChat",
+        default_model="gpt-4o-mini",
+        available_models=[
+            "gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "gpt-4",
+            "gpt-3.5-turbo", "o1-preview", "o1-mini"
+        ],
+        api_key_env="OPENAI_API_KEY",
+        context_window=128000,
+        model_context_windows={"gpt-4": 8192, "gpt-3.5-turbo": 16385, "gpt-4.1": 1047576},
+        summary_model="gpt-4o-mini"
+    ),
+    "claude": ProviderEntry(
+        name="claude",
+        module=".providers.claude",
+        class_name="ClaudeChat",
+        default_model="claude-3-5-sonnet-20241022",
+        available_models=[
+            "claude-3-5-sonnet-20241022",
+            "claude-3-5-haiku-20241022",
+            "claude-3-opus-20240229",
+            "claude-3-sonnet-20240229",
+            "claude-3-haiku-20240307"
+        ],
+        api_key_env="ANTHROPIC_API_KEY",
+        context_window=200000,
+        summary_model="claude-3-5-haiku-20241022"
+    ),
+    "gemini": ProviderEntry(
+        name="gemini",
+        module=".providers.gemini",
+        class_name="GeminiChat",
+        default_model="gemini-2.0-flash",
+        available_models=[
+            "gemini-2.0-flash",
+            "gemini-2.0-flash-lite",
+            "gemini-1.5-pro",
+            "gemini-1.5-flash"
+        ],
+        api_key_env="GOOGLE_API_KEY",
+        context_window=1048576,
+        model_context_windows={"gemini-1.5-pro": 2097152},
+        summary_model="gemini-2.0-flash-lite"
+    ),
+    "grok": ProviderEntry(
+        name="grok",
+        module=".providers.grok",
+        class_name="GrokChat",
+        default_model="grok-4",
+        available_models=["grok-4", "grok-3", "grok-3-mini", "grok-beta"],
+        api_key_env="XAI_API_KEY",
+        context_window=131072,
+        model_context_windows={"grok-4": 256000},
+        summary_model="grok-3-mini"
+    ),
+}
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Resilience
+Retry with jittered exponential backoff and per-endpoint circuit breakers
+"""
+
+import email.utils
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open"""
+
+    def __init__(self, provider: str, model: str, retry_in: float):
+        super().__init__(f"{provider}/{model} is failing; not retrying for another {retry_in:.0f}s")
+        self.provider = provider
+        self.model = model
+        self.retry_in = retry_in
+
+
+def get_status_code(exc: Exception) -> Optional[int]:
+    """Return the HTTP status of an SDK error, if it carries one"""
+    # openai/anthropic errors expose status_code; google.api_core uses code
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Return True for transient failures: rate limits, server errors and network errors"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = get_status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    # Connection and timeout errors carry no status; match them by class
+    # name so that no SDK has to be imported here
+    for cls in type(exc).__mro__:
+        if "Connection" in cls.__name__ or "Timeout" in cls.__name__:
+            return True
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def get_retry_after(exc: Exception) -> Optional[float]:
+    """Return the server's requested delay in seconds, if any"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        # Retry-After may also be an HTTP date
+        parsed = email.utils.parsedate_to_datetime(value)
+        if parsed is None:
+            return None
+        return max(0.0, parsed.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honors Retry-After"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 30.0, max_retry_after: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def get_delay(self, attempt: int, exc: Exception) -> float:
+        """Return how long to wait before retry number attempt (0-based)"""
+        retry_after = get_retry_after(exc)
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Fails fast after repeated transient failures of one endpoint
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail immediately for reset_timeout seconds. After that a single trial
+    call is let through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    def __init__(self, provider: str, model: str, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        self.provider = provider
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Return "closed", "open" or "half-open\""""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(self.provider, self.model, retry_in)
+
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        """Count a transient failure, opening the circuit at the threshold"""
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        """End a call that neither succeeded nor failed transiently"""
+        with self._lock:
+            self._trial_running = False
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+# Defaults for breakers created from now on; see configure_circuit_breakers
+_breaker_settings = {"failure_threshold": 5, "reset_timeout": 30.0}
+
+
+def configure_circuit_breakers(failure_threshold: int = None, reset_timeout: float = None):
+    """Set the thresholds used by circuit breakers"""
+    with _breakers_lock:
+        if failure_threshold is not None:
+            _breaker_settings["failure_threshold"] = failure_threshold
+        if reset_timeout is not None:
+            _breaker_settings["reset_timeout"] = reset_timeout
+        for breaker in _breakers.values():
+            breaker.failure_threshold = _breaker_settings["failure_threshold"]
+            breaker.reset_timeout = _breaker_settings["reset_timeout"]
+
+
+def get_circuit_breaker(provider: str, model: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker for a provider and model"""
+    key = (provider, model)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(provider, model, **_breaker_settings)
+            _breakers[key] = breaker
+        return breaker
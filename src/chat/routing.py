@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Latency-Aware Routing
+Send each request to the fastest healthy model of an equivalence group
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from .base import BaseLLMChat, ConversationChat
+from .resilience import get_circuit_breaker
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): statistics are shared between threads only
+    fcntl = None
+
+
+# Provider name that selects routing instead of a single provider
+AUTO_PROVIDER = "auto"
+
+# Weight of each new observation in the moving averages
+EWMA_ALPHA = 0.2
+
+# Reply length, in tokens, that candidates are compared at: a model's expected
+# time is its time to first token plus this many tokens at its output rate
+REFERENCE_TOKENS = 200
+
+# Candidates failing more often than this are only used when no other is left
+MAX_ERROR_RATE = 0.5
+
+# Share of requests sent to the candidate measured longest ago, so that the
+# statistics of slower or failing models are refreshed now and then
+EXPLORE_RATE = 0.05
+
+
+def _ewma(average: Optional[float], value: float) -> float:
+    return value if average is None else average + EWMA_ALPHA * (value - average)
+
+
+def expected_seconds(entry: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Return a candidate's expected time for a reference-length reply, or None if unmeasured"""
+    if not entry or not entry.get("samples"):
+        return None
+    if entry.get("ttft") is None:
+        # Only measured without streaming, as whole replies
+        return entry.get("latency")
+    seconds = entry["ttft"]
+    if entry.get("tps"):
+        seconds += REFERENCE_TOKENS / entry["tps"]
+    return seconds
+
+
+class LatencyStats:
+    """Moving averages of each provider:model's speed and error rate
+
+    Kept in a small JSON file that every process locks while reading or
+    updating it, so all chatcli processes learn from each other's requests
+    and the averages survive between runs. The async methods do the file
+    work in a worker thread, so a contended file does not stall the loop.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._file = os.fdopen(fd, "r+b")
+        return self._file
+
+    def _locked(self, update: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Read the state, applying and writing back update if given"""
+        with self._lock:
+            f = self._open()
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if update else fcntl.LOCK_SH)
+            try:
+                f.seek(0)
+                data = f.read()
+                try:
+                    state = json.loads(data) if data else {}
+                except ValueError:
+                    # Torn by a crash mid-write; start measuring afresh
+                    state = {}
+                if update is not None:
+                    update(state)
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+                    f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return state
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Return the averages per "provider:model\""""
+        return self._locked()
+
+    def observe(self, record: Dict[str, Any]):
+        """Fold a finished request's metrics record into the averages"""
+        if (record.get("cache_hit") or record.get("coalesced")
+                or record.get("error") == "CircuitOpenError"):
+            # None of these says anything about the provider's speed or health
+            return
+        label = f"{record['provider']}:{record['model']}"
+
+        def update(state: Dict[str, Any]):
+            entry = state.setdefault(label, {"samples": 0, "errors": 0.0})
+            entry["errors"] = _ewma(entry["errors"], 0.0 if record["ok"] else 1.0)
+            if record["ok"]:
+                # Time spent waiting for the client-side rate limiter is not
+                # the provider's doing
+                queued = record.get("queued") or 0.0
+                if record.get("stream") and record.get("ttft") is not None:
+                    entry["ttft"] = _ewma(entry.get("ttft"), max(0.0, record["ttft"] - queued))
+                    if record.get("tokens_per_second"):
+                        entry["tps"] = _ewma(entry.get("tps"), record["tokens_per_second"])
+                else:
+                    # Without a first token, only the whole reply's time is known
+                    entry["latency"] = _ewma(entry.get("latency"), max(0.0, record["latency"] - queued))
+                entry["samples"] += 1
+            entry["updated"] = record["ts"]
+
+        self._locked(update)
+
+    async def aload(self) -> Dict[str, Dict[str, Any]]:
+        """Return the averages, reading the file off the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.load)
+
+    async def aobserve(self, record: Dict[str, Any]):
+        """Fold a record into the averages, updating the file off the event loop"""
+        await asyncio.get_running_loop().run_in_executor(None, self.observe, record)
+
+    def close(self):
+        """Close the state file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class RoutedChat(ConversationChat):
+    """Sends each request to the fastest healthy chat of an equivalence group
+
+    Candidates are ranked by their moving averages of time to first token and
+    output rate. Unmeasured candidates go first so that every one gets
+    measured; those whose circuit breaker is open or whose error rate is over
+    MAX_ERROR_RATE go last. A request that fails before producing any text
+    moves on to the next candidate. The conversation is kept here, so every
+    candidate sees all of it. Requests run through the candidates' own
+    pipelines and clients; a routed chat has neither.
+    """
+
+    def __init__(self, group: str, candidates: List[BaseLLMChat], stats: LatencyStats):
+        super().__init__(group)
+        self.group = group
+        self.candidates = candidates
+        self.stats = stats
+        self.provider_name = AUTO_PROVIDER
+        # Label ("provider:model") of the candidate that answered each request
+        self.last_route: Optional[str] = None
+        self.routes: Dict[str, int] = {}
+
+    @staticmethod
+    def _label(chat: BaseLLMChat) -> str:
+        return f"{chat.provider_name}:{chat.model}"
+
+    def _get_default_model(self) -> str:
+        """Return the group name"""
+        return self.group
+
+    def _get_available_models(self) -> List[str]:
+        """Return the group's candidates"""
+        return [self._label(chat) for chat in self.candidates]
+
+    def _get_api_key_env_var(self) -> str:
+        """Return the first candidate's API key variable"""
+        return self.candidates[0]._get_api_key_env_var()
+
+    def rank(self, state: Optional[Dict[str, Dict[str, Any]]] = None) -> List[BaseLLMChat]:
+        """Return the candidates in the order to try them, fastest healthy first
+
+        state is the statistics to rank by; they are loaded if not given.
+        """
+        if state is None:
+            state = self.stats.load()
+        healthy, failing = [], []
+        for chat in self.candidates:
+            entry = state.get(self._label(chat))
+            if (get_circuit_breaker(chat.provider_name, chat.model).state == "open"
+                    or (entry and entry["errors"] > MAX_ERROR_RATE)):
+                failing.append(chat)
+            else:
+                healthy.append(chat)
+
+        def order(chat: BaseLLMChat) -> Tuple[bool, float]:
+            seconds = expected_seconds(state.get(self._label(chat)))
+            return seconds is not None, seconds or 0.0
+
+        ranked = sorted(healthy, key=order) + sorted(failing, key=order)
+        if len(ranked) > 1 and random.random() < EXPLORE_RATE:
+            stalest = min(ranked, key=lambda chat: state.get(self._label(chat), {}).get("updated", 0))
+            if get_circuit_breaker(stalest.provider_name, stalest.model).state != "open":
+                ranked.remove(stalest)
+                ranked.insert(0, stalest)
+        return ranked
+
+    async def _arank(self) -> List[BaseLLMChat]:
+        """Rank the candidates, loading the statistics off the event loop"""
+        return self.rank(await self.stats.aload())
+
+    async def _aobserve(self, record: Optional[Dict[str, Any]]):
+        """Learn from the metrics record of the request a candidate just finished"""
+        if record is None:
+            return
+        try:
+            await self.stats.aobserve(record)
+        except OSError:
+            # Statistics are best-effort, like metrics
+            pass
+
+    def _routed(self, chat: BaseLLMChat):
+        """Note the candidate that answered a request"""
+        label = self._label(chat)
+        self.last_route = label
+        self.routes[label] = self.routes.get(label, 0) + 1
+        self.last_metrics = chat.last_metrics
+        self.last_usage = None
+        if chat.last_usage is not None:
+            self._record_usage(chat.last_usage)
+
+    async def _arequest(self, messages: List[Dict[str, str]]) -> str:
+        """Send the request to the best candidate, falling back to the next on failure"""
+        errors = []
+        for chat in await self._arank():
+            # Each candidate runs its own pipeline (cache, retries, usage)
+            chat.last_metrics = None
+            try:
+                response = await chat._arequest(messages)
+            except Exception as e:
+                await self._aobserve(chat.last_metrics)
+                errors.append(e)
+                continue
+            # Taken before awaiting, as other requests may reuse the chat
+            record = chat.last_metrics
+            self._routed(chat)
+            await self._aobserve(record)
+            return response
+        raise errors[0]
+
+    async def _astream_request(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream from the best candidate, falling back to the next if it fails before any text"""
+        errors = []
+        for chat in await self._arank():
+            chat.last_metrics = None
+            started = False
+            try:
+                async for chunk in chat._astream_request(messages):
+                    if chunk:
+                        started = True
+                    yield chunk
+            except Exception as e:
+                await self._aobserve(chat.last_metrics)
+                if started:
+                    # Text already shown cannot be taken back
+                    raise
+                errors.append(e)
+                continue
+            record = chat.last_metrics
+            self._routed(chat)
+            await self._aobserve(record)
+            return
+        raise errors[0]
+
+    def _session_source(self) -> Tuple[str, str]:
+        """Attribute saved turns to the candidate that answered them"""
+        if self.last_route is None:
+            return self.provider_name, self.group
+        provider, _, model = self.last_route.partition(":")
+        return provider, model
+
+    def get_context_budget(self) -> int:
+        """Return a history budget that fits every candidate"""
+        budget = min(chat.get_context_budget() for chat in self.candidates)
+        if self.max_context_tokens is not None:
+            budget = min(budget, self.max_context_tokens)
+        return budget
+
+    def get_provider_info(self) -> Dict[str, Any]:
+        """Get provider information, including each candidate's statistics"""
+        info = super().get_provider_info()
+        info["name"] = f"{AUTO_PROVIDER} (group {self.group})"
+        state = self.stats.load()
+        info["routes"] = {
+            self._label(chat): dict(state.get(self._label(chat), {}), requests=self.routes.get(self._label(chat), 0))
+            for chat in self.candidates
+        }
+        return info
+
+    def set_model(self, model: str):
+        """Routed chats choose the model per request"""
+        raise ValueError(f"Models are picked per request from group {self.group}; "
+                         f"use /switch to pick a provider yourself")
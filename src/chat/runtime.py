@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Async Runtime
+Background event loop used to drive the async provider API from sync code
+"""
+
+import asyncio
+import queue
+import threading
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared runtime loop, starting its thread on first use"""
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="chatcli-runtime", daemon=True)
+            _thread.start()
+    return _loop
+
+
+def in_runtime_thread() -> bool:
+    """Return True when called from the runtime loop's own thread"""
+    return _thread is not None and threading.current_thread() is _thread
+
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """Run a coroutine on the runtime loop and block until it completes"""
+    if in_runtime_thread():
+        raise RuntimeError("run_sync() cannot be called from the runtime loop; await the coroutine instead")
+
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result()
+    except BaseException:
+        # Ctrl-C in the calling thread must not leave the request running
+        future.cancel()
+        raise
+
+
+def iter_sync(aiterator: AsyncIterator[Any]) -> Iterator[Any]:
+    """Iterate an async generator from sync code via the runtime loop"""
+    # The whole iteration runs as one task on the runtime loop, so context
+    # variables set by the generator stay visible across items
+    items: "queue.Queue" = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in aiterator:
+                items.put((False, item))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            items.put((True, e))
+        else:
+            items.put((True, None))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_loop())
+    try:
+        while True:
+            done, value = items.get()
+            if done:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        # Stops the generator (closing any open HTTP stream) on early exit
+        future.cancel()
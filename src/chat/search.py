@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Session Search
+BM25-ranked full-text index over the turns of saved sessions
+"""
+
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+def build_query(terms: str) -> str:
+    """Turn free text into an FTS5 query that matches turns containing every word
+
+    Words are quoted so that punctuation and FTS5 operators in the input are
+    taken literally; a trailing * keeps its prefix-match meaning.
+    """
+    words = re.findall(r"(\w+)(\*?)", terms)
+    return " ".join(f'"{word}"{star}' for word, star in words)
+
+
+def turn_text(messages: List[Dict[str, Any]]) -> str:
+    """Return the searchable text of a turn"""
+    parts = []
+    for message in messages:
+        if message["role"] == "system":
+            continue
+        parts.append(message.get("content") or "")
+        for attachment in message.get("attachments") or ():
+            parts.append(attachment["path"])
+    return "\n".join(parts)
+
+
+class SearchIndex:
+    """Inverted index of saved turns in an SQLite FTS5 table
+
+    SessionStore adds each turn as it is appended, so the index stays current
+    without rebuilds. Each session's indexed byte count is kept alongside, and
+    sync() reads only what is past it, which covers sessions saved before the
+    index existed or while it could not be written.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS turns USING fts5("
+            " text, session UNINDEXED, position UNINDEXED, created UNINDEXED,"
+            " tokenize = 'porter unicode61')"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " indexed INTEGER NOT NULL)"
+        )
+
+    def is_empty(self) -> bool:
+        """Return True if no session has been indexed yet"""
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None
+
+    def _indexed(self, session_id: str) -> int:
+        row = self._db.execute("SELECT indexed FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _insert(self, session_id: str, position: int, created: float, messages: List[Dict[str, Any]]):
+        text = turn_text(messages)
+        if text:
+            self._db.execute(
+                "INSERT INTO turns (text, session, position, created) VALUES (?, ?, ?, ?)",
+                (text, session_id, position, created)
+            )
+
+    def add_turn(self, session_id: str, position: int, end: int, created: float,
+                 messages: List[Dict[str, Any]]) -> bool:
+        """Index a turn stored at position..end of a session's segment
+
+        Returns False, indexing nothing, when turns before position are not
+        indexed yet; sync_session() indexes them together with this one.
+        """
+        with self._lock:
+            indexed = self._indexed(session_id)
+            if position < indexed:
+                # Already indexed, e.g. by a sync() that ran first
+                return True
+            if position > indexed:
+                # Recording end would hide the gap from sync() for good
+                return False
+            self._db.execute("BEGIN")
+            try:
+                self._insert(session_id, position, created, messages)
+                self._db.execute("INSERT OR REPLACE INTO sessions (id, indexed) VALUES (?, ?)", (session_id, end))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return True
+
+    def sync_session(self, store, meta: Dict[str, Any]) -> int:
+        """Index the turns of one session that are not indexed yet; returns how many"""
+        added = 0
+        with self._lock:
+            indexed = self._indexed(meta["id"])
+            if meta["size"] <= indexed:
+                return 0
+            # One transaction per session rather than per turn
+            self._db.execute("BEGIN")
+            try:
+                for position, _, record in store.iter_records(meta, indexed):
+                    if record.get("type") == "turn":
+                        self._insert(meta["id"], position, record.get("ts", meta["updated"]), record["messages"])
+                        added += 1
+                self._db.execute("INSERT OR REPLACE INTO sessions (id, indexed) VALUES (?, ?)",
+                                 (meta["id"], meta["size"]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return added
+
+    def sync(self, store) -> int:
+        """Index the turns a SessionStore holds that are not indexed yet; returns how many"""
+        return sum(self.sync_session(store, meta) for meta in store.list_sessions().values())
+
+    def search(self, terms: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return the best-matching turns, best first"""
+        query = build_query(terms)
+        if not query:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT session, position, created, snippet(turns, 0, '[', ']', ' ... ', 16), rank"
+                " FROM turns WHERE turns MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        return [
+            {"session": session, "position": position, "created": created, "snippet": snippet, "score": -rank}
+            for session, position, created, snippet, rank in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of indexed sessions and turns"""
+        with self._lock:
+            sessions = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            turns = self._db.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+        return {"path": str(self.path), "sessions": sessions, "turns": turns}
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Session Store
+Append-only JSONL conversation segments with a small offset index
+"""
+
+import json
+import mmap
+import os
+import secrets
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .context import estimate_message_tokens, estimate_tokens
+
+
+class Session:
+    """Handle for appending turns to one stored session"""
+
+    def __init__(self, store: "SessionStore", session_id: str, meta: Dict[str, Any]):
+        self.store = store
+        self.id = session_id
+        self.meta = meta
+
+    def append(self, messages: List[Dict[str, Any]], provider: str = None, model: str = None):
+        """Append one turn's messages"""
+        self.store.append(self, {"type": "turn", "ts": time.time(), "messages": messages}, provider, model)
+
+    def compact(self, summary: str, messages: List[Dict[str, Any]]):
+        """Record that earlier turns were replaced by a summary
+
+        messages are the turns already stored that the summary does not
+        cover; resume starts from this record.
+        """
+        self.store.append(self, {"type": "compact", "summary": summary, "messages": messages})
+
+    def mark_cleared(self):
+        """Record that the conversation was reset; resume starts after this point"""
+        if self.meta["size"]:
+            self.store.append(self, {"type": "clear"})
+
+
+class SessionStore:
+    """Sessions stored as one append-only JSONL segment each
+
+    Every write is a single append to the session's segment plus a single
+    append to index.jsonl, which holds the latest metadata for each session,
+    including the committed segment size and the offsets of records that
+    contain system messages. Resuming reads the segment backwards through
+    mmap, stopping once the context budget is filled, so a long session does
+    not have to be parsed in full.
+    """
+
+    INDEX_NAME = "index.jsonl"
+
+    def __init__(self, directory: Path, search_index=None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / self.INDEX_NAME
+        # Optional SearchIndex that every stored turn is added to
+        self.search_index = search_index
+
+    def _segment_path(self, session_id: str) -> Path:
+        """Return the segment file for a session"""
+        return self.directory / f"{session_id}.jsonl"
+
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> bytes:
+        """Encode a record as one JSONL line"""
+        return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+    @staticmethod
+    def _append_bytes(path: Path, data: bytes) -> int:
+        """Append data with a single write and return the offset it starts at"""
+        fd = os.open(str(path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            offset = os.lseek(fd, 0, os.SEEK_END)
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        return offset
+
+    def _write_index(self, meta: Dict[str, Any]):
+        """Append the latest metadata for a session to the index"""
+        self._append_bytes(self.index_path, self._encode(meta))
+
+    def create(self, provider: str, model: str) -> Session:
+        """Start a new session; nothing is written until its first record"""
+        session_id = time.strftime("%Y%m%d-%H%M%S") + "-" + secrets.token_hex(3)
+        now = time.time()
+        meta = {
+            "id": session_id,
+            "created": now,
+            "updated": now,
+            "provider": provider,
+            "model": model,
+            "title": "",
+            "turns": 0,
+            "size": 0,
+            "pinned": []
+        }
+        return Session(self, session_id, meta)
+
+    def open(self, session_id: str) -> Session:
+        """Open an existing session for appending"""
+        meta = self.get(session_id)
+        if meta is None:
+            raise ValueError(f"Unknown session: {session_id}")
+        return Session(self, meta["id"], meta)
+
+    def append(self, session: Session, record: Dict[str, Any], provider: str = None, model: str = None):
+        """Append a record to a session's segment and update the index"""
+        meta = session.meta
+        data = self._encode(record)
+        header = b""
+        if meta["size"] == 0:
+            # The header goes out in the same write as the first record
+            header = self._encode({"type": "session", "id": session.id, "created": meta["created"]})
+        offset = self._append_bytes(self._segment_path(session.id), header + data) + len(header)
+
+        meta["updated"] = time.time()
+        meta["size"] = offset + len(data)
+        if provider:
+            meta["provider"] = provider
+        if model:
+            meta["model"] = model
+        if record["type"] == "turn":
+            meta["turns"] += 1
+            messages = record["messages"]
+            if not meta["title"]:
+                first_user = next((m for m in messages if m["role"] == "user"), None)
+                if first_user:
+                    meta["title"] = first_user["content"][:60].replace("\n", " ")
+            if any(m["role"] == "system" for m in messages):
+                meta["pinned"].append(offset)
+        elif record["type"] == "clear":
+            meta["pinned"] = []
+        self._write_index(meta)
+
+        if self.search_index is not None and record["type"] == "turn":
+            try:
+                if not self.search_index.add_turn(session.id, offset, meta["size"], record["ts"], record["messages"]):
+                    # Earlier turns were missed (e.g. saved while the index
+                    # was off); index them along with this one
+                    self.search_index.sync_session(self, meta)
+            except sqlite3.Error:
+                # The index catches up on its next sync(), run by every search
+                pass
+
+    def list_sessions(self) -> Dict[str, Dict[str, Any]]:
+        """Return the latest metadata of every session, keyed by id"""
+        sessions: Dict[str, Dict[str, Any]] = {}
+        if not self.index_path.exists():
+            return sessions
+
+        lines = 0
+        with open(self.index_path, "rb") as f:
+            for line in f:
+                lines += 1
+                try:
+                    meta = json.loads(line)
+                except ValueError:
+                    continue
+                sessions[meta["id"]] = meta
+
+        # The index gains a line per turn; fold it back down once it is
+        # mostly superseded entries
+        if lines > 4 * len(sessions) + 64:
+            self._compact_index(sessions)
+        return sessions
+
+    def _compact_index(self, sessions: Dict[str, Dict[str, Any]]):
+        """Rewrite the index with only the latest entry per session"""
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            for meta in sessions.values():
+                f.write(self._encode(meta))
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return metadata for a session; "last" means the most recently updated"""
+        sessions = self.list_sessions()
+        if session_id == "last":
+            return max(sessions.values(), key=lambda m: m["updated"], default=None)
+        if session_id in sessions:
+            return sessions[session_id]
+        # Allow unambiguous id prefixes
+        matches = [meta for sid, meta in sessions.items() if sid.startswith(session_id)]
+        return matches[0] if len(matches) == 1 else None
+
+    def iter_records(self, meta: Dict[str, Any], start: int = 0) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+        """Yield (offset, end, record) for a session's committed records from start on"""
+        path = self._segment_path(meta["id"])
+        if not path.exists():
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                end = offset + len(line)
+                if end > meta["size"]:
+                    # A torn or uncommitted write
+                    break
+                try:
+                    yield offset, end, json.loads(line)
+                except ValueError:
+                    pass
+                offset = end
+
+    def load_turn(self, session_id: str, offset: int) -> List[Dict[str, Any]]:
+        """Return the non-system messages of the turn record at offset"""
+        with open(self._segment_path(session_id), "rb") as f:
+            f.seek(offset)
+            record = json.loads(f.readline())
+        if record.get("type") != "turn":
+            raise ValueError(f"No turn at offset {offset} of session {session_id}")
+        return [m for m in record["messages"] if m["role"] != "system"]
+
+    @staticmethod
+    def _read_record(mm: mmap.mmap, offset: int) -> Dict[str, Any]:
+        """Decode the record starting at offset"""
+        end = mm.find(b"\n", offset)
+        return json.loads(mm[offset:end if end != -1 else len(mm)])
+
+    def load_messages(self, session_id: str, max_tokens: int = None,
+                      max_messages: int = None) -> List[Dict[str, Any]]:
+        """Rebuild the newest part of a conversation that fits the given budget"""
+        return self.load_conversation(session_id, max_tokens, max_messages)[0]
+
+    def load_conversation(self, session_id: str, max_tokens: int = None,
+                          max_messages: int = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return the newest messages that fit the budget and the summary of older turns, if any"""
+        meta = self.get(session_id)
+        if meta is None:
+            raise ValueError(f"Unknown session: {session_id}")
+
+        size = meta["size"]
+        path = self._segment_path(meta["id"])
+        if size == 0 or not path.exists():
+            return [], None
+
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Bytes past the indexed size belong to a torn or uncommitted write
+            size = min(size, len(mm))
+            pinned = [m for offset in meta["pinned"] for m in self._read_record(mm, offset)["messages"]
+                      if m["role"] == "system"]
+            tokens = sum(estimate_message_tokens(m) for m in pinned)
+
+            turns: List[List[Dict[str, Any]]] = []
+            count = 0
+            summary = None
+            end = size - 1  # index of the newline ending the current record
+            while end > 0:
+                start = mm.rfind(b"\n", 0, end) + 1
+                record = json.loads(mm[start:end])
+                end = start - 1
+                if record["type"] not in ("turn", "compact"):
+                    # Reached a /clear marker or the session header
+                    break
+                messages = [m for m in record["messages"] if m["role"] != "system"]
+                turn_tokens = sum(estimate_message_tokens(m) for m in messages)
+                if record["type"] == "compact":
+                    # Everything before this record is covered by the summary
+                    summary = record["summary"]
+                    turn_tokens += estimate_tokens(summary)
+                if turns and max_tokens is not None and tokens + turn_tokens > max_tokens:
+                    summary = None
+                    break
+                if turns and max_messages is not None and count + len(messages) > max_messages:
+                    summary = None
+                    break
+                turns.append(messages)
+                tokens += turn_tokens
+                count += len(messages)
+                if record["type"] == "compact":
+                    break
+
+        history = list(pinned)
+        for messages in reversed(turns):
+            history.extend(messages)
+        return history, summary
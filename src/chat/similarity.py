@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Similarity Cache
+Serves responses for prompts that nearly match a cached one, using MinHash and LSH
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Parts of generated prompts that change between otherwise identical requests
+_VOLATILE = [
+    # Dates and timestamps, e.g. 2025-01-31, 2025-01-31T12:00:00.123Z
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?\b"), "<time>"),
+    (re.compile(r"\b\d{1,2}:\d{2}:\d{2}(?:\.\d+)?\b"), "<time>"),
+    # UUIDs and long hex ids (hashes, request ids)
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<id>"),
+    (re.compile(r"\b(?=[0-9a-f]*\d)[0-9a-f]{12,}\b", re.IGNORECASE), "<id>"),
+    # Long numbers (epoch times, order and ticket numbers); short ones can
+    # change the meaning of a prompt and are kept
+    (re.compile(r"\b\d{6,}\b"), "<num>"),
+]
+_WHITESPACE = re.compile(r"\s+")
+
+# Bytes per shingle
+SHINGLE_SIZE = 5
+
+# Signature length; the similarity estimate is the fraction of equal values
+NUM_HASHES = 128
+
+# Values are kept to 24 bits so that densification offsets fit in 32
+_VALUE_BITS = 24
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def normalize_prompt(text: str) -> str:
+    """Mask timestamps, ids and long numbers, and collapse whitespace"""
+    for pattern, replacement in _VOLATILE:
+        text = pattern.sub(replacement, text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def signature(text: str, num_hashes: int = NUM_HASHES) -> array:
+    """Return the MinHash signature of the byte shingles of text
+
+    Uses one permutation hashing: each shingle is hashed once into one of
+    num_hashes bins and each bin keeps its minimum, so the cost does not grow
+    with the signature length. Empty bins take the value of the next filled
+    bin plus an offset (rotation densification).
+    """
+    data = text.encode("utf-8")
+    if len(data) <= SHINGLE_SIZE:
+        shingles = {data}
+    else:
+        shingles = {data[i:i + SHINGLE_SIZE] for i in range(len(data) - SHINGLE_SIZE + 1)}
+
+    empty = 1 << 32
+    bins = [empty] * num_hashes
+    for shingle in shingles:
+        h = (zlib.crc32(shingle) * _MULTIPLIER) & 0xFFFFFFFFFFFFFFFF
+        index = (h >> 40) % num_hashes
+        value = h & _VALUE_MASK
+        if value < bins[index]:
+            bins[index] = value
+
+    result = list(bins)
+    for index, value in enumerate(bins):
+        if value == empty:
+            distance = 1
+            while bins[(index + distance) % num_hashes] == empty:
+                distance += 1
+            result[index] = bins[(index + distance) % num_hashes] + (distance << _VALUE_BITS)
+    return array("I", result)
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimate the Jaccard similarity of the texts behind two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def choose_bands(num_hashes: int, threshold: float) -> Tuple[int, int]:
+    """Return (bands, rows) for LSH over signatures of num_hashes values
+
+    Picks the most selective banding that still makes a pair at exactly
+    threshold similarity a candidate with 99% probability.
+    """
+    best = (num_hashes, 1)
+    for rows in range(1, num_hashes + 1):
+        if num_hashes % rows:
+            continue
+        bands = num_hashes // rows
+        if 1 - (1 - threshold ** rows) ** bands >= 0.99:
+            best = (bands, rows)
+    return best
+
+
+class SimilarityCache:
+    """Response cache that also answers prompts nearly equal to a cached one
+
+    Only the last user message is matched loosely: provider, model and the
+    rest of the conversation must be equal after normalization. Entries are
+    found through LSH buckets over the MinHash signature of the prompt, and a
+    candidate is served if its estimated similarity reaches threshold. Every
+    such hit is appended to log_path with its score.
+    """
+
+    # Run disk eviction once every this many writes rather than on each one
+    EVICT_EVERY = 100
+
+    # Entries read from each bucket at most. Templated prompts share
+    # boilerplate, so some buckets hold a large share of all entries; those
+    # say little, and a near duplicate is also found through the rarer
+    # buckets it shares
+    BUCKET_SCAN = 64
+
+    # Candidates compared per lookup at most, those sharing the most buckets
+    MAX_CANDIDATES = 32
+
+    # Characters of each prompt kept in the audit log
+    LOG_PROMPT_CHARS = 500
+
+    def __init__(self, path: Path, threshold: float = 0.9, ttl: float = 86400,
+                 max_entries: int = 100000, log_path: Optional[Path] = None,
+                 num_hashes: int = NUM_HASHES):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.log_path = Path(log_path) if log_path else None
+        self.num_hashes = num_hashes
+        self.bands, self.rows = choose_bands(num_hashes, threshold)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY,"
+            " scope TEXT NOT NULL,"
+            " prompt TEXT NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " bucket_keys BLOB NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " key INTEGER NOT NULL,"
+            " entry INTEGER NOT NULL,"
+            " PRIMARY KEY (key, entry)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS layout (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._check_layout()
+
+    def _check_layout(self):
+        """Empty the cache if it was built with a different banding"""
+        layout = {"num_hashes": self.num_hashes, "bands": self.bands, "rows": self.rows}
+        stored = dict(self._db.execute("SELECT name, value FROM layout").fetchall())
+        if stored == layout:
+            return
+        self._db.execute("BEGIN")
+        self._db.execute("DELETE FROM entries")
+        self._db.execute("DELETE FROM buckets")
+        self._db.execute("DELETE FROM layout")
+        self._db.executemany("INSERT INTO layout (name, value) VALUES (?, ?)", layout.items())
+        self._db.execute("COMMIT")
+
+    def fingerprint(self, provider: str, model: str,
+                    messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Return what get() and set() need for a request, or None if it ends in no user prompt"""
+        if not messages or messages[-1]["role"] != "user":
+            return None
+        context = [[message["role"], normalize_prompt(message.get("content") or "")] for message in messages[:-1]]
+        payload = json.dumps([provider, model, context], separators=(",", ":"), ensure_ascii=False)
+        scope = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+        prompt = messages[-1].get("content") or ""
+        values = signature(normalize_prompt(prompt), self.num_hashes)
+        keys = array("q")
+        for band in range(self.bands):
+            digest = hashlib.blake2b(digest_size=8)
+            digest.update(scope.encode("ascii"))
+            digest.update(band.to_bytes(2, "big"))
+            digest.update(values[band * self.rows:(band + 1) * self.rows].tobytes())
+            keys.append(int.from_bytes(digest.digest(), "big", signed=True))
+        return {"provider": provider, "model": model, "scope": scope, "prompt": prompt,
+                "signature": values, "keys": keys}
+
+    def get(self, fingerprint: Dict[str, Any]) -> Optional[Tuple[str, float]]:
+        """Return the best cached (response, similarity) at or above threshold, or None"""
+        now = time.time()
+        keys = list(fingerprint["keys"])
+        with self._lock:
+            shared = Counter(entry for entry, in self._db.execute(
+                " UNION ALL ".join(["SELECT * FROM (SELECT entry FROM buckets WHERE key = ? LIMIT ?)"] * len(keys)),
+                [value for key in keys for value in (key, self.BUCKET_SCAN)]
+            ))
+            candidates = [entry for entry, _ in shared.most_common(self.MAX_CANDIDATES)]
+            rows = self._db.execute(
+                "SELECT id, scope, signature, prompt, response, created FROM entries"
+                f" WHERE id IN ({','.join('?' * len(candidates))})",
+                candidates
+            ).fetchall()
+
+            best = None
+            best_score = 0.0
+            for row in rows:
+                entry_id, scope, blob, _, _, created = row
+                if scope != fingerprint["scope"] or now - created >= self.ttl:
+                    continue
+                score = similarity(fingerprint["signature"], array("I", blob))
+                if score > best_score:
+                    best, best_score = row, score
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE entries SET accessed = ? WHERE id = ?", (now, best[0]))
+            self.hits += 1
+        self._log_hit(fingerprint, best[0], best[3], best_score)
+        return best[4], best_score
+
+    def _log_hit(self, fingerprint: Dict[str, Any], entry_id: int, matched_prompt: str, score: float):
+        """Append a hit to the audit log"""
+        if self.log_path is None:
+            return
+        record = {
+            "ts": round(time.time(), 3),
+            "provider": fingerprint["provider"],
+            "model": fingerprint["model"],
+            "similarity": round(score, 4),
+            "entry": entry_id,
+            "prompt": fingerprint["prompt"][:self.LOG_PROMPT_CHARS],
+            "matched_prompt": matched_prompt[:self.LOG_PROMPT_CHARS]
+        }
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+    def set(self, fingerprint: Dict[str, Any], response: str):
+        """Store a response under the prompt of fingerprint"""
+        now = time.time()
+        keys = fingerprint["keys"]
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                cursor = self._db.execute(
+                    "INSERT INTO entries (scope, prompt, signature, bucket_keys, response, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (fingerprint["scope"], fingerprint["prompt"], fingerprint["signature"].tobytes(),
+                     keys.tobytes(), response, now, now)
+                )
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO buckets (key, entry) VALUES (?, ?)",
+                    [(key, cursor.lastrowid) for key in keys]
+                )
+                self._writes += 1
+                if self._writes % self.EVICT_EVERY == 0:
+                    self._evict(now)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        victims = self._db.execute("SELECT id, bucket_keys FROM entries WHERE created < ?",
+                                   (now - self.ttl,)).fetchall()
+        count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - len(victims)
+        if count > self.max_entries:
+            victims += self._db.execute(
+                "SELECT id, bucket_keys FROM entries WHERE created >= ? ORDER BY accessed ASC LIMIT ?",
+                (now - self.ttl, count - self.max_entries)
+            ).fetchall()
+        for entry_id, blob in victims:
+            # Bucket rows are deleted through their primary key, so no index
+            # on entry is needed
+            self._db.executemany("DELETE FROM buckets WHERE key = ? AND entry = ?",
+                                 [(key, entry_id) for key in array("q", blob)])
+        self._db.executemany("DELETE FROM entries WHERE id = ?", [(entry_id,) for entry_id, _ in victims])
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM buckets")
+            self._db.execute("COMMIT")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit statistics"""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses
+        }
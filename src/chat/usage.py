@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Token Usage
+Per-request token accounting reported by providers
+"""
+
+import contextvars
+from typing import Dict, Optional, Tuple
+
+
+# Usage dict of the request currently running in this task, set by the
+# request pipeline in BaseLLMChat
+_current_usage: contextvars.ContextVar = contextvars.ContextVar("chatcli_request_usage", default=None)
+
+
+def new_usage() -> Dict[str, int]:
+    """Return an empty usage record"""
+    return {
+        "input_tokens": 0,
+        "cached_input_tokens": 0,
+        "cache_write_tokens": 0,
+        "output_tokens": 0
+    }
+
+
+def begin_usage() -> Tuple[Dict[str, int], contextvars.Token]:
+    """Start collecting usage for a request in the current context"""
+    usage = new_usage()
+    return usage, _current_usage.set(usage)
+
+
+def end_usage(token: contextvars.Token):
+    """Stop collecting usage for the request started with token"""
+    try:
+        _current_usage.reset(token)
+    except ValueError:
+        # A generator closed from another context (e.g. by garbage
+        # collection) has nothing left to reset
+        pass
+
+
+def get_current_usage() -> Optional[Dict[str, int]]:
+    """Return the usage being collected for the request running now, if any"""
+    return _current_usage.get()
+
+
+def report_usage(input_tokens: Optional[int] = None, output_tokens: Optional[int] = None,
+                 cached_input_tokens: Optional[int] = None, cache_write_tokens: Optional[int] = None):
+    """Record token counts from a provider response for the current request
+
+    input_tokens is the full prompt size including any cached part.
+    """
+    usage = _current_usage.get()
+    if usage is None:
+        return
+    usage["input_tokens"] += input_tokens or 0
+    usage["output_tokens"] += output_tokens or 0
+    usage["cached_input_tokens"] += cached_input_tokens or 0
+    usage["cache_write_tokens"] += cache_write_tokens or 0
+
+
+def add_usage(total: Dict[str, int], usage: Dict[str, int]):
+    """Accumulate usage into a running total"""
+    for key, value in usage.items():
+        total[key] = total.get(key, 0) + value
+
+
+def format_usage(usage: Dict[str, int]) -> str:
+    """Format usage as e.g. "1200 in (1024 cached, 85%), 80 out\""""
+    input_tokens = usage["input_tokens"]
+    cached = usage["cached_input_tokens"]
+    text = f"{input_tokens} in"
+    if input_tokens:
+        text += f" ({cached} cached, {cached * 100 // input_tokens}%"
+        if usage["cache_write_tokens"]:
+            text += f", {usage['cache_write_tokens']} written to cache"
+        text += ")"
+    return text + f", {usage['output_tokens']} out"
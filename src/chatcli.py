@@ -4,28 +4,70 @@ ChatCLI - Multi-LLM Terminal Chat
 A terminal-based chat interface supporting multiple LLM providers
 """
 
+import os
 import sys
+import stat
+import time
+import codecs
 import argparse
-from typing import Optional
-from chat.factory import LLMProviderFactory
+from typing import List, Optional
 from config.manager import ConfigManager
 
+# Exit codes for one-shot prompts
+EXIT_OK = 0
+EXIT_REQUEST_FAILED = 1
+EXIT_USAGE = 2
+EXIT_CONFIG = 3
+EXIT_INTERRUPTED = 130
+EXIT_BROKEN_PIPE = 141
+
+# Bytes read from stdin per call when a prompt is piped in
+STDIN_CHUNK_SIZE = 64 * 1024
+
+# --provider value that routes each request to the fastest model of a group
+# (same as chat.routing.AUTO_PROVIDER, which is not imported at startup)
+AUTO_PROVIDER = "auto"
+
 
 class ChatCLI:
     """Main ChatCLI application"""
     
-    def __init__(self):
+    def __init__(self, use_cache: bool = True):
         self.config_manager = ConfigManager()
         self.current_chat = None
+        self.use_cache = use_cache
+        self._cache = None
+        self._similarity_cache = None
+        self._rate_limiter = None
+        self._latency_stats = None
+        self._session_store = None
+        self._search_index = None
+        self._last_hits = []
+        self._metrics_log = None
+        # File references sent with the next message
+        self.pending_attachments = []
+        self._configure_client_pool()
         
-    def start_chat(self, provider: str = None, model: str = None):
+    def start_chat(self, provider: str = None, model: str = None, resume: str = None,
+                   hedge: str = None, hedge_delay: float = None, files: list = None, file_options=None):
         """Start interactive chat session"""
+        resume_meta = None
+        if resume:
+            resume_meta = self._get_session_store().get(resume)
+            if resume_meta is None:
+                print(f"Session not found: {resume}")
+                print("Run 'chatcli --sessions' to list saved sessions.")
+                return
+            # Continue with the provider and model the session last used
+            provider = provider or resume_meta["provider"]
+            model = model or resume_meta["model"]
+        
         if not provider:
             provider = self.config_manager.get_default_provider()
         
         try:
-            # Get API key for the provider
-            api_key = self.config_manager.get_api_key(provider)
+            # Get API key for the provider; routed chats check each candidate's
+            api_key = provider == AUTO_PROVIDER or self.config_manager.get_api_key(provider)
             if not api_key:
                 print(f"API key not found for {provider}.")
                 print(f"Run 'chatcli --setup' to configure API keys.")
@@ -36,24 +78,47 @@ class ChatCLI:
                 model = self.config_manager.get_default_model(provider)
             
             # Create provider instance
-            self.current_chat = LLMProviderFactory.create_provider(
-                provider_name=provider,
-                api_key=api_key,
-                model=model
-            )
+            self.current_chat = self._create_chat(provider, model)
+            if hedge:
+                self.current_chat = self._create_hedged_chat(self.current_chat, hedge, hedge_delay)
+            self.current_chat.compactor = self._create_compactor(self._summary_provider(self.current_chat))
+            for path in files or []:
+                self.pending_attachments.append(self.attach_file(path, file_options, self.current_chat))
+            
+            if resume_meta:
+                self._load_session(resume_meta["id"])
+            elif self.config_manager.get_setting("auto_save_conversations"):
+                self.current_chat.session = self._get_session_store().create(provider, self.current_chat.model)
             
             print(f"ChatCLI - {provider.upper()}")
             if model:
                 print(f"Model: {model}")
+            if provider == AUTO_PROVIDER:
+                print(f"Routing between: {', '.join(self.current_chat._get_available_models())}")
+            if hedge:
+                print(f"Hedging with: {self.current_chat.secondary.provider_name}:{self.current_chat.secondary.model} "
+                      f"after {self.current_chat.delay:g}s")
             print("=" * 30)
             print("Commands:")
             print("  /quit, /exit, /q     - Exit chat")
             print("  /clear              - Clear conversation")
             print("  /switch <provider>  - Switch provider")
             print("  /model <model>      - Switch model")
+            print("  /compare <providers> <prompt> - Ask several providers at once")
+            print("  /cache [clear]      - Response cache stats / clear")
+            print("  /sessions           - List saved sessions")
+            print("  /load <session>     - Load a saved session")
+            print("  /search <terms>     - Search saved sessions")
+            print("  /recall <n>         - Add a search result to this conversation")
+            print("  /usage              - Token usage, cached vs uncached")
+            print("  /file <path> [opts] - Attach a file to the next message")
             print("  /info               - Provider info")
             print("  /help               - Show commands")
             print()
+            if self.pending_attachments:
+                from chat.attachments import describe_attachment
+                for attachment in self.pending_attachments:
+                    print(f"Attached: {describe_attachment(attachment)}")
             
             self._chat_loop()
             
@@ -77,10 +142,20 @@ class ChatCLI:
                     else:
                         break
                 
-                # Get response from LLM
+                # Stream response from LLM as it arrives
                 print(f"{self.current_chat.provider_name.title()}: ", end="", flush=True)
-                response = self.current_chat.get_response(user_input)
-                print(response)
+                attachments, self.pending_attachments = self.pending_attachments, []
+                for chunk in self.current_chat.stream_response(user_input, attachments):
+                    print(chunk, end="", flush=True)
+                print()
+                if getattr(self.current_chat, "last_winner", None):
+                    print(f"[answered by {self.current_chat.last_winner}]")
+                if self.config_manager.get_setting("show_response_time") and self.current_chat.last_metrics:
+                    from chat.metrics import format_metrics
+                    print(f"[time: {format_metrics(self.current_chat.last_metrics)}]")
+                if self.config_manager.get_setting("show_token_usage") and self.current_chat.last_usage:
+                    from chat.usage import format_usage
+                    print(f"[tokens: {format_usage(self.current_chat.last_usage)}]")
                 print()
                 
             except KeyboardInterrupt:
@@ -105,20 +180,26 @@ class ChatCLI:
         
         elif cmd == 'switch':
             if len(parts) < 2:
+                from chat.factory import LLMProviderFactory
                 print("Usage: /switch <provider>")
                 print("Available providers:", ", ".join(LLMProviderFactory.get_provider_names()))
             else:
                 new_provider = parts[1]
                 try:
-                    api_key = self.config_manager.get_api_key(new_provider)
+                    api_key = new_provider == AUTO_PROVIDER or self.config_manager.get_api_key(new_provider)
                     if not api_key:
                         print(f"API key not found for {new_provider}")
                         return True
                     
-                    self.current_chat = LLMProviderFactory.create_provider(
-                        provider_name=new_provider,
-                        api_key=api_key
-                    )
+                    new_chat = self._create_chat(new_provider)
+                    new_chat.compactor = self._create_compactor(self._summary_provider(new_chat))
+                    # Keep saving to the same session; the new provider
+                    # starts from an empty conversation
+                    session = self.current_chat.session
+                    if session is not None:
+                        session.mark_cleared()
+                        new_chat.session = session
+                    self.current_chat = new_chat
                     print(f"Switched to {new_provider}")
                 except Exception as e:
                     print(f"Error switching provider: {e}")
@@ -136,11 +217,128 @@ class ChatCLI:
                 except Exception as e:
                     print(f"Error switching model: {e}")
         
+        elif cmd == 'compare':
+            if len(parts) < 3:
+                print("Usage: /compare <provider,provider,...> <prompt>")
+                print("Example: /compare claude,openai,gemini What is a monad?")
+            else:
+                # Keep the prompt exactly as typed after the provider list
+                prompt = command[1:].split(None, 2)[2]
+                self.compare(parts[1], prompt)
+        
+        elif cmd == 'cache':
+            cache = self._get_cache()
+            similar = self._get_similarity_cache()
+            if cache is None and similar is None:
+                print("Response cache is disabled.")
+                print("Enable it with the 'response_cache' or 'similarity_cache' setting "
+                      "(and don't pass --no-cache).")
+            elif len(parts) > 1 and parts[1].lower() == 'clear':
+                for enabled in (cache, similar):
+                    if enabled is not None:
+                        enabled.clear()
+                print("Response cache cleared.")
+            else:
+                if cache is not None:
+                    stats = cache.stats()
+                    print(f"Cache: {stats['path']}")
+                    print(f"Entries: {stats['entries']} on disk, {stats['memory_entries']} in memory")
+                    print(f"Session: {stats['hits']} hits, {stats['misses']} misses")
+                if similar is not None:
+                    stats = similar.stats()
+                    print(f"Similarity cache: {stats['path']} (threshold {stats['threshold']})")
+                    print(f"Entries: {stats['entries']}")
+                    print(f"Session: {stats['hits']} hits, {stats['misses']} misses")
+        
+        elif cmd == 'usage':
+            from chat.usage import format_usage
+            chat = self.current_chat
+            if chat.last_usage:
+                print(f"Last turn: {format_usage(chat.last_usage)}")
+            else:
+                print("Last turn: no usage reported (no request yet, or served from cache)")
+            print(f"Session:   {format_usage(chat.usage_totals)}")
+        
+        elif cmd == 'sessions':
+            self.list_sessions()
+        
+        elif cmd == 'load':
+            if len(parts) < 2:
+                print("Usage: /load <session id|last>")
+            else:
+                try:
+                    self._load_session(parts[1])
+                except ValueError as e:
+                    print(f"Error: {e}")
+        
+        elif cmd == 'search':
+            if len(parts) < 2:
+                print("Usage: /search <terms>   (then /recall <n> to use a result)")
+            else:
+                self.search(command[1:].split(None, 1)[1])
+        
+        elif cmd == 'recall':
+            if len(parts) < 2 or not parts[1].isdigit():
+                print("Usage: /recall <n>   (n from the last /search)")
+            else:
+                try:
+                    self._recall(int(parts[1]))
+                except (OSError, ValueError) as e:
+                    print(f"Error: {e}")
+        
+        elif cmd == 'file':
+            if len(parts) < 2:
+                print("Usage: /file <path> [--grep PATTERN [-C N] | --head N | --tail N] [--max-tokens N]")
+                print("       /file clear")
+                from chat.attachments import describe_attachment
+                for attachment in self.pending_attachments:
+                    print(f"Attached: {describe_attachment(attachment)}")
+            elif parts[1].lower() == 'clear' and len(parts) == 2:
+                self.pending_attachments = []
+                print("Attachments cleared.")
+            else:
+                import shlex
+                from chat.attachments import describe_attachment
+                try:
+                    options = parse_file_options(shlex.split(command[1:])[1:])
+                    attachment = self.attach_file(options.path, options, self.current_chat)
+                except ValueError as e:
+                    print(f"Error: {e}")
+                else:
+                    self.pending_attachments.append(attachment)
+                    print(f"Attached to your next message: {describe_attachment(attachment)}")
+        
         elif cmd == 'info':
             info = self.current_chat.get_provider_info()
             print(f"Provider: {info['name']}")
             print(f"Current model: {info['model']}")
             print(f"Available models: {', '.join(info['available_models'])}")
+            print(f"Context: ~{self.current_chat._context.total_tokens} tokens sent per request "
+                  f"(budget {self.current_chat.get_context_budget()})")
+            pool = getattr(self.current_chat, "key_pool", None)
+            if pool is not None:
+                print(f"API keys: {len(pool.keys)} ({pool.strategy.replace('_', '-')})")
+            if self.current_chat.summary is not None:
+                from chat.context import estimate_tokens
+                print(f"Summary: ~{estimate_tokens(self.current_chat.summary)} tokens in place of "
+                      f"{self.current_chat.compacted_messages or 'earlier'} messages")
+            if "routes" in info:
+                print("Routing:")
+                for label, route in info["routes"].items():
+                    speed = []
+                    if route.get("ttft") is not None:
+                        speed.append(f"first token {route['ttft']:.2f}s")
+                    if route.get("tps"):
+                        speed.append(f"{route['tps']:.1f} tok/s")
+                    if route.get("ttft") is None and route.get("latency") is not None:
+                        speed.append(f"{route['latency']:.2f}s per reply")
+                    if route.get("samples"):
+                        speed.append(f"{route['errors']:.0%} errors")
+                    print(f"  {label}: {', '.join(speed) or 'not measured yet'} "
+                          f"({route['requests']} requests this session)")
+            if "wins" in info:
+                wins = ", ".join(f"{label} {count}" for label, count in info["wins"].items())
+                print(f"Hedge wins: {wins or 'none yet'}")
         
         elif cmd == 'help':
             print("\nAvailable commands:")
@@ -148,6 +346,14 @@ class ChatCLI:
             print("  /clear              - Clear conversation")
             print("  /switch <provider>  - Switch provider")
             print("  /model <model>      - Switch model")
+            print("  /compare <providers> <prompt> - Ask several providers at once")
+            print("  /cache [clear]      - Response cache stats / clear")
+            print("  /sessions           - List saved sessions")
+            print("  /load <session>     - Load a saved session")
+            print("  /search <terms>     - Search saved sessions")
+            print("  /recall <n>         - Add a search result to this conversation")
+            print("  /usage              - Token usage, cached vs uncached")
+            print("  /file <path> [opts] - Attach a file to the next message")
             print("  /info               - Provider info")
             print("  /help               - Show this help")
         
@@ -157,8 +363,376 @@ class ChatCLI:
         
         return True
     
+    def _configure_client_pool(self):
+        """Apply pool and circuit breaker limits from settings"""
+        from chat.pool import get_client_pool
+        get_client_pool().configure(
+            max_clients=self.config_manager.get_setting("client_pool_size"),
+            idle_timeout=self.config_manager.get_setting("client_idle_timeout"),
+            max_connections=self.config_manager.get_setting("max_connections_per_client")
+        )
+        from chat.resilience import configure_circuit_breakers
+        configure_circuit_breakers(
+            failure_threshold=self.config_manager.get_setting("circuit_breaker_threshold"),
+            reset_timeout=self.config_manager.get_setting("circuit_breaker_reset_timeout")
+        )
+    
+    def _get_cache(self):
+        """Return the shared response cache, or None when caching is off"""
+        if not self.use_cache or not self.config_manager.get_setting("response_cache"):
+            return None
+        if self._cache is None:
+            from chat.cache import ResponseCache
+            self._cache = ResponseCache(
+                self.config_manager.config_dir / "cache.db",
+                ttl=self.config_manager.get_setting("response_cache_ttl"),
+                max_entries=self.config_manager.get_setting("response_cache_max_entries")
+            )
+        return self._cache
+    
+    def _get_rate_limiter(self):
+        """Return the rate limiter shared by every chatcli process"""
+        if self._rate_limiter is None:
+            from chat.ratelimit import RateLimiter
+            self._rate_limiter = RateLimiter(self.config_manager.config_dir / "ratelimit.json")
+        return self._rate_limiter
+    
+    def _get_latency_stats(self):
+        """Return the routing statistics shared by every chatcli process"""
+        if self._latency_stats is None:
+            from chat.routing import LatencyStats
+            self._latency_stats = LatencyStats(self.config_manager.config_dir / "routing.json")
+        return self._latency_stats
+    
+    def _get_similarity_cache(self):
+        """Return the shared near-duplicate prompt cache, or None when it is off"""
+        if not self.use_cache or not self.config_manager.get_setting("similarity_cache"):
+            return None
+        if self._similarity_cache is None:
+            from chat.similarity import SimilarityCache
+            self._similarity_cache = SimilarityCache(
+                self.config_manager.config_dir / "similarity.db",
+                threshold=self.config_manager.get_setting("similarity_threshold"),
+                ttl=self.config_manager.get_setting("response_cache_ttl"),
+                max_entries=self.config_manager.get_setting("similarity_cache_max_entries"),
+                log_path=self.config_manager.config_dir / "similarity_hits.jsonl"
+            )
+        return self._similarity_cache
+    
+    def _get_metrics_log(self):
+        """Return the request metrics log, or None when recording is off"""
+        if not self.config_manager.get_setting("record_metrics"):
+            return None
+        if self._metrics_log is None:
+            from chat.metrics import MetricsLog
+            self._metrics_log = MetricsLog(self.config_manager.config_dir / "metrics.jsonl",
+                                           max_bytes=self.config_manager.get_setting("metrics_max_bytes"))
+        return self._metrics_log
+    
+    def show_metrics(self):
+        """Print latency percentiles per provider and model from the metrics log"""
+        from chat.metrics import MetricsLog, summarize, percentile
+        
+        log = self._metrics_log or MetricsLog(self.config_manager.config_dir / "metrics.jsonl")
+        records = log.load()
+        if not records:
+            print(f"No metrics recorded yet ({log.path}).")
+            return
+        
+        print(f"Last {len(records)} requests ({log.path}):")
+        print(f"  {'provider/model':<40} {'reqs':>5} {'err':>4} "
+              f"{'p50':>7} {'p95':>7} {'p99':>7} {'ttft p50':>9} {'tok/s':>7}")
+        for (provider, model), group in sorted(summarize(records).items()):
+            latency = group["latency"]
+            row = f"  {provider + '/' + model:<40} {group['count']:>5} {group['errors']:>4} "
+            if latency:
+                row += " ".join(f"{percentile(latency, q):>6.2f}s" for q in (0.5, 0.95, 0.99))
+            else:
+                row += f"{'-':>7} {'-':>7} {'-':>7}"
+            ttft = group["ttft"]
+            row += f" {percentile(ttft, 0.5):>8.2f}s" if ttft else f" {'-':>9}"
+            rate = group["tokens_per_second"]
+            row += f" {percentile(rate, 0.5):>7.1f}" if rate else f" {'-':>7}"
+            print(row)
+        
+        try:
+            log.write_snapshot(records)
+            print(f"Prometheus snapshot: {log.snapshot_path}")
+        except OSError as e:
+            print(f"Could not write Prometheus snapshot: {e}")
+    
+    def _get_session_store(self):
+        """Return the session store, creating it on first use"""
+        if self._session_store is None:
+            from chat.session import SessionStore
+            self._session_store = SessionStore(self.config_manager.config_dir / "sessions",
+                                               search_index=self._get_search_index())
+        return self._session_store
+    
+    def _get_search_index(self):
+        """Return the full-text index of saved sessions, or None when it is off"""
+        if not self.config_manager.get_setting("search_index") or self._search_index is False:
+            return None
+        if self._search_index is None:
+            import sqlite3
+            from chat.search import SearchIndex
+            try:
+                self._search_index = SearchIndex(self.config_manager.config_dir / "search.db")
+            except sqlite3.Error as e:
+                # e.g. an SQLite build without FTS5
+                print(f"Session search unavailable: {e}")
+                self._search_index = False
+                return None
+        return self._search_index
+    
+    def search(self, terms: str, limit: int = 10) -> bool:
+        """Print the saved turns that best match terms"""
+        index = self._get_search_index()
+        if index is None:
+            print("Session search is disabled (search_index setting).")
+            return False
+        store = self._get_session_store()
+        # Only turns not yet indexed are read: those saved before the index
+        # existed, while it was off, or when writing to it failed
+        first = index.is_empty()
+        if first:
+            print("Indexing saved sessions...")
+        added = index.sync(store)
+        if first or added:
+            print(f"Indexed {added} turns.")
+        
+        start = time.perf_counter()
+        hits = index.search(terms, limit)
+        elapsed = time.perf_counter() - start
+        self._last_hits = hits
+        if not hits:
+            print(f"No saved turns match {terms!r}.")
+            return False
+        print(f"{len(hits)} best matches ({elapsed * 1000:.1f} ms):")
+        for number, hit in enumerate(hits, 1):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit["created"]))
+            snippet = " ".join(hit["snippet"].split())
+            print(f"  [{number}] {when}  {hit['session']}  score {hit['score']:.2f}")
+            print(f"      {snippet}")
+        return True
+    
+    def _recall(self, number: int):
+        """Add a search hit's turn to the current conversation as context"""
+        if not 1 <= number <= len(self._last_hits):
+            print("No such search result; run /search first.")
+            return
+        hit = self._last_hits[number - 1]
+        messages = self._get_session_store().load_turn(hit["session"], hit["position"])
+        for message in messages:
+            self.current_chat.add_message(message["role"], message["content"], message.get("attachments"))
+        print(f"Added {len(messages)} messages from session {hit['session']} to this conversation.")
+    
+    def _load_session(self, session_id: str):
+        """Load the newest part of a saved session into the current chat"""
+        store = self._get_session_store()
+        session = store.open(session_id)
+        chat = self.current_chat
+        messages, summary = store.load_conversation(
+            session.id,
+            max_tokens=chat.get_context_budget(),
+            max_messages=chat.max_history_messages
+        )
+        chat.load_history(messages, summary)
+        chat.session = session
+        note = ", plus a summary of earlier turns" if summary else ""
+        print(f"Resumed session {session.id} ({len(messages)} messages loaded{note})")
+    
+    def list_sessions(self, limit: int = 20):
+        """List the most recently updated saved sessions"""
+        sessions = sorted(self._get_session_store().list_sessions().values(),
+                          key=lambda m: m["updated"], reverse=True)
+        if not sessions:
+            print("No saved sessions.")
+            return
+        print("Saved sessions:")
+        for meta in sessions[:limit]:
+            updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(meta["updated"]))
+            print(f"  {meta['id']}  {updated}  {meta['provider']}/{meta['model']}  "
+                  f"{meta['turns']} turns  {meta['title']}")
+    
+    def _configure_chat(self, chat):
+        """Apply application settings to a chat, and to its request pipeline if it has one"""
+        from chat.base import BaseLLMChat
+        
+        chat.max_history_messages = self.config_manager.get_setting("conversation_history_limit")
+        chat.max_context_tokens = self.config_manager.get_setting("context_token_budget")
+        chat.metrics_log = self._get_metrics_log()
+        if not isinstance(chat, BaseLLMChat):
+            # Hedged and routed chats answer through chats configured here
+            return chat
+        chat.cache = self._get_cache()
+        chat.similarity_cache = self._get_similarity_cache()
+        chat.coalesce_requests = self.config_manager.get_setting("coalesce_requests")
+        chat.prompt_caching = self.config_manager.get_setting("prompt_caching")
+        chat.retry_policy.max_retries = self.config_manager.get_setting("max_retries")
+        chat.rate_limits = self.config_manager.get_rate_limits(chat.provider_name)
+        if chat.rate_limits:
+            chat.rate_limiter = self._get_rate_limiter()
+        return chat
+    
+    def _create_chat(self, provider: str, model: str = None):
+        """Create a provider instance using configured API key and default model"""
+        from chat.factory import LLMProviderFactory
+        
+        if provider.lower() == AUTO_PROVIDER:
+            return self._create_routed_chat(model)
+        provider = LLMProviderFactory.resolve_provider_name(provider)
+        api_key = self.config_manager.get_api_key(provider)
+        if not api_key:
+            raise ValueError(f"API key not found for {provider}")
+        
+        chat = LLMProviderFactory.create_provider(
+            provider_name=provider,
+            api_key=api_key,
+            model=model or self.config_manager.get_default_model(provider),
+            base_url=self.config_manager.get_base_url(provider),
+            api_keys=self.config_manager.get_api_keys(provider),
+            key_strategy=self.config_manager.get_setting("key_strategy"),
+            key_cooldown=self.config_manager.get_setting("key_cooldown")
+        )
+        return self._configure_chat(chat)
+    
+    def attach_file(self, path: str, options=None, chat=None):
+        """Return a reference to an excerpt of a file; raises ValueError if it cannot be attached"""
+        from chat.attachments import attach_file
+        
+        max_tokens = getattr(options, "max_tokens", None) or self.config_manager.get_setting("attachment_max_tokens")
+        if chat is not None:
+            # Leave room in the context window for the rest of the conversation
+            max_tokens = min(max_tokens, chat.get_context_budget() // 2)
+        return attach_file(
+            path,
+            max_tokens=max_tokens,
+            grep=getattr(options, "grep", None),
+            context=getattr(options, "context", None) or 0,
+            head=getattr(options, "head", None),
+            tail=getattr(options, "tail", None)
+        )
+    
+    def _create_compactor(self, provider: str):
+        """Return a Compactor for an interactive chat, or None when compaction is off"""
+        threshold = self.config_manager.get_setting("compaction_threshold")
+        if not threshold:
+            return None
+        from chat.compaction import Compactor
+        from chat.compare import parse_provider_list
+        from chat.factory import LLMProviderFactory
+        
+        spec = self.config_manager.get_setting("compaction_model")
+        if spec:
+            provider, model = parse_provider_list(spec)[0]
+        else:
+            # A cheap model of the provider already in use needs no other key
+            provider = LLMProviderFactory.resolve_provider_name(provider)
+            model = LLMProviderFactory.PROVIDERS[provider].summary_model
+        try:
+            summarizer = self._create_chat(provider, model)
+        except (ValueError, ImportError) as e:
+            print(f"Conversation compaction disabled: {e}")
+            return None
+        return Compactor(summarizer, threshold, self.config_manager.get_setting("compaction_keep_messages"))
+    
+    def _create_routed_chat(self, group: str = None):
+        """Create a chat that sends each request to the fastest healthy model of a routing group"""
+        from chat.compare import parse_provider_list
+        from chat.routing import RoutedChat
+        
+        groups = self.config_manager.get_routing_groups()
+        group = group or self.config_manager.get_setting("routing_group")
+        if group not in groups:
+            raise ValueError(f"Unknown routing group: {group}. Available: {', '.join(groups)}")
+        
+        candidates = []
+        for provider, model in parse_provider_list(",".join(groups[group])):
+            try:
+                candidates.append(self._create_chat(provider, model))
+            except (ValueError, ImportError):
+                # No API key or SDK for this one; route between the others
+                continue
+        if not candidates:
+            raise ValueError(f"No provider in routing group {group} is configured")
+        return self._configure_chat(RoutedChat(group, candidates, self._get_latency_stats()))
+    
+    def _summary_provider(self, chat) -> str:
+        """Return the provider whose cheap model compacts a chat's conversation"""
+        # A routed chat has no provider of its own; use its first candidate's
+        return chat.candidates[0].provider_name if chat.provider_name == AUTO_PROVIDER else chat.provider_name
+    
+    def _create_hedged_chat(self, primary, secondary: str, delay: float = None):
+        """Wrap a chat so slow turns are also sent to a secondary provider"""
+        from chat.compare import parse_provider_list
+        from chat.hedge import HedgedChat
+        
+        targets = parse_provider_list(secondary)
+        if len(targets) != 1:
+            raise ValueError(f"--hedge takes a single provider[:model], got {secondary!r}")
+        provider, model = targets[0]
+        if delay is None:
+            delay = self.config_manager.get_setting("hedge_delay")
+        chat = HedgedChat(primary, self._create_chat(provider, model), delay)
+        return self._configure_chat(chat)
+    
+    def compare(self, providers: str, prompt: str) -> bool:
+        """Send one prompt to several providers concurrently and show each answer as it arrives"""
+        from chat.compare import parse_provider_list, compare_providers
+        from chat.runtime import iter_sync
+        
+        chats = {}
+        for provider, model in parse_provider_list(providers):
+            label = f"{provider}:{model}" if model else provider
+            try:
+                chats[label] = self._create_chat(provider, model)
+            except Exception as e:
+                print(f"Skipping {label}: {e}")
+        
+        if not chats:
+            print("No providers available to compare.")
+            return False
+        
+        print(f"Comparing {', '.join(chats)}...")
+        print()
+        start = time.perf_counter()
+        for result in iter_sync(compare_providers(chats, prompt)):
+            print(f"=== {result['provider']} ({result['model']}) - {result['latency']:.2f}s ===")
+            print(result["response"])
+            print()
+        print(f"All {len(chats)} responses in {time.perf_counter() - start:.2f}s")
+        return True
+    
+    def ask(self, prompt: str, provider: str = None, model: str = None, attachments: list = None) -> int:
+        """Answer a single prompt on stdout without history; returns an exit code"""
+        from chat.runtime import iter_sync
+        
+        provider = provider or self.config_manager.get_default_provider()
+        try:
+            chat = self._create_chat(provider, model)
+        except (ValueError, ImportError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return EXIT_CONFIG
+        try:
+            message = {"role": "user", "content": prompt}
+            if attachments:
+                message["attachments"] = attachments
+            for chunk in iter_sync(chat.astream_complete([message])):
+                sys.stdout.write(chunk)
+                sys.stdout.flush()
+        except BrokenPipeError:
+            raise
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return EXIT_REQUEST_FAILED
+        sys.stdout.write("\n")
+        return EXIT_OK
+    
     def list_providers(self):
         """List available providers"""
+        from chat.factory import LLMProviderFactory
+        
         print("Available providers:")
         info = LLMProviderFactory.get_provider_info()
         for name, details in info.items():
@@ -172,6 +746,8 @@ class ChatCLI:
     
     def list_models(self, provider: str):
         """List models for a provider"""
+        from chat.factory import LLMProviderFactory
+        
         try:
             info = LLMProviderFactory.get_provider_info(provider)
             print(f"Models for {provider}:")
@@ -181,8 +757,268 @@ class ChatCLI:
             print(f"Error: {e}")
 
 
-def main():
-    """Main entry point"""
+def batch_main(argv):
+    """Entry point for `chatcli batch`"""
+    parser = argparse.ArgumentParser(
+        prog="chatcli batch",
+        description="Run a JSONL file of prompts concurrently",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Input lines are JSON objects with a "prompt" (or "messages") field and
+optional "id", "system", "provider" and "model" fields. Results are appended
+to the output file, which also serves as the checkpoint: rerunning the same
+command skips records that already succeeded.
+
+Examples:
+  chatcli batch --input prompts.jsonl --output results.jsonl
+  chatcli batch --input prompts.jsonl --output results.jsonl --concurrency 32 --provider claude
+        """
+    )
+    parser.add_argument("--input", required=True, help="JSONL file of prompts")
+    parser.add_argument("--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--concurrency", type=int, default=8,
+                       help="Number of requests in flight at once (default: 8)")
+    parser.add_argument("--ordered", action="store_true",
+                       help="Write results in input order instead of completion order")
+    parser.add_argument("--provider", type=str, help="Default provider for records without one")
+    parser.add_argument("--model", type=str, help="Default model for records without one")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Bypass the response cache for this run")
+    args = parser.parse_args(argv)
+    
+    from chat.batch import BatchRunner
+    from chat.runtime import run_sync
+    
+    app = ChatCLI(use_cache=not args.no_cache)
+    runner = BatchRunner(
+        chat_factory=app._create_chat,
+        provider=args.provider or app.config_manager.get_default_provider(),
+        model=args.model,
+        concurrency=args.concurrency,
+        ordered=args.ordered
+    )
+    try:
+        stats = run_sync(runner.run(args.input, args.output))
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    
+    sys.exit(1 if stats["failed"] else 0)
+
+
+def serve_main(argv):
+    """Entry point for `chatcli serve`"""
+    parser = argparse.ArgumentParser(
+        prog="chatcli serve",
+        description="Serve the configured providers through an OpenAI-compatible HTTP API",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+The model named in each request picks the provider (e.g. "gpt-4o" -> openai,
+"claude-sonnet-4" -> claude); a bare provider name such as "claude" uses that
+provider's default model.
+
+Examples:
+  chatcli serve --port 8000
+  OPENAI_BASE_URL=http://127.0.0.1:8000/v1 some-openai-tool
+        """
+    )
+    parser.add_argument("--host", default="127.0.0.1",
+                       help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    parser.add_argument("--max-concurrency", type=int,
+                       help="Requests in flight per provider (default: gateway_max_concurrency setting)")
+    parser.add_argument("--auth-token", type=str, default=os.getenv("CHATCLI_GATEWAY_TOKEN"),
+                       help="Require 'Authorization: Bearer TOKEN' (default: $CHATCLI_GATEWAY_TOKEN)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Bypass the response cache")
+    args = parser.parse_args(argv)
+    
+    import asyncio
+    from server.gateway import Gateway
+    
+    app = ChatCLI(use_cache=not args.no_cache)
+    gateway = Gateway(
+        app,
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.max_concurrency or app.config_manager.get_setting("gateway_max_concurrency"),
+        auth_token=args.auth_token
+    )
+    try:
+        asyncio.run(gateway.serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+
+class CommandArgumentParser(argparse.ArgumentParser):
+    """Argument parser for chat commands that raises ValueError instead of exiting"""
+    
+    def error(self, message):
+        raise ValueError(message)
+
+
+def add_file_selection_args(parser, max_tokens_flag: str = "--max-tokens"):
+    """Add the options that pick which part of an attached file is sent"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--grep", type=str, metavar="PATTERN",
+                       help="Send only lines matching this regular expression")
+    group.add_argument("--head", type=int, metavar="N", help="Send only the first N lines")
+    group.add_argument("--tail", type=int, metavar="N", help="Send only the last N lines")
+    parser.add_argument("-C", "--context", type=int, default=0, metavar="N",
+                        help="With --grep, also send N lines around each match")
+    parser.add_argument(max_tokens_flag, type=int, dest="max_tokens", metavar="N",
+                        help="Cap on the tokens sent per file (default: attachment_max_tokens setting)")
+
+
+def parse_file_options(argv):
+    """Parse the arguments of /file; raises ValueError on bad input"""
+    parser = CommandArgumentParser(prog="/file", add_help=False)
+    parser.add_argument("path")
+    add_file_selection_args(parser)
+    return parser.parse_args(argv)
+
+
+def read_piped_input(max_bytes: Optional[int] = None, explicit: bool = False) -> Optional[str]:
+    """Return the text piped or redirected to stdin, or None for any other stdin
+    
+    Only a pipe or a regular file is read, unless explicit (`-p -`): a
+    terminal, /dev/null or a descriptor inherited from cron or a parent
+    process may never reach EOF. Input is read and decoded chunk by chunk,
+    so oversized input is refused (ValueError) as soon as it passes
+    max_bytes rather than after all of it has been buffered.
+    """
+    if sys.stdin is None:
+        return None
+    if not explicit:
+        try:
+            mode = os.fstat(sys.stdin.fileno()).st_mode
+        except (OSError, ValueError):
+            return None
+        if not (stat.S_ISFIFO(mode) or stat.S_ISREG(mode)):
+            return None
+    decoder = codecs.getincrementaldecoder(sys.stdin.encoding or "utf-8")(errors="replace")
+    parts = []
+    size = 0
+    while True:
+        chunk = sys.stdin.buffer.read1(STDIN_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise ValueError(f"piped input exceeds {max_bytes} bytes (max_stdin_bytes setting)")
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+def run_one_shot(args) -> int:
+    """Answer -p PROMPT, followed by any piped input, on stdout; returns an exit code
+    
+    Only the answer is written to stdout, chunk by chunk as it arrives;
+    errors go to stderr. The daemon is used when it is running, so the
+    provider SDKs are only imported here as a fallback; --no-cache skips it,
+    since the daemon's chats keep using the cache.
+    """
+    from server.client import DaemonClient, DaemonUnavailable
+    
+    # `-p -` reads the prompt from stdin whatever stdin is
+    explicit = args.one_shot == "-"
+    try:
+        piped = read_piped_input(ConfigManager().get_setting("max_stdin_bytes"), explicit)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    prompt = "\n\n".join(part for part in ("" if explicit else args.one_shot, piped) if part and part.strip())
+    if not prompt and not args.files:
+        print("Error: -p needs a prompt, piped input or --file", file=sys.stderr)
+        return EXIT_USAGE
+    
+    attachments = []
+    if args.files:
+        from chat.attachments import attach_file
+        max_tokens = args.max_tokens or ConfigManager().get_setting("attachment_max_tokens")
+        try:
+            for path in args.files:
+                attachments.append(attach_file(path, max_tokens, args.grep, args.context, args.head, args.tail))
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return EXIT_USAGE
+    
+    provider, model = resolve_provider_args(args)
+    try:
+        if not args.no_cache:
+            try:
+                DaemonClient().ask(prompt, provider, model, attachments=attachments)
+                sys.stdout.write("\n")
+                return EXIT_OK
+            except DaemonUnavailable:
+                pass
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return EXIT_CONFIG
+            except BrokenPipeError:
+                raise
+            except (RuntimeError, OSError) as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return EXIT_REQUEST_FAILED
+        return ChatCLI(use_cache=not args.no_cache).ask(prompt, provider, model, attachments)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); point stdout at /dev/null so
+        # the interpreter's final flush does not fail as well
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return EXIT_BROKEN_PIPE
+
+
+def resolve_provider_args(args):
+    """Return the (provider, model) selected by --provider/--model and the shortcuts"""
+    provider = None
+    model = args.model
+    
+    # Check shortcuts first
+    if args.openai:
+        provider = "openai"
+    elif args.gpt4:
+        provider = "openai"
+        model = model or "gpt-4o"
+    elif args.gpt4_mini:
+        provider = "openai"
+        model = model or "gpt-4o-mini"
+    elif args.claude:
+        provider = "claude"
+    elif args.gemini:
+        provider = "gemini"
+    elif args.deepseek:
+        provider = "deepseek"
+    elif args.reasoner:
+        provider = "deepseek"
+        model = model or "deepseek-reasoner"
+    elif args.grok:
+        provider = "grok"
+    elif args.provider:
+        provider = args.provider
+    return provider, model
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main entry point; argv defaults to the command line"""
+    if argv is None:
+        argv = sys.argv[1:]
+    # Subcommands get their own parsers
+    if argv and argv[0] == "batch":
+        batch_main(argv[1:])
+        return
+    if argv and argv[0] == "serve":
+        serve_main(argv[1:])
+        return
+    
     parser = argparse.ArgumentParser(
         description="ChatCLI - Multi-LLM Terminal Chat",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -198,6 +1034,18 @@ Examples:
   chatcli --set-default-model openai gpt-4o # Set GPT-4o as default for OpenAI
   chatcli --config                          # Show current configuration
   chatcli --list-providers                  # Show providers
+  chatcli --compare claude,openai,gemini "Explain CRDTs"
+  chatcli --resume last                     # Continue the most recent saved session
+  chatcli --search "postgres deadlock"      # Find turns in saved sessions
+  chatcli --claude --hedge openai:gpt-4o-mini --hedge-delay 0.8
+  chatcli --provider auto --model fast       # Fastest healthy model of the "fast" group
+  chatcli --metrics                         # Latency percentiles from past requests
+  chatcli --daemon                          # Keep provider clients warm in the background
+  chatcli -p "What is a monad?"             # One-shot answer (via the daemon if running)
+  git diff | chatcli -p "Write a commit message"
+  chatcli --file app.log --grep ERROR -C 3 -p "Why does this fail?"
+  chatcli batch --input prompts.jsonl --output results.jsonl --concurrency 16
+  chatcli serve --port 8000                 # OpenAI-compatible API for local tools
         """
     )
     
@@ -211,14 +1059,52 @@ Examples:
                        help="Set the default provider")
     parser.add_argument("--set-default-model", nargs=2, metavar=("PROVIDER", "MODEL"),
                        help="Set default model for a provider")
+    parser.add_argument("--set-rate-limit", nargs=3, metavar=("PROVIDER[:MODEL]", "RPM", "TPM"),
+                       help="Pace requests to a provider (or one model) to RPM requests and TPM "
+                            "tokens per minute across all chatcli processes; 0 means no limit")
+    parser.add_argument("--set-route-group", nargs=2, metavar=("NAME", "PROVIDER:MODEL,..."),
+                       help="Define a routing group of interchangeable models for --provider auto")
     parser.add_argument("--provider", type=str,
-                       help="LLM provider to use (openai, deepseek, claude, gemini, grok)")
+                       help="LLM provider to use (openai, deepseek, claude, gemini, grok), or auto "
+                            "to route each request to the fastest model of a routing group")
     parser.add_argument("--model", type=str,
-                       help="Model to use")
+                       help="Model to use (with --provider auto, the routing group)")
     parser.add_argument("--list-providers", action="store_true",
                        help="List available providers")
     parser.add_argument("--list-models", type=str, metavar="PROVIDER",
                        help="List models for a provider")
+    parser.add_argument("--compare", type=str, metavar="PROVIDERS",
+                       help="Send the prompt to several providers at once (e.g. claude,openai,gemini)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Bypass the response cache for this session")
+    parser.add_argument("--resume", type=str, metavar="SESSION",
+                       help="Resume a saved session (id, id prefix or 'last')")
+    parser.add_argument("--sessions", action="store_true",
+                       help="List saved sessions")
+    parser.add_argument("--search", type=str, metavar="TERMS",
+                       help="Search saved sessions for turns matching all terms")
+    parser.add_argument("-p", "--prompt", type=str, nargs="?", const="", dest="one_shot", metavar="PROMPT",
+                       help="Answer a single prompt, plus any piped input, and exit "
+                            "(served by the daemon if it is running); -p - reads the prompt from stdin")
+    parser.add_argument("--daemon", action="store_true",
+                       help="Start a background daemon that keeps provider clients warm")
+    parser.add_argument("--foreground", action="store_true",
+                       help="With --daemon, stay attached to the terminal")
+    parser.add_argument("--daemon-status", action="store_true",
+                       help="Show whether the daemon is running")
+    parser.add_argument("--daemon-stop", action="store_true",
+                       help="Stop the background daemon")
+    parser.add_argument("--metrics", action="store_true",
+                       help="Show latency percentiles per provider and model")
+    parser.add_argument("--hedge", type=str, metavar="PROVIDER[:MODEL]",
+                       help="Also send slow turns to this provider; the first to answer wins")
+    parser.add_argument("--hedge-delay", type=float, metavar="SECONDS",
+                       help="Seconds to wait for the first token before hedging (default: hedge_delay setting)")
+    parser.add_argument("--file", action="append", dest="files", metavar="PATH",
+                       help="Attach a file to the first message or -p prompt (repeatable)")
+    add_file_selection_args(parser, "--max-file-tokens")
+    parser.add_argument("prompt", nargs="*",
+                       help="Prompt text (used with --compare)")
     
     # Provider shortcuts
     parser.add_argument("--openai", action="store_true", help="Use OpenAI (shortcut)")
@@ -230,9 +1116,34 @@ Examples:
     parser.add_argument("--reasoner", action="store_true", help="Use DeepSeek Reasoner (shortcut)")
     parser.add_argument("--grok", action="store_true", help="Use Grok (shortcut)")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    
+    # One-shot prompts go to the daemon first, before any provider setup
+    if args.one_shot is not None:
+        sys.exit(run_one_shot(args))
+    
+    if args.daemon_status or args.daemon_stop:
+        from server.client import DaemonClient
+        client = DaemonClient()
+        status = client.ping()
+        if status is None:
+            print("chatcli daemon is not running")
+            sys.exit(1 if args.daemon_status else 0)
+        if args.daemon_stop:
+            client.shutdown()
+            print(f"chatcli daemon stopped (pid {status['pid']})")
+        else:
+            print(f"chatcli daemon running (pid {status['pid']}, up {status['uptime']:.0f}s, "
+                  f"{status['requests']} requests)")
+            if status["chats"]:
+                print(f"Warm providers: {', '.join(status['chats'])}")
+        return
+    
+    app = ChatCLI(use_cache=not args.no_cache)
     
-    app = ChatCLI()
+    if args.daemon:
+        from server.daemon import start_daemon
+        sys.exit(start_daemon(app, foreground=args.foreground))
     
     # Handle setup
     if args.setup:
@@ -280,6 +1191,35 @@ Examples:
             print("Available providers:", ", ".join(["openai", "deepseek", "claude", "gemini", "grok"]))
         return
     
+    if args.set_rate_limit:
+        target, rpm, tpm = args.set_rate_limit
+        provider, _, model = target.partition(":")
+        if not app.config_manager.validate_provider(provider):
+            print(f"Invalid provider: {provider}")
+            sys.exit(EXIT_USAGE)
+        try:
+            rpm, tpm = int(rpm), int(tpm)
+        except ValueError:
+            print("RPM and TPM must be whole numbers")
+            sys.exit(EXIT_USAGE)
+        app.config_manager.set_rate_limits(provider, rpm, tpm, model or None)
+        print(f"Rate limit for {target} set to: {rpm or 'unlimited'} requests/min, "
+              f"{tpm or 'unlimited'} tokens/min")
+        return
+    
+    if args.set_route_group:
+        name, targets = args.set_route_group
+        from chat.compare import parse_provider_list
+        targets = parse_provider_list(targets)
+        invalid = [provider for provider, _ in targets if not app.config_manager.validate_provider(provider)]
+        if not targets or invalid:
+            print(f"Invalid provider: {', '.join(invalid) or 'none given'}")
+            sys.exit(EXIT_USAGE)
+        targets = [f"{provider}:{model}" if model else provider for provider, model in targets]
+        app.config_manager.set_routing_group(name, targets)
+        print(f"Routing group {name}: {', '.join(targets)}")
+        return
+    
     # Handle provider/model listing
     if args.list_providers:
         app.list_providers()
@@ -289,36 +1229,36 @@ Examples:
         app.list_models(args.list_models)
         return
     
-    # Determine provider and model from arguments
-    provider = None
-    model = args.model
+    if args.sessions:
+        app.list_sessions()
+        return
     
-    # Check shortcuts first
-    if args.openai:
-        provider = "openai"
-    elif args.gpt4:
-        provider = "openai"
-        model = model or "gpt-4o"
-    elif args.gpt4_mini:
-        provider = "openai"
-        model = model or "gpt-4o-mini"
-    elif args.claude:
-        provider = "claude"
-    elif args.gemini:
-        provider = "gemini"
-    elif args.deepseek:
-        provider = "deepseek"
-    elif args.reasoner:
-        provider = "deepseek"
-        model = model or "deepseek-reasoner"
-    elif args.grok:
-        provider = "grok"
-    elif args.provider:
-        provider = args.provider
+    if args.metrics:
+        app.show_metrics()
+        return
+    
+    if args.search:
+        if not app.search(args.search, limit=20):
+            sys.exit(1)
+        print("\nContinue one with: chatcli --resume <session>")
+        return
+    
+    # Handle one-off multi-provider comparison
+    if args.compare:
+        if not args.prompt:
+            parser.error("--compare requires a prompt")
+        if not app.compare(args.compare, " ".join(args.prompt)):
+            sys.exit(1)
+        return
+    
+    # Determine provider and model from arguments
+    provider, model = resolve_provider_args(args)
     
     # Start chat
     try:
-        app.start_chat(provider=provider, model=model)
+        app.start_chat(provider=provider, model=model, resume=args.resume,
+                       hedge=args.hedge, hedge_delay=args.hedge_delay,
+                       files=args.files, file_options=args)
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
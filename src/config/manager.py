@@ -7,7 +7,7 @@ Handles configuration for all LLM providers
 import os
 import json
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 
 class ConfigManager:
@@ -58,8 +58,40 @@ class ConfigManager:
             },
             "settings": {
                 "conversation_history_limit": 100,
+                "context_token_budget": None,
                 "auto_save_conversations": False,
-                "show_response_time": False
+                "show_response_time": False,
+                "show_token_usage": False,
+                "prompt_caching": True,
+                "response_cache": False,
+                "response_cache_ttl": 86400,
+                "response_cache_max_entries": 10000,
+                "client_pool_size": 16,
+                "client_idle_timeout": 300,
+                "max_connections_per_client": 100,
+                "max_retries": 3,
+                "circuit_breaker_threshold": 5,
+                "circuit_breaker_reset_timeout": 30,
+                "hedge_delay": 1.0,
+                "record_metrics": True,
+                "metrics_max_bytes": 10000000,
+                "gateway_max_concurrency": 16,
+                "max_stdin_bytes": 10000000,
+                "compaction_threshold": None,
+                "compaction_keep_messages": 6,
+                "compaction_model": None,
+                "attachment_max_tokens": 20000,
+                "search_index": True,
+                "similarity_cache": False,
+                "similarity_threshold": 0.9,
+                "similarity_cache_max_entries": 100000,
+                "key_strategy": "least_loaded",
+                "key_cooldown": 30,
+                "routing_group": "fast",
+                "coalesce_requests": True
+            },
+            "routing_groups": {
+                "fast": ["openai:gpt-4o-mini", "claude:claude-3-5-haiku-20241022", "gemini:gemini-2.0-flash"]
             }
         }
     
@@ -90,8 +122,32 @@ class ConfigManager:
         if env_key:
             return env_key
         
-        # Then check config file
-        return self.config.get("providers", {}).get(provider, {}).get("api_key", "")
+        # Then check config file, then the first key of a key pool
+        api_key = self.config.get("providers", {}).get(provider, {}).get("api_key")
+        return api_key or next(iter(self._key_pool(provider)), "")
+    
+    def _key_pool(self, provider: str) -> List[str]:
+        """Get the keys listed for a provider's key pool, if any"""
+        # e.g. OPENAI_API_KEYS="sk-a,sk-b", or "api_keys": [...] in the config file
+        env_vars = {
+            "openai": "OPENAI_API_KEYS",
+            "deepseek": "DEEPSEEK_API_KEYS",
+            "claude": "ANTHROPIC_API_KEYS",
+            "gemini": "GOOGLE_API_KEYS",
+            "grok": "XAI_API_KEYS"
+        }
+        env_keys = os.getenv(env_vars.get(provider, ""))
+        if env_keys:
+            return [key.strip() for key in env_keys.split(",") if key.strip()]
+        return list(self.config.get("providers", {}).get(provider, {}).get("api_keys") or [])
+    
+    def get_api_keys(self, provider: str) -> List[str]:
+        """Get every API key configured for a provider, for spreading requests over them"""
+        keys = self._key_pool(provider)
+        if keys:
+            return keys
+        api_key = self.get_api_key(provider)
+        return [api_key] if api_key else []
     
     def set_api_key(self, provider: str, api_key: str):
         """Set API key for a provider"""
@@ -103,6 +159,15 @@ class ConfigManager:
         self.config["providers"][provider]["api_key"] = api_key
         self.save_config()
     
+    def get_base_url(self, provider: str) -> Optional[str]:
+        """Get the API endpoint override for a provider, if any"""
+        # e.g. CHATCLI_OPENAI_BASE_URL, for proxies and local test servers
+        env_url = os.getenv(f"CHATCLI_{provider.upper()}_BASE_URL")
+        if env_url:
+            return env_url
+        
+        return self.config.get("providers", {}).get(provider, {}).get("base_url") or None
+    
     def get_default_provider(self) -> str:
         """Get default provider"""
         return self.config.get("default_provider", "openai")
@@ -126,8 +191,45 @@ class ConfigManager:
         self.config["providers"][provider]["default_model"] = model
         self.save_config()
     
+    def get_rate_limits(self, provider: str) -> Optional[Dict[str, Any]]:
+        """Get the client-side rate limits for a provider, if any
+        
+        e.g. {"requests_per_minute": 500, "tokens_per_minute": 200000,
+        "models": {"gpt-4o": {"tokens_per_minute": 30000}}}
+        """
+        return self.config.get("providers", {}).get(provider, {}).get("rate_limits") or None
+    
+    def set_rate_limits(self, provider: str, requests_per_minute: int, tokens_per_minute: int,
+                        model: str = None):
+        """Set the rate limits for a provider, or for one of its models; 0 means no limit"""
+        provider_config = self.config.setdefault("providers", {}).setdefault(provider, {})
+        limits = provider_config.setdefault("rate_limits", {})
+        if model:
+            limits = limits.setdefault("models", {}).setdefault(model, {})
+        limits["requests_per_minute"] = requests_per_minute or None
+        limits["tokens_per_minute"] = tokens_per_minute or None
+        self.save_config()
+    
+    def get_routing_groups(self) -> Dict[str, List[str]]:
+        """Get the model groups that --provider auto routes between
+        
+        e.g. {"fast": ["openai:gpt-4o-mini", "gemini:gemini-2.0-flash"]}
+        """
+        groups = dict(self._get_default_config()["routing_groups"])
+        groups.update(self.config.get("routing_groups") or {})
+        return groups
+    
+    def set_routing_group(self, name: str, targets: List[str]):
+        """Set the provider:model targets of a routing group"""
+        self.config.setdefault("routing_groups", {})[name] = list(targets)
+        self.save_config()
+    
     def get_setting(self, key: str, default=None):
         """Get a setting value"""
+        # Fall back to built-in defaults for settings added after the
+        # config file was written
+        if default is None:
+            default = self._get_default_config()["settings"].get(key)
         return self.config.get("settings", {}).get(key, default)
     
     def set_setting(self, key: str, value: Any):
@@ -185,7 +287,7 @@ class ConfigManager:
     def validate_model_for_provider(self, provider: str, model: str) -> bool:
         """Validate if model is available for the provider"""
         # Import here to avoid circular imports
-        from ..chat.factory import LLMProviderFactory
+        from chat.factory import LLMProviderFactory
         try:
             info = LLMProviderFactory.get_provider_info(provider)
             return model in info['available_models']
@@ -214,7 +316,7 @@ class ConfigManager:
         
         # Configure default models
         print("Configure default models for each provider:")
-        from ..chat.factory import LLMProviderFactory
+        from chat.factory import LLMProviderFactory
         
         for provider in providers:
             try:
@@ -246,15 +348,32 @@ class ConfigManager:
         
         print("Providers:")
         for provider in ["openai", "deepseek", "claude", "gemini", "grok"]:
-            api_key = self.get_api_key(provider)
-            status = "✓ Configured" if api_key else "✗ Not configured"
+            api_keys = self.get_api_keys(provider)
+            status = "✓ Configured" if api_keys else "✗ Not configured"
+            if len(api_keys) > 1:
+                status += f" ({len(api_keys)} keys)"
             default_model = self.get_default_model(provider) or "default"
             print(f"  {provider}: {status} (model: {default_model})")
+            limits = self.get_rate_limits(provider)
+            if limits:
+                for model, model_limits in [(None, limits)] + sorted((limits.get("models") or {}).items()):
+                    scope = f" {model}" if model else ""
+                    rpm = model_limits.get("requests_per_minute") or "-"
+                    tpm = model_limits.get("tokens_per_minute") or "-"
+                    print(f"    rate limit{scope}: {rpm} requests/min, {tpm} tokens/min")
+        
+        print("\nRouting groups (--provider auto):")
+        for name, targets in self.get_routing_groups().items():
+            print(f"  {name}: {', '.join(targets)}")
         
         print("\nSettings:")
-        settings = self.config.get("settings", {})
+        # Built-in defaults too, for settings added after the file was written
+        settings = dict(self._get_default_config()["settings"], **self.config.get("settings", {}))
         for key, value in settings.items():
             print(f"  {key}: {value}")
+        if not settings.get("compaction_threshold"):
+            print("  (compaction is off; set compaction_threshold, e.g. 24000, to have a cheap model "
+                  "summarize old turns, which costs extra requests)")
     
     def set_config_value(self, key: str, value: str) -> bool:
         """Set a configuration value via command line"""
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Daemon Client
+Thin client that forwards one-shot prompts to a running chatcli daemon
+
+Only the standard library is imported here, so that a query routed through
+the daemon does not pay for loading the provider SDKs.
+"""
+
+import json
+import socket
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+
+def get_socket_path() -> Path:
+    """Return the path of the daemon's Unix domain socket"""
+    return Path.home() / ".chatcli" / "daemon.sock"
+
+
+class DaemonUnavailable(Exception):
+    """Raised when no daemon is listening on the socket"""
+
+
+class DaemonClient:
+    """Sends requests to the daemon as JSON lines and reads JSON-line replies"""
+
+    def __init__(self, path: Optional[Path] = None, timeout: Optional[float] = None):
+        self.path = Path(path) if path else get_socket_path()
+        self.timeout = timeout
+
+    def _connect(self) -> socket.socket:
+        if not hasattr(socket, "AF_UNIX") or not self.path.exists():
+            raise DaemonUnavailable(f"no daemon socket at {self.path}")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.path))
+        except OSError as e:
+            sock.close()
+            # A stale socket left behind by a daemon that did not shut down
+            raise DaemonUnavailable(f"daemon not responding on {self.path}: {e}")
+        return sock
+
+    def request(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Send one request and yield the daemon's replies until it is done"""
+        sock = self._connect()
+        try:
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+            with sock.makefile("rb") as replies:
+                for line in replies:
+                    reply = json.loads(line)
+                    yield reply
+                    if reply.get("done"):
+                        return
+            raise ConnectionError("daemon closed the connection mid-reply")
+        finally:
+            sock.close()
+
+    def ping(self) -> Optional[Dict[str, Any]]:
+        """Return the daemon's status, or None if it is not running"""
+        try:
+            for reply in self.request({"op": "ping"}):
+                return reply
+        except (DaemonUnavailable, OSError, ValueError):
+            return None
+        return None
+
+    def shutdown(self) -> bool:
+        """Ask the daemon to exit; returns False if it was not running"""
+        try:
+            for _ in self.request({"op": "shutdown"}):
+                pass
+        except (DaemonUnavailable, OSError, ValueError):
+            return False
+        return True
+
+    def ask(self, prompt: str, provider: str = None, model: str = None, out: TextIO = None,
+            attachments: List[Dict[str, Any]] = None) -> None:
+        """Stream the answer to a one-shot prompt to out
+
+        Raises DaemonUnavailable if no daemon is running (nothing has been
+        written yet in that case), ValueError when the provider cannot be set
+        up (e.g. a missing API key) and RuntimeError for failed requests.
+        """
+        out = out or sys.stdout
+        payload = {"op": "ask", "prompt": prompt, "provider": provider, "model": model}
+        if attachments:
+            # File references; the daemon reads the files itself
+            payload["attachments"] = attachments
+        for reply in self.request(payload):
+            if "chunk" in reply:
+                out.write(reply["chunk"])
+                out.flush()
+            elif "error" in reply:
+                if reply.get("setup"):
+                    raise ValueError(reply["error"])
+                raise RuntimeError(reply["error"])
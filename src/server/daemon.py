@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Chat Daemon
+Background process that answers one-shot prompts with warm provider clients
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from chat.base import ConversationChat
+from chat.factory import LLMProviderFactory
+from .client import DaemonClient, get_socket_path
+
+
+class ChatDaemon:
+    """Serves prompts from DaemonClient over a Unix domain socket
+
+    Provider chats are created on first use and kept for the life of the
+    daemon, so SDK imports, configuration loading and TLS connections are
+    paid once rather than on every invocation. Each request is a standalone
+    single-turn conversation.
+    """
+
+    def __init__(self, app, path: Optional[Path] = None):
+        # ChatCLI instance whose configuration and settings are used
+        self.app = app
+        self.path = Path(path) if path else get_socket_path()
+        self.started = time.time()
+        self.requests = 0
+        self._chats: Dict[Tuple[str, Optional[str]], ConversationChat] = {}
+        self._stop: Optional[asyncio.Event] = None
+
+    def _get_chat(self, provider: Optional[str], model: Optional[str]) -> ConversationChat:
+        """Return the shared chat for a provider and model, creating it on first use"""
+        provider = LLMProviderFactory.resolve_provider_name(
+            provider or self.app.config_manager.get_default_provider()
+        )
+        key = (provider, model)
+        chat = self._chats.get(key)
+        if chat is None:
+            chat = self.app._create_chat(provider, model)
+            self._chats[key] = chat
+        return chat
+
+    async def serve(self):
+        """Accept connections until a shutdown request arrives"""
+        self._stop = asyncio.Event()
+        try:
+            # Import the default provider's SDK now rather than on the first request
+            self._get_chat(None, None)
+        except Exception as e:
+            print(f"Default provider unavailable: {e}", file=sys.stderr, flush=True)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            # Left behind by a daemon that did not shut down cleanly
+            self.path.unlink()
+
+        server = await asyncio.start_unix_server(self._handle_connection, path=str(self.path))
+        os.chmod(self.path, 0o600)
+        # Shut down cleanly, removing the socket, on kill
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self._stop.set)
+        print(f"chatcli daemon listening on {self.path} (pid {os.getpid()})", file=sys.stderr, flush=True)
+        try:
+            await self._stop.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Handle one request per connection"""
+        async def send(reply: Dict[str, Any]):
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+
+        try:
+            try:
+                request = json.loads(await reader.readline())
+                op = request["op"]
+            except (ValueError, KeyError, TypeError):
+                await send({"error": "malformed request", "done": True})
+                return
+
+            if op == "ping":
+                await send({
+                    "done": True,
+                    "pid": os.getpid(),
+                    "uptime": round(time.time() - self.started, 1),
+                    "requests": self.requests,
+                    "chats": [f"{chat.provider_name}:{chat.model}" for chat in self._chats.values()]
+                })
+            elif op == "shutdown":
+                await send({"done": True})
+                self._stop.set()
+            elif op == "ask":
+                self.requests += 1
+                await self._ask(request, send)
+            else:
+                await send({"error": f"unknown op: {op}", "done": True})
+        except ConnectionError:
+            # The client went away (e.g. Ctrl-C); leaving the stream here
+            # cancels the upstream request
+            pass
+        finally:
+            writer.close()
+
+    async def _ask(self, request: Dict[str, Any], send):
+        """Stream the answer to a one-shot prompt"""
+        try:
+            chat = self._get_chat(request.get("provider"), request.get("model"))
+        except Exception as e:
+            # Unknown provider or missing API key, as opposed to a failed request
+            await send({"error": str(e), "setup": True, "done": True})
+            return
+
+        message = {"role": "user", "content": request.get("prompt", "")}
+        if request.get("attachments"):
+            message["attachments"] = request["attachments"]
+        messages = [message]
+        stream = chat.astream_complete(messages)
+        try:
+            async for chunk in stream:
+                await send({"chunk": chunk})
+        except ConnectionError:
+            raise
+        except Exception as e:
+            await send({"error": str(e), "done": True})
+            return
+        finally:
+            # Closes the upstream HTTP stream right away if the client left
+            await stream.aclose()
+        await send({"done": True})
+
+
+def start_daemon(app, foreground: bool = False, log_path: Optional[Path] = None) -> int:
+    """Start the daemon, detached unless foreground; returns an exit code
+
+    When detached, this returns in both processes: in the parent once the
+    daemon answers, and in the daemon itself once it has shut down.
+    """
+    client = DaemonClient()
+    status = client.ping()
+    if status is not None:
+        print(f"chatcli daemon already running (pid {status['pid']})")
+        return 1
+
+    daemon = ChatDaemon(app, client.path)
+    if foreground:
+        try:
+            asyncio.run(daemon.serve())
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    log_path = log_path or client.path.with_name("daemon.log")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        # Child: leave the terminal's session and log to a file
+        os.setsid()
+        with open(os.devnull, "rb") as devnull:
+            os.dup2(devnull.fileno(), 0)
+        with open(log_path, "ab") as log:
+            os.dup2(log.fileno(), 1)
+            os.dup2(log.fileno(), 2)
+        try:
+            asyncio.run(daemon.serve())
+        except Exception:
+            traceback.print_exc()
+            return 1
+        return 0
+
+    # Parent: wait until the daemon answers, or report why it died
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        status = client.ping()
+        if status is not None:
+            print(f"chatcli daemon started (pid {status['pid']}, socket {client.path})")
+            return 0
+        exited, _ = os.waitpid(pid, os.WNOHANG)
+        if exited:
+            break
+        time.sleep(0.05)
+    print(f"chatcli daemon failed to start; see {log_path}", file=sys.stderr)
+    return 1
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible Gateway
+Local HTTP server exposing the configured providers as /v1/chat/completions
+"""
+
+import asyncio
+import json
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from chat.factory import LLMProviderFactory
+from chat.resilience import CircuitOpenError, get_status_code
+from chat.routing import AUTO_PROVIDER
+
+# Request bodies larger than this are rejected
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large",
+           429: "Too Many Requests", 500: "Internal Server Error", 502: "Bad Gateway",
+           503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    """Error reported to the client in OpenAI's error format"""
+
+    def __init__(self, status: int, message: str, error_type: str = "invalid_request_error"):
+        super().__init__(message)
+        self.status = status
+        self.error_type = error_type
+
+
+class Gateway:
+    """Serves OpenAI chat-completions requests from any configured provider
+
+    The provider is chosen from the requested model name with
+    LLMProviderFactory.auto_detect_provider; a bare provider name or alias
+    ("claude") selects that provider's default model, and "auto" or the name
+    of a routing group routes each request to the fastest model of the group
+    (the routing_group setting for "auto"). Upstream SDK clients
+    come from the shared client pool, so connections are reused across
+    requests, and each provider has its own limit on requests in flight.
+    """
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 8000,
+                 max_concurrency: int = 16, auth_token: Optional[str] = None):
+        # ChatCLI instance whose configuration and settings are used
+        self.app = app
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.auth_token = auth_token
+        self.requests = 0
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def serve(self):
+        """Accept connections until cancelled"""
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"chatcli gateway listening on http://{self.host}:{self.port}/v1", file=sys.stderr, flush=True)
+        async with server:
+            await server.serve_forever()
+
+    def _route(self, requested: Optional[str]) -> Tuple[str, Optional[str]]:
+        """Map a requested model name to (provider, model)"""
+        if not requested:
+            return self.app.config_manager.get_default_provider(), None
+        name = LLMProviderFactory.resolve_provider_name(requested)
+        if name in LLMProviderFactory.PROVIDERS or name == AUTO_PROVIDER:
+            return name, None
+        if requested in self.app.config_manager.get_routing_groups():
+            return AUTO_PROVIDER, requested
+        return LLMProviderFactory.auto_detect_provider(requested), requested
+
+    def _get_semaphore(self, provider: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[provider] = semaphore
+        return semaphore
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one keep-alive connection"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send_error(writer, e, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self._dispatch(writer, method, path, headers, body, keep_alive)
+                except HTTPError as e:
+                    await self._send_error(writer, e, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Read one request; None when the client closed the connection"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "request headers too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        if version == "HTTP/1.0":
+            headers.setdefault("connection", "close")
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(411, "chunked request bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get("content-length") or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            raise HTTPError(400, "malformed Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"request body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length)
+        return method, path, headers, body
+
+    async def _dispatch(self, writer: asyncio.StreamWriter, method: str, path: str,
+                        headers: Dict[str, str], body: bytes, keep_alive: bool):
+        """Route a request to its handler"""
+        path = path.split("?", 1)[0].rstrip("/")
+        if path == "/health":
+            await self._send_json(writer, 200, {"status": "ok", "requests": self.requests}, keep_alive)
+            return
+
+        if self.auth_token and headers.get("authorization") != f"Bearer {self.auth_token}":
+            raise HTTPError(401, "invalid or missing bearer token", "authentication_error")
+
+        if path == "/v1/models":
+            if method != "GET":
+                raise HTTPError(405, f"{method} not allowed on {path}")
+            await self._send_json(writer, 200, self._list_models(), keep_alive)
+        elif path == "/v1/chat/completions":
+            if method != "POST":
+                raise HTTPError(405, f"{method} not allowed on {path}")
+            self.requests += 1
+            await self._chat_completions(writer, body, keep_alive)
+        else:
+            raise HTTPError(404, f"no route for {method} {path}")
+
+    def _list_models(self) -> Dict[str, Any]:
+        """List the models of every provider with an API key"""
+        data = []
+        for name, info in LLMProviderFactory.get_provider_info().items():
+            if not self.app.config_manager.get_api_key(name):
+                continue
+            for model in info["available_models"]:
+                data.append({"id": model, "object": "model", "created": 0, "owned_by": name})
+        return {"object": "list", "data": data}
+
+    @staticmethod
+    def _parse_messages(payload: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Convert OpenAI request messages to the providers' plain-text messages"""
+        messages = payload.get("messages")
+        if not isinstance(messages, list) or not messages:
+            raise HTTPError(400, "'messages' must be a non-empty list")
+
+        converted = []
+        for message in messages:
+            if not isinstance(message, dict) or message.get("role") not in ("system", "user", "assistant"):
+                raise HTTPError(400, "each message needs a role of system, user or assistant")
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                # Content parts: only text is supported
+                content = "".join(part.get("text", "") for part in content
+                                  if isinstance(part, dict) and part.get("type") == "text")
+            converted.append({"role": message["role"], "content": str(content)})
+        return converted
+
+    async def _chat_completions(self, writer: asyncio.StreamWriter, body: bytes, keep_alive: bool):
+        """Handle POST /v1/chat/completions"""
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "request body must be a JSON object")
+        messages = self._parse_messages(payload)
+
+        provider, model = self._route(payload.get("model"))
+        try:
+            # Chats are cheap; the SDK client behind them is pooled
+            chat = self.app._create_chat(provider, model)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        async with self._get_semaphore(provider):
+            if payload.get("stream"):
+                include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+                await self._stream_completion(writer, chat, messages, completion_id, created, include_usage)
+                return
+
+            try:
+                text = await chat.acomplete(messages)
+            except Exception as e:
+                raise self._upstream_error(e)
+
+        await self._send_json(writer, 200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": chat.model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop"
+            }],
+            "usage": self._usage(chat)
+        }, keep_alive)
+
+    async def _stream_completion(self, writer: asyncio.StreamWriter, chat, messages: List[Dict[str, str]],
+                                 completion_id: str, created: int, include_usage: bool):
+        """Stream a completion as server-sent events"""
+        stream = chat.astream_complete(messages)
+        try:
+            # Wait for the first chunk so upstream failures still get a
+            # proper HTTP error status
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                raise self._upstream_error(e)
+
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\nTransfer-Encoding: chunked\r\n\r\n")
+
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+                return {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                    "model": chat.model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }
+
+            await self._send_event(writer, chunk({"role": "assistant", "content": first or ""}))
+            try:
+                async for text in stream:
+                    await self._send_event(writer, chunk({"content": text}))
+            except ConnectionError:
+                raise
+            except Exception as e:
+                # Headers are already sent; report the failure in-band
+                await self._send_event(writer, {"error": {"message": str(e), "type": "upstream_error"}})
+            else:
+                await self._send_event(writer, chunk({}, "stop"))
+                if include_usage:
+                    await self._send_event(writer, {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                        "model": chat.model, "choices": [], "usage": self._usage(chat)
+                    })
+            await self._send_event(writer, "[DONE]")
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            # Closes the upstream stream at once if the client went away
+            await stream.aclose()
+
+    @staticmethod
+    def _usage(chat) -> Dict[str, Any]:
+        """Return OpenAI-style usage for the chat's last request"""
+        usage = chat.last_usage or {}
+        prompt_tokens = usage.get("input_tokens", 0)
+        completion_tokens = usage.get("output_tokens", 0)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": usage.get("cached_input_tokens", 0)}
+        }
+
+    @staticmethod
+    def _upstream_error(e: Exception) -> HTTPError:
+        """Translate a provider failure into an HTTP error"""
+        if isinstance(e, CircuitOpenError):
+            return HTTPError(503, str(e), "upstream_unavailable")
+        status = get_status_code(e)
+        if status in (400, 401, 403, 404, 413, 429):
+            return HTTPError(status, str(e), "upstream_error")
+        return HTTPError(502, str(e), "upstream_error")
+
+    @staticmethod
+    async def _send_event(writer: asyncio.StreamWriter, data: Any):
+        """Send one server-sent event as an HTTP chunk"""
+        text = data if isinstance(data, str) else json.dumps(data, separators=(",", ":"))
+        payload = b"data: " + text.encode() + b"\n\n"
+        writer.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], keep_alive: bool):
+        """Send a JSON response"""
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        connection = "keep-alive" if keep_alive else "close"
+        writer.write(f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: {connection}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _send_error(self, writer: asyncio.StreamWriter, error: HTTPError, keep_alive: bool):
+        """Send an error in OpenAI's format"""
+        await self._send_json(writer, error.status, {
+            "error": {"message": str(error), "type": error.error_type, "code": error.status}
+        }, keep_alive)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Batch Tests
+Malformed input lines are reported with their location
+"""
+
+import asyncio
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from chat.batch import BatchRunner
+
+
+def unused_factory(provider, model):
+    raise AssertionError("no request should be made")
+
+
+@pytest.mark.parametrize("line", ["[]", '"x"', "42", "null"])
+def test_record_that_is_not_an_object_is_reported(tmp_path, line):
+    input_path = tmp_path / "input.jsonl"
+    input_path.write_text(line + "\n")
+    runner = BatchRunner(unused_factory, "openai", progress=io.StringIO())
+    with pytest.raises(ValueError, match=r"input.jsonl:1: record must be a JSON object"):
+        asyncio.run(runner.run(str(input_path), str(tmp_path / "output.jsonl")))
+
+
+def test_invalid_json_is_reported(tmp_path):
+    input_path = tmp_path / "input.jsonl"
+    input_path.write_text('{"prompt": "hi"}\n{oops\n')
+    runner = BatchRunner(unused_factory, "openai", progress=io.StringIO())
+    with pytest.raises(ValueError, match=r"input.jsonl:2: invalid JSON"):
+        asyncio.run(runner.run(str(input_path), str(tmp_path / "output.jsonl")))
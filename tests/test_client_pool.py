@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Client Pool Tests
+Leased clients stay open however full the pool gets
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from chat.pool import ClientPool, get_leased_client
+
+
+class FakeClient:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_leased_client_is_not_evicted_when_pool_is_full():
+    async def main():
+        pool = ClientPool(max_clients=1)
+        held = pool.get("a", lambda: FakeClient("a"))
+        other = pool.get("b", lambda: FakeClient("b"))
+        other.release()
+        pool.get("c", lambda: FakeClient("c")).release()
+        await asyncio.sleep(0)
+        assert not held.client.closed
+        # The idle client made way for the newer one instead
+        assert other.client.closed
+        held.release()
+        return pool
+
+    pool = run(main())
+    assert len(pool) == 2
+
+
+def test_idle_timeout_skips_leased_clients():
+    async def main():
+        pool = ClientPool(idle_timeout=0)
+        held = pool.get("a", lambda: FakeClient("a"))
+        await asyncio.sleep(0.01)
+        pool.get("b", lambda: FakeClient("b")).release()
+        await asyncio.sleep(0)
+        assert not held.client.closed
+        held.release()
+
+    run(main())
+
+
+def test_clear_closes_leased_client_on_last_release():
+    async def main():
+        pool = ClientPool()
+        first = pool.get("a", lambda: FakeClient("a"))
+        second = pool.get("a", lambda: FakeClient("unused"))
+        assert first.client is second.client
+        pool.clear()
+        first.release()
+        await asyncio.sleep(0)
+        assert not first.client.closed
+        second.release()
+        await asyncio.sleep(0)
+        assert first.client.closed
+
+    run(main())
+
+
+def test_lease_context_exposes_client():
+    async def main():
+        pool = ClientPool()
+        with pool.get("a", lambda: FakeClient("a")) as lease:
+            assert get_leased_client("a") is lease.client
+            assert get_leased_client("b") is None
+        assert get_leased_client("a") is None
+
+    run(main())
+
+
+
+def test_reserve_raises_capacity():
+    async def main():
+        pool = ClientPool(max_clients=2)
+        pool.reserve("keys", 4)
+        for name in "abcd":
+            pool.get(name, lambda: FakeClient(name)).release()
+        return pool
+
+    assert len(run(main())) == 4
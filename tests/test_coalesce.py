@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Request Coalescing Tests
+Callers sharing a failed flight each get an error of their own
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from chat.coalesce import join_flight
+
+
+class StatusError(Exception):
+    def __init__(self, message, *, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def frame_count(traceback) -> int:
+    count = 0
+    while traceback is not None:
+        count += 1
+        traceback = traceback.tb_next
+    return count
+
+
+def test_leader_failure_reaches_every_follower_separately():
+    async def main():
+        release = asyncio.Event()
+        original = StatusError("upstream failed", status_code=503)
+
+        async def source(flight):
+            await release.wait()
+            yield "partial"
+            raise original
+
+        async def follow():
+            flight, joined = join_flight("key", source)
+            try:
+                async for _ in flight.follow():
+                    pass
+            except StatusError as e:
+                return joined, e
+
+        tasks = [asyncio.ensure_future(follow()) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return original, await asyncio.gather(*tasks)
+
+    original, results = asyncio.run(main())
+    assert [joined for joined, _ in results] == [False, True, True]
+    errors = [error for _, error in results]
+    assert len({id(error) for error in errors}) == 3
+    for error in errors:
+        assert error is not original
+        assert error.__cause__ is original
+        assert error.args == original.args
+        assert error.status_code == 503
+    # Each traceback holds only its own caller's frames, not the others'
+    assert len({frame_count(error.__traceback__) for error in errors}) == 1
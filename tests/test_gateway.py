@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Gateway Tests
+Malformed requests are answered with an HTTP error
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from server.gateway import Gateway, HTTPError
+
+
+def read_request(raw: bytes):
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await Gateway._read_request(reader)
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "1.5"])
+def test_bad_content_length_is_rejected(length):
+    raw = f"POST /v1/chat/completions HTTP/1.1\r\nContent-Length: {length}\r\n\r\n{{}}".encode()
+    with pytest.raises(HTTPError) as excinfo:
+        read_request(raw)
+    assert excinfo.value.status == 400
+
+
+def test_body_is_read_to_content_length():
+    raw = b"POST /v1/chat/completions HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}"
+    assert read_request(raw) == ("POST", "/v1/chat/completions", {"content-length": "2"}, b"{}")
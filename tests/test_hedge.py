@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Hedging Tests
+A hedged chat races its providers' own pipelines and owns no client
+"""
+
+import asyncio
+import os
+import sys
+from typing import Any, AsyncIterator, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from chat.base import BaseLLMChat
+from chat.hedge import HedgedChat
+
+
+class DelayedChat(BaseLLMChat):
+    """Streams its model name after a fixed delay"""
+
+    def __init__(self, provider: str, model: str, delay: float):
+        super().__init__("test-key", model)
+        self.provider_name = provider
+        self.delay = delay
+
+    def _get_default_model(self) -> str:
+        return self.model
+
+    def _get_available_models(self) -> List[str]:
+        return [self.model]
+
+    def _create_client(self) -> Any:
+        return object()
+
+    def _get_api_key_env_var(self) -> str:
+        return "DELAYED_API_KEY"
+
+    async def _amake_api_request(self, messages: List[Dict[str, str]]) -> str:
+        return self.model
+
+    async def _astream_request(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        await asyncio.sleep(self.delay)
+        yield self.model
+
+
+def test_hedged_chat_has_no_client_pipeline():
+    chat = HedgedChat(DelayedChat("a", "primary", 0), DelayedChat("b", "secondary", 0))
+    assert not isinstance(chat, BaseLLMChat)
+    assert not hasattr(chat, "client")
+    assert not hasattr(chat, "_create_client")
+
+
+def test_slow_primary_is_hedged():
+    chat = HedgedChat(DelayedChat("a", "primary", 1.0), DelayedChat("b", "secondary", 0), delay=0.05)
+
+    async def main():
+        return await chat.aget_response("hi")
+
+    assert asyncio.run(main()) == "secondary"
+    assert chat.last_winner == "b:secondary"
+    assert chat.conversation_history[-1] == {"role": "assistant", "content": "secondary"}
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Key Pool Tests
+A key pool larger than the client pool, under load, against the mock server
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+pytest.importorskip("openai")
+
+from run import MockServer
+from chat.factory import LLMProviderFactory
+from chat.pool import get_client_pool
+
+
+KEYS = 24
+POOL_SIZE = 16
+CONCURRENCY = 64
+REQUESTS = 400
+
+
+def test_more_keys_than_pooled_clients():
+    pool = get_client_pool()
+    pool.configure(max_clients=POOL_SIZE)
+    with MockServer() as server:
+        chat = LLMProviderFactory.create_provider(
+            "openai", model="gpt-4o-mini", base_url=server.base_url("openai"),
+            api_keys=[f"test-key-{i}" for i in range(KEYS)]
+        )
+        chat.coalesce_requests = False
+        chat.retry_policy.max_retries = 0
+
+        async def main():
+            semaphore = asyncio.Semaphore(CONCURRENCY)
+
+            async def one(i):
+                async with semaphore:
+                    try:
+                        await chat.acomplete([{"role": "user", "content": f"prompt {i}"}])
+                    except Exception as e:
+                        return e
+
+            results = await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+            pool.clear()
+            return results
+
+        failures = [result for result in asyncio.run(main()) if result is not None]
+        assert failures == []
+        assert server.served() == REQUESTS
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Metrics Log Tests
+The log is bounded by rotating it at a size limit
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from chat.metrics import MetricsLog, RequestTimer
+
+
+def record(seq):
+    return dict(RequestTimer("openai", "gpt-4o-mini", stream=False).finish(), seq=seq)
+
+
+def test_log_rotates_at_size_limit(tmp_path):
+    log = MetricsLog(tmp_path / "metrics.jsonl", max_bytes=5000)
+    for i in range(200):
+        log.record(record(i))
+    log.close()
+
+    size = len(json.dumps(record(0), separators=(",", ":"))) + 1
+    assert log.path.stat().st_size < 5000
+    assert log.rotated_path.stat().st_size < 5000 + size
+    records = log.load()
+    # The newest records survive, in order, across both generations
+    seqs = [entry["seq"] for entry in records]
+    assert seqs == sorted(seqs)
+    assert seqs[-1] == 199
+    assert len(seqs) > 5000 // size
+
+
+def test_rotation_by_another_process_is_not_repeated(tmp_path):
+    first = record(0)
+    size = len(json.dumps(first, separators=(",", ":"))) + 1
+    log = MetricsLog(tmp_path / "metrics.jsonl", max_bytes=size * 3 // 2)
+    log.record(first)
+    # Another process rotates the file and starts a new one
+    os.replace(log.path, log.rotated_path)
+    other = json.dumps(record("other")) + "\n"
+    log.path.write_text(other)
+    log.record(record(1))
+    log.close()
+    # The other process's new file is left in place
+    assert log.path.read_text() == other
+    assert len(log.rotated_path.read_text().splitlines()) == 2
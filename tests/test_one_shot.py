@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+One-Shot Tests
+Only a pipe or a redirected file is read from stdin
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from chatcli import read_piped_input
+
+
+def test_regular_file_is_read(tmp_path, monkeypatch):
+    path = tmp_path / "input.txt"
+    path.write_text("piped text")
+    with open(path) as stdin:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        assert read_piped_input() == "piped text"
+
+
+def test_pipe_is_read(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"from a pipe")
+    os.close(write_fd)
+    with os.fdopen(read_fd) as stdin:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        assert read_piped_input() == "from a pipe"
+
+
+def test_character_device_is_not_read(monkeypatch):
+    # Never reaches EOF, like a stdin left open by a parent process
+    with open("/dev/zero") as stdin:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        assert read_piped_input() is None
+
+
+def test_explicit_stdin_is_read_whatever_it_is(monkeypatch):
+    with open("/dev/null") as stdin:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        assert read_piped_input(explicit=True) == ""
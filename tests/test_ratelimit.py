@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Rate Limit Tests
+Retried attempts do not drain the shared buckets
+"""
+
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict, List
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from chat.base import BaseLLMChat
+from chat.ratelimit import BURST_SECONDS, RateLimiter
+from chat.resilience import RetryPolicy
+from chat.usage import report_usage
+
+REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 600
+
+
+class FlakyChat(BaseLLMChat):
+    """Fails with a connection error a number of times, then answers"""
+
+    def __init__(self, failures: int):
+        super().__init__("test-key", "flaky-model")
+        self.provider_name = "flaky"
+        self.failures = failures
+        self.calls = 0
+
+    def _get_default_model(self) -> str:
+        return "flaky-model"
+
+    def _get_available_models(self) -> List[str]:
+        return ["flaky-model"]
+
+    def _create_client(self) -> Any:
+        return object()
+
+    def _get_api_key_env_var(self) -> str:
+        return "FLAKY_API_KEY"
+
+    async def _amake_api_request(self, messages: List[Dict[str, str]]) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("connection reset")
+        report_usage(input_tokens=30, output_tokens=20)
+        return "ok"
+
+
+def test_failed_attempts_are_refunded(tmp_path):
+    path = tmp_path / "ratelimit.json"
+    chat = FlakyChat(failures=2)
+    chat.coalesce_requests = False
+    chat.retry_policy = RetryPolicy(base_delay=0)
+    chat.rate_limiter = RateLimiter(path)
+    chat.rate_limits = {"requests_per_minute": REQUESTS_PER_MINUTE, "tokens_per_minute": TOKENS_PER_MINUTE}
+
+    assert asyncio.run(chat.acomplete([{"role": "user", "content": "hello"}])) == "ok"
+    chat.rate_limiter.close()
+
+    assert chat.calls == 3
+    bucket = json.loads(path.read_text())["flaky:flaky-model"]
+    # One request and its 50 tokens, give or take what refilled meanwhile
+    assert bucket["requests"] == pytest.approx(REQUESTS_PER_MINUTE / 60 * BURST_SECONDS - 1, abs=0.5)
+    assert bucket["tokens"] == pytest.approx(TOKENS_PER_MINUTE / 60 * BURST_SECONDS - 50, abs=0.5)
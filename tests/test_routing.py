@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Routing Tests
+Candidates are ranked by their observed moving averages
+"""
+
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from chat import routing
+from chat.base import BaseLLMChat
+from chat.routing import LatencyStats, RoutedChat
+
+
+class FixedChat(BaseLLMChat):
+    """Answers every request after a fixed delay, and records its metrics"""
+
+    def __init__(self, provider: str, model: str, delay: float):
+        super().__init__("test-key", model)
+        self.provider_name = provider
+        self.delay = delay
+
+    def _get_default_model(self) -> str:
+        return self.model
+
+    def _get_available_models(self) -> List[str]:
+        return [self.model]
+
+    def _create_client(self) -> Any:
+        return object()
+
+    def _get_api_key_env_var(self) -> str:
+        return "FIXED_API_KEY"
+
+    async def _amake_api_request(self, messages: List[Dict[str, str]]) -> str:
+        return self.model
+
+    async def _arequest(self, messages: List[Dict[str, str]]) -> str:
+        self.last_metrics = {
+            "provider": self.provider_name, "model": self.model, "ok": True, "stream": False,
+            "latency": self.delay, "ts": time.time()
+        }
+        return self.model
+
+
+@pytest.fixture(autouse=True)
+def no_exploration(monkeypatch):
+    monkeypatch.setattr(routing, "EXPLORE_RATE", 0)
+
+
+def candidates():
+    return [FixedChat("routetest", "slow", 2.0), FixedChat("routetest", "fast", 0.5)]
+
+
+def record(model: str, latency: float) -> Dict[str, Any]:
+    return {"provider": "routetest", "model": model, "ok": True, "stream": False,
+            "latency": latency, "ts": time.time()}
+
+
+def test_rank_orders_by_ewma_and_survives_reload(tmp_path):
+    path = tmp_path / "routing.json"
+    stats = LatencyStats(path)
+    stats.observe(record("fast", 0.3))
+    stats.observe(record("slow", 0.2))
+    # The EWMA moves towards recent latencies
+    for _ in range(20):
+        stats.observe(record("slow", 3.0))
+    chat = RoutedChat("group", candidates(), stats)
+    assert [c.model for c in chat.rank()] == ["fast", "slow"]
+    stats.close()
+
+    reloaded = RoutedChat("group", candidates(), LatencyStats(path))
+    assert [c.model for c in reloaded.rank()] == ["fast", "slow"]
+    reloaded.stats.close()
+
+
+def test_unmeasured_candidate_goes_first(tmp_path):
+    stats = LatencyStats(tmp_path / "routing.json")
+    stats.observe(record("fast", 0.1))
+    chat = RoutedChat("group", candidates(), stats)
+    assert [c.model for c in chat.rank()] == ["slow", "fast"]
+    stats.close()
+
+
+def test_requests_are_observed_and_routed(tmp_path):
+    stats = LatencyStats(tmp_path / "routing.json")
+    chat = RoutedChat("group", candidates(), stats)
+
+    async def main():
+        return [await chat.acomplete([{"role": "user", "content": "hi"}]) for _ in range(3)]
+
+    # Both are tried while unmeasured, then the faster one wins
+    assert asyncio.run(main()) == ["slow", "fast", "fast"]
+    assert set(stats.load()) == {"routetest:slow", "routetest:fast"}
+    stats.close()
+
+
+def test_routed_chat_has_no_client_pipeline(tmp_path):
+    stats = LatencyStats(tmp_path / "routing.json")
+    chat = RoutedChat("group", candidates(), stats)
+    assert not isinstance(chat, BaseLLMChat)
+    assert not hasattr(chat, "client")
+    assert not hasattr(chat, "_create_client")
+    stats.close()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Session Search Tests
+Turns that missed the index are found by a later search
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from chat.search import SearchIndex
+from chat.session import SessionStore
+
+
+def turn(text):
+    return [{"role": "user", "content": text}, {"role": "assistant", "content": "noted"}]
+
+
+@pytest.fixture
+def index(tmp_path):
+    try:
+        index = SearchIndex(tmp_path / "search.db")
+    except sqlite3.Error:
+        pytest.skip("SQLite without FTS5")
+    yield index
+    index.close()
+
+
+def test_failed_turn_is_indexed_by_next_sync(tmp_path, index, monkeypatch):
+    store = SessionStore(tmp_path / "sessions", search_index=index)
+    session = store.create("openai", "gpt-4o-mini")
+
+    add_turn = index.add_turn
+    calls = []
+
+    def failing_once(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return add_turn(*args, **kwargs)
+
+    monkeypatch.setattr(index, "add_turn", failing_once)
+    session.append(turn("pelican migration"))
+    session.append(turn("walrus tusks"))
+
+    # The gap before the second turn made it index both
+    assert index.search("pelican")
+    assert index.search("walrus")
+    assert index.sync(store) == 0
+    assert index.stats()["turns"] == 2
+
+
+def test_turns_saved_without_index_are_found_by_sync(tmp_path, index):
+    store = SessionStore(tmp_path / "sessions")
+    session = store.create("openai", "gpt-4o-mini")
+    session.append(turn("pelican migration"))
+
+    store.search_index = index
+    session.append(turn("walrus tusks"))
+    index.sync(store)
+    assert index.search("pelican")
+    assert index.search("walrus")
+    assert index.stats()["turns"] == 2
+
+
+def test_failed_last_turn_is_caught_up_by_sync(tmp_path, index, monkeypatch):
+    store = SessionStore(tmp_path / "sessions", search_index=index)
+    session = store.create("openai", "gpt-4o-mini")
+    session.append(turn("pelican migration"))
+
+    def failing(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(index, "add_turn", failing)
+    session.append(turn("walrus tusks"))
+    assert not index.search("walrus")
+    assert index.sync(store) == 1
+    assert index.search("walrus")
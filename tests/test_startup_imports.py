@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Startup Import Tests
+Commands that need no provider start without importing any provider SDK
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Runs argv through chatcli.main with every provider SDK made unimportable,
+# so the check holds whether or not the SDKs are installed
+SCRIPT = """
+import sys
+sys.path.insert(0, {src!r})
+
+BLOCKED = ("openai", "anthropic", "google.genai", "google.generativeai")
+
+
+class BlockSDKs:
+    def find_spec(self, name, path=None, target=None):
+        if any(name == blocked or name.startswith(blocked + ".") for blocked in BLOCKED):
+            sys.stderr.write(f"BLOCKED IMPORT {{name}}\\n")
+            raise ImportError(f"{{name}} must not be imported at startup")
+        return None
+
+
+sys.meta_path.insert(0, BlockSDKs())
+import chatcli
+chatcli.main({argv!r})
+"""
+
+
+def run_cli(argv, home):
+    env = dict(os.environ, HOME=str(home))
+    return subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(src=SRC, argv=argv)],
+        capture_output=True, text=True, env=env, stdin=subprocess.DEVNULL, timeout=60
+    )
+
+
+@pytest.mark.parametrize("argv", [["--list-providers"], ["--config"]])
+def test_command_starts_without_provider_sdks(argv, tmp_path):
+    result = run_cli(argv, tmp_path)
+    assert "BLOCKED IMPORT" not in result.stderr, result.stderr
+    assert result.returncode == 0, result.stderr
+    assert result.stdout